@@ -3,6 +3,7 @@
 import os
 import json
 import base64
+import tempfile
 from pathlib import Path
 
 class FileHandler:
@@ -38,6 +39,25 @@ class FileHandler:
             }
         except Exception as err:
             return {'status': 'FAILED', 'error': str(err)}
+
+    def retrieve_file_binary(self, args=None):
+        """Buka file untuk mode binary; isi dikirim bertahap oleh server"""
+        if args is None:
+            args = []
+        try:
+            if not args or not args[0]:
+                return {'status': 'FAILED', 'error': 'Filename required'}, None
+
+            target_file = args[0]
+            file = open(target_file, 'rb')
+            
+            return {
+                'status': 'SUCCESS',
+                'filename': target_file,
+                'size': os.fstat(file.fileno()).st_size
+            }, file
+        except Exception as err:
+            return {'status': 'FAILED', 'error': str(err)}, None
     
     def save_file(self, args=None):
         if args is None:
@@ -53,6 +73,38 @@ class FileHandler:
             return {'status': 'SUCCESS', 'message': 'File saved'}
         except Exception as err:
             return {'status': 'FAILED', 'error': str(err)}
+
+    def save_file_binary(self, args=None, chunks=()):
+        """Tulis potongan payload ke disk begitu tiba, lalu rename ke nama akhir"""
+        if args is None:
+            args = []
+        try:
+            if not args or not args[0]:
+                return {'status': 'FAILED', 'error': 'Filename required'}
+
+            filename = args[0]
+            # File sementara unik per upload: upload bersamaan dengan nama
+            # yang sama tidak saling menimpa, yang terakhir selesai menang
+            fd, partial = tempfile.mkstemp(dir=os.path.dirname(filename) or '.',
+                                           prefix='.' + os.path.basename(filename) + '.')
+            os.chmod(partial, 0o644)  # mkstemp membuat 0600, samakan dengan file biasa
+            size = 0
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    for chunk in chunks:
+                        file.write(chunk)
+                        size += len(chunk)
+                os.replace(partial, filename)
+            finally:
+                # Hanya file sementara milik upload ini yang dihapus
+                try:
+                    os.unlink(partial)
+                except FileNotFoundError:
+                    pass
+
+            return {'status': 'SUCCESS', 'message': 'File saved', 'size': size}
+        except Exception as err:
+            return {'status': 'FAILED', 'error': str(err)}
     
     def remove_file(self, args=None):
         if args is None:
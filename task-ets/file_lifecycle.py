@@ -0,0 +1,67 @@
+# file_lifecycle.py
+
+import concurrent.futures
+import importlib.util
+import multiprocessing
+import os
+import socket
+import threading
+
+# ServerLifecycle dipakai bersama dengan server HTTP task4
+# (task4/server_lifecycle.py, hanya stdlib). Dimuat lewat path file karena
+# task4/http.py menutupi module http bawaan jika task4 masuk sys.path
+_spec = importlib.util.spec_from_file_location(
+    'server_lifecycle',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'task4', 'server_lifecycle.py'))
+server_lifecycle = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(server_lifecycle)
+
+
+class ServerLifecycle(server_lifecycle.ServerLifecycle):
+    """
+    Tambahan khusus server ETS: env var listener sendiri, worker_stop untuk
+    worker process pool, dan drain() berbasis future
+    """
+
+    listen_fd_env = 'FILE_SERVER_LISTEN_FD'
+    logger_name = None  # root logger, sama dengan module ETS lain
+
+    def __init__(self, drain_timeout=30.0):
+        super().__init__(drain_timeout)
+        # Process pool: multiprocessing.Event yang dibagikan ke worker lewat
+        # initializer. Di-set di drain(), bukan di stop(): stop() berjalan di
+        # signal handler, sedangkan set() multiprocessing.Event memakai lock
+        self.worker_stop = None
+
+    def watch_stop(self, worker_stop):
+        """Di worker process: putus koneksi idle begitu parent mulai drain"""
+        self.stopping = worker_stop
+
+        def wait():
+            worker_stop.wait()
+            self.stop()
+        threading.Thread(target=wait, daemon=True).start()
+
+    def drain(self, futures):
+        """
+        Tunggu future koneksi selesai paling lama drain_timeout; sisanya
+        diputus (thread pool) atau worker-nya dihentikan (process pool)
+        """
+        if self.worker_stop is not None:
+            self.worker_stop.set()
+        pending = list(futures)
+        if pending:
+            self.logger.warning("Waiting for %d connections (up to %.0fs)", len(pending), self.drain_timeout)
+        _, not_done = concurrent.futures.wait(pending, self.drain_timeout)
+        if not not_done:
+            self.logger.warning("All connections finished")
+            return True
+        self.logger.warning("Drain timeout, dropping %d connections", len(not_done))
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for process in multiprocessing.active_children():
+            process.kill()
+        return False
@@ -5,18 +5,38 @@ import logging
 import shlex
 from file_interface import FileHandler
 
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
 """
 * ProtocolHandler class processes incoming data 
 * and validates it against the defined protocol rules
 * 
 * Client data arrives as bytes which gets converted
 * to string for processing
+*
+* Binary mode (get_binary / upload_binary) skips base64:
+* the JSON header carries `size`, followed by that many raw bytes
 """
 class ProtocolHandler:
     def __init__(self):
         self.file_handler = FileHandler()
         
-    def process_request(self, request_string=''):
+    def payload_size(self, request_string=''):
+        """Jumlah byte mentah yang mengikuti request (upload_binary)"""
+        parts = request_string.split()
+        if len(parts) >= 3 and parts[0].lower() == 'upload_binary':
+            try:
+                return max(int(parts[-1]), 0)
+            except ValueError:
+                return 0
+        return 0
+
+    def process_request(self, request_string='', payload=()):
+        """
+        Returns a JSON string for text commands, or a (json_header, file, size)
+        tuple for get_binary so the server can stream the file unencoded.
+        `payload` is an iterable of byte chunks for upload_binary
+        """
         logging.warning(f"Processing request of length: {len(request_string)}")
         try:
             if not request_string.strip():
@@ -39,6 +59,17 @@ class ProtocolHandler:
                         params = parts[1].split()
             
             logging.warning(f"Executing: {command} with {len(params)} params")
+
+            if command == 'get_binary':
+                header, file = self.file_handler.retrieve_file_binary(params)
+                if file is None:
+                    return json.dumps(header)
+                header['mode'] = 'binary'
+                return json.dumps(header), file, header['size']
+            if command == 'upload_binary':
+                response = self.file_handler.save_file_binary(params[:1], payload)
+                response['mode'] = 'binary'
+                return json.dumps(response)
             
             if hasattr(self.file_handler, self._map_command(command)):
                 method = getattr(self.file_handler, self._map_command(command))
@@ -59,6 +90,50 @@ class ProtocolHandler:
         return command_map.get(cmd, cmd)
 
 
+def iter_payload(conn, buffer, size, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Yield `size` bytes of raw payload: first whatever is already in
+    `buffer` (consumed in place), then straight from the socket in
+    chunks of at most `buffer_size`
+    """
+    head = bytes(buffer[:size])
+    del buffer[:size]
+    if head:
+        yield head
+    remaining = size - len(head)
+    while remaining > 0:
+        data = conn.recv(min(buffer_size, remaining))
+        if not data:
+            raise ConnectionError('Connection closed during upload')
+        remaining -= len(data)
+        yield data
+
+
+def send_result(conn, result, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Kirim hasil process_request; tuple berarti header JSON + file yang di-stream.
+    Yang dikirim tepat `size` byte seperti di header: file yang membesar tidak
+    merusak framing, file yang menyusut membuat koneksi diputus (client tidak
+    menunggu byte yang tidak akan datang)
+    """
+    if not isinstance(result, tuple):
+        conn.sendall((result + "\r\n\r\n").encode())
+        return
+
+    header, file, size = result
+    conn.sendall((header + "\r\n\r\n").encode())
+    chunk = bytearray(min(buffer_size, size) or 1)
+    view = memoryview(chunk)
+    remaining = size
+    with file:
+        while remaining > 0:
+            n = file.readinto(view[:min(len(chunk), remaining)])
+            if not n:
+                raise ConnectionError(f"file menyusut saat dikirim: {size - remaining} dari {size} byte")
+            conn.sendall(view[:n])
+            remaining -= n
+
+
 if __name__ == '__main__':
     # Example usage
     protocol = ProtocolHandler()
\ No newline at end of file
@@ -1,26 +1,56 @@
 from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
 import logging
-from file_protocol import ProtocolHandler
+from file_protocol import ProtocolHandler, DEFAULT_BUFFER_SIZE, iter_payload, send_result
+from file_lifecycle import ServerLifecycle
 import multiprocessing
 import concurrent.futures
+import os
+import signal
 
+# SIGTERM: drain lalu keluar; SIGHUP: restart tanpa downtime
+# (dibuat sebelum ProtocolHandler yang pindah ke direktori files/)
+lifecycle = ServerLifecycle()
 handler = ProtocolHandler()
 
-def client_handler(conn, addr):
+def init_worker(worker_stop):
+    """
+    Initializer worker: signal diurus parent (drain/restart), worker hanya
+    memakai event worker_stop bersama untuk memutus koneksi idle miliknya
+    """
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGUSR2):
+        signal.signal(signum, signal.SIG_IGN)
+    lifecycle.watch_stop(worker_stop)
+
+def client_handler(conn, addr, buffer_size=DEFAULT_BUFFER_SIZE):
     """Handles client connections"""
     logging.warning(f"New connection from {addr}")
-    data_buffer = ""
+    data_buffer = bytearray()
+    scanned = 0
+    served = 0
     try:
         while True:
-            chunk = conn.recv(1024*1024)
+            # Di antara perintah koneksi boleh diputus saat server drain
+            chunk = lifecycle.receive(conn, buffer_size, idle=served > 0 and not data_buffer)
             if not chunk:
                 break
-            data_buffer += chunk.decode()
+            data_buffer += chunk
             
-            while "\r\n\r\n" in data_buffer:
-                request, data_buffer = data_buffer.split("\r\n\r\n", 1)
-                response = handler.process_request(request) + "\r\n\r\n"
-                conn.sendall(response.encode())
+            while True:
+                # Hanya scan bagian buffer yang belum diperiksa
+                end = data_buffer.find(b"\r\n\r\n", max(scanned - 3, 0))
+                if end < 0:
+                    scanned = len(data_buffer)
+                    break
+                request = data_buffer[:end].decode()
+                del data_buffer[:end + 4]
+                scanned = 0
+
+                payload = iter_payload(conn, data_buffer, handler.payload_size(request), buffer_size)
+                response = handler.process_request(request, payload)
+                for _ in payload:
+                    pass  # buang sisa payload jika upload gagal di tengah
+                send_result(conn, response, buffer_size)
+                served += 1
     except Exception as e:
         logging.warning(f"Connection error: {e}")
     finally:
@@ -28,38 +58,59 @@ def client_handler(conn, addr):
         conn.close()
 
 class ProcessPoolServer:
-    def __init__(self, host='0.0.0.0', port=8889, workers=5):
+    def __init__(self, host='0.0.0.0', port=8889, workers=5, buffer_size=DEFAULT_BUFFER_SIZE):
         self.address = (host, port)
         self.worker_count = workers
-        self.sock = socket(AF_INET, SOCK_STREAM)
-        self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.buffer_size = buffer_size
+        # Listener warisan generasi sebelumnya jika dijalankan lewat SIGHUP
+        self.sock = lifecycle.adopt_listener()
+        self.inherited = self.sock is not None
+        if not self.inherited:
+            self.sock = socket(AF_INET, SOCK_STREAM)
+            self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
 
     def start(self):
-        logging.warning(f"Starting server on {self.address} with {self.worker_count} workers")
-        self.sock.bind(self.address)
-        self.sock.listen(1)
+        logging.warning(f"Starting server on {self.address} with {self.worker_count} workers (pid {os.getpid()})")
+        if not self.inherited:
+            self.sock.bind(self.address)
+            self.sock.listen(1)
+        lifecycle.worker_stop = multiprocessing.Event()
+        lifecycle.start(self.sock)
+        pending = set()
         
-        with concurrent.futures.ProcessPoolExecutor(max_workers=self.worker_count) as pool:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.worker_count, initializer=init_worker,
+                                                    initargs=(lifecycle.worker_stop,)) as pool:
             try:
                 while True:
-                    client_conn, client_addr = self.sock.accept()
+                    accepted = lifecycle.accept()
+                    if accepted is None:
+                        break
+                    client_conn, client_addr = accepted
                     logging.warning(f"Accepted connection from {client_addr}")
-                    pool.submit(client_handler, client_conn, client_addr)
+                    future = pool.submit(client_handler, client_conn, client_addr, self.buffer_size)
+                    pending.add(future)
+                    future.add_done_callback(pending.discard)
             except KeyboardInterrupt:
                 logging.warning("Server shutting down")
+                lifecycle.stop()
             except Exception as e:
                 logging.warning(f"Server error: {e}")
+                lifecycle.stop()
             finally:
                 self.sock.close()
+            lifecycle.drain(pending)
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Process Pool File Server')
     parser.add_argument('--port', type=int, default=6667, help='Server port')
     parser.add_argument('--pool-size', type=int, default=5, help='Process pool size')
+    parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE // 1024, help='Per-connection buffer in KB')
+    parser.add_argument('--drain-timeout', type=float, default=30.0, help='Seconds to finish transfers on SIGTERM/SIGHUP')
     args = parser.parse_args()
     
-    server = ProcessPoolServer(port=args.port, workers=args.pool_size)
+    lifecycle.drain_timeout = args.drain_timeout
+    server = ProcessPoolServer(port=args.port, workers=args.pool_size, buffer_size=args.buffer_size * 1024)
     server.start()
 
 if __name__ == "__main__":
@@ -1,65 +1,104 @@
 from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
 import logging
-from file_protocol import ProtocolHandler
+import os
+from file_protocol import ProtocolHandler, DEFAULT_BUFFER_SIZE, iter_payload, send_result
+from file_lifecycle import ServerLifecycle
 import concurrent.futures
 
+# SIGTERM: drain lalu keluar; SIGHUP: restart tanpa downtime
+# (dibuat sebelum ProtocolHandler yang pindah ke direktori files/)
+lifecycle = ServerLifecycle()
 handler = ProtocolHandler()
 
-def handle_client(conn, addr):
+def handle_client(conn, addr, buffer_size=DEFAULT_BUFFER_SIZE):
     """Process client requests"""
     logging.warning(f"Handling client: {addr}")
-    buffer = ""
+    buffer = bytearray()
+    scanned = 0
+    served = 0
+    lifecycle.connections.add(conn)
     try:
         conn.settimeout(1800)
         
         while True:
-            data = conn.recv(1024*1024)
+            # Di antara perintah koneksi boleh diputus saat server drain
+            data = lifecycle.receive(conn, buffer_size, idle=served > 0 and not buffer)
             if not data:
                 break
-            buffer += data.decode()
+            buffer += data
             
-            while "\r\n\r\n" in buffer:
-                cmd, buffer = buffer.split("\r\n\r\n", 1)
-                result = handler.process_request(cmd) + "\r\n\r\n"
-                conn.sendall(result.encode())
+            while True:
+                # Hanya scan bagian buffer yang belum diperiksa
+                end = buffer.find(b"\r\n\r\n", max(scanned - 3, 0))
+                if end < 0:
+                    scanned = len(buffer)
+                    break
+                cmd = buffer[:end].decode()
+                del buffer[:end + 4]
+                scanned = 0
+
+                payload = iter_payload(conn, buffer, handler.payload_size(cmd), buffer_size)
+                result = handler.process_request(cmd, payload)
+                for _ in payload:
+                    pass  # buang sisa payload jika upload gagal di tengah
+                send_result(conn, result, buffer_size)
+                served += 1
     except Exception as e:
         logging.warning(f"Client error: {e}")
     finally:
         logging.warning(f"Disconnecting client: {addr}")
+        lifecycle.connections.discard(conn)
         conn.close()
 
 class ThreadedServer:
-    def __init__(self, host='0.0.0.0', port=8889, max_threads=5):
+    def __init__(self, host='0.0.0.0', port=8889, max_threads=5, buffer_size=DEFAULT_BUFFER_SIZE):
         self.server_addr = (host, port)
         self.thread_count = max_threads
-        self.socket = socket(AF_INET, SOCK_STREAM)
-        self.socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        self.socket.settimeout(1800)
+        self.buffer_size = buffer_size
+        # Listener warisan generasi sebelumnya jika dijalankan lewat SIGHUP
+        self.socket = lifecycle.adopt_listener()
+        self.inherited = self.socket is not None
+        if not self.inherited:
+            self.socket = socket(AF_INET, SOCK_STREAM)
+            self.socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
 
     def run(self):
-        logging.warning(f"Server running on {self.server_addr} with {self.thread_count} threads")
-        self.socket.bind(self.server_addr)
-        self.socket.listen(5)
+        logging.warning(f"Server running on {self.server_addr} with {self.thread_count} threads (pid {os.getpid()})")
+        if not self.inherited:
+            self.socket.bind(self.server_addr)
+            self.socket.listen(5)
+        lifecycle.start(self.socket)
+        pending = set()
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.thread_count) as executor:
             try:
                 while True:
-                    client_conn, client_addr = self.socket.accept()
+                    accepted = lifecycle.accept()
+                    if accepted is None:
+                        break
+                    client_conn, client_addr = accepted
                     logging.warning(f"New client: {client_addr}")
-                    executor.submit(handle_client, client_conn, client_addr)
+                    future = executor.submit(handle_client, client_conn, client_addr, self.buffer_size)
+                    pending.add(future)
+                    future.add_done_callback(pending.discard)
             except KeyboardInterrupt:
                 logging.warning("Server stopping")
+                lifecycle.stop()
             finally:
                 self.socket.close()
+            lifecycle.drain(pending)
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Threaded File Server')
     parser.add_argument('--port', type=int, default=6667, help='Server port')
     parser.add_argument('--pool-size', type=int, default=5, help='Thread pool size')
+    parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE // 1024, help='Per-connection buffer in KB')
+    parser.add_argument('--drain-timeout', type=float, default=30.0, help='Seconds to finish transfers on SIGTERM/SIGHUP')
     args = parser.parse_args()
     
-    server = ThreadedServer(port=args.port, max_threads=args.pool_size)
+    lifecycle.drain_timeout = args.drain_timeout
+    server = ThreadedServer(port=args.port, max_threads=args.pool_size, buffer_size=args.buffer_size * 1024)
     server.run()
 
 if __name__ == "__main__":
@@ -21,8 +21,9 @@ logging.basicConfig(
 )
 
 class PerformanceTester:
-    def __init__(self, server_addr=('localhost', 6667)):
+    def __init__(self, server_addr=('localhost', 6667), mode='text'):
         self.server = server_addr
+        self.mode = mode
         self.test_results = {
             'upload': {'success': 0, 'fail': 0, 'data': []},
             'download': {'success': 0, 'fail': 0, 'data': []},
@@ -72,17 +73,59 @@ class PerformanceTester:
         finally:
             sock.close()
 
+    def send_binary_request(self, request, upload_path=None, download_path=None):
+        """
+        Binary mode: JSON header, lalu `size` byte mentah tanpa base64.
+        File di-stream dari/ke disk sehingga memori tidak tergantung ukuran file
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(300)
+        try:
+            sock.connect(self.server)
+            sock.sendall(f"{request}\r\n\r\n".encode())
+            if upload_path:
+                with open(upload_path, 'rb') as f:
+                    sock.sendfile(f)
+
+            buffer = bytearray()
+            while b"\r\n\r\n" not in buffer:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                buffer += data
+            header_bytes, _, rest = bytes(buffer).partition(b"\r\n\r\n")
+            header = json.loads(header_bytes.decode())
+
+            if download_path and header.get('mode') == 'binary':
+                remaining = header.get('size', 0) - len(rest)
+                with open(download_path, 'wb') as f:
+                    f.write(rest)
+                    while remaining > 0:
+                        data = sock.recv(min(1024*1024, remaining))
+                        if not data:
+                            raise ConnectionError('Connection closed during download')
+                        f.write(data)
+                        remaining -= len(data)
+            return header
+        except Exception as e:
+            return {'status': 'ERROR', 'error': str(e)}
+        finally:
+            sock.close()
+
     def test_upload(self, file_path, worker_id):
         start = time.time()
         filename = os.path.basename(file_path)
         size = os.path.getsize(file_path)
         
         try:
-            with open(file_path, 'rb') as f:
-                encoded = base64.b64encode(f.read()).decode()
-            
-            cmd = f"upload {filename} {encoded}"
-            result = self.send_request(cmd)
+            if self.mode == 'binary':
+                result = self.send_binary_request(f"upload_binary {filename} {size}", upload_path=file_path)
+            else:
+                with open(file_path, 'rb') as f:
+                    encoded = base64.b64encode(f.read()).decode()
+
+                cmd = f"upload {filename} {encoded}"
+                result = self.send_request(cmd)
             
             duration = time.time() - start
             speed = size / duration if duration > 0 else 0
@@ -120,16 +163,20 @@ class PerformanceTester:
         start = time.time()
         
         try:
-            cmd = f"get {filename}"
-            result = self.send_request(cmd)
+            dl_path = os.path.join('downloads', f"{worker_id}_{filename}")
+            if self.mode == 'binary':
+                result = self.send_binary_request(f"get_binary {filename}", download_path=dl_path)
+            else:
+                result = self.send_request(f"get {filename}")
             
             if result['status'] == 'SUCCESS':
-                content = base64.b64decode(result['content'])
-                size = len(content)
-                
-                dl_path = os.path.join('downloads', f"{worker_id}_{filename}")
-                with open(dl_path, 'wb') as f:
-                    f.write(content)
+                if self.mode == 'binary':
+                    size = result['size']
+                else:
+                    content = base64.b64decode(result['content'])
+                    size = len(content)
+                    with open(dl_path, 'wb') as f:
+                        f.write(content)
                 
                 duration = time.time() - start
                 speed = size / duration if duration > 0 else 0
@@ -309,6 +356,7 @@ if __name__ == "__main__":
     parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100], help='File sizes in MB')
     parser.add_argument('--clients', type=int, nargs='+', default=[1, 5, 10], help='Client counts')
     parser.add_argument('--executor', choices=['thread', 'process'], default='thread', help='Executor type')
+    parser.add_argument('--mode', choices=['text', 'binary'], default='text', help='Transfer mode (binary skips base64)')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
     
     args = parser.parse_args()
@@ -316,7 +364,7 @@ if __name__ == "__main__":
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    tester = PerformanceTester((args.host, args.port))
+    tester = PerformanceTester((args.host, args.port), args.mode)
     
     if args.test == 'all':
         tests = ['upload', 'download', 'list']
@@ -0,0 +1,106 @@
+import json
+import sys
+from collections import defaultdict
+
+# Analisis offline access log JSON (--access-log) dari server HTTP:
+# tabel latency p50/p95/p99 per endpoint dan rincian waktu per tahap
+
+STAGES = ('queue_ms', 'header_ms', 'body_ms', 'proses_ms', 'send_ms')
+ENDPOINTS = {'/', '/files', '/list', '/info', '/status', '/metrics'}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile dari list yang sudah terurut"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def endpoint_of(entry, raw_paths=False):
+    """
+    Kunci grup: method + path tanpa query. Path file biasa digabung
+    menjadi /<file> kecuali raw_paths, agar tabel tidak satu baris per file
+    """
+    path = entry.get('path', '').partition('?')[0]
+    if not raw_paths and path not in ENDPOINTS and not path.endswith('/'):
+        path = '/<file>'
+    return f"{entry.get('method', '?')} {path}"
+
+
+def read_entries(paths):
+    skipped = 0
+    for path in paths:
+        with (sys.stdin if path == '-' else open(path, encoding='utf-8')) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    skipped += 1
+    if skipped:
+        print(f"⚠️  {skipped} baris bukan JSON dilewati", file=sys.stderr)
+
+
+def analyze(paths, metric='total_ms', group='endpoint', raw_paths=False):
+    groups = defaultdict(list)
+    for entry in read_entries(paths):
+        if metric not in entry:
+            continue
+        if group == 'endpoint':
+            key = endpoint_of(entry, raw_paths)
+        else:
+            key = str(entry.get(group, '?'))
+        groups[key].append(entry)
+    return groups
+
+
+def print_report(groups, metric='total_ms', label='Endpoint'):
+    total = sum(len(entries) for entries in groups.values())
+    print(f"\n{'='*96}")
+    print(f"📊 ACCESS LOG LATENCY ({metric}, {total} requests)")
+    print(f"{'='*96}")
+    print(f"{label:<28} {'Count':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'Max':>9} {'Errors':>7} {'Avg out':>11}")
+    print("-" * 96)
+    ordered = sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+    for key, entries in ordered:
+        values = sorted(entry[metric] for entry in entries)
+        errors = sum(1 for entry in entries if entry.get('status', 0) >= 500 or entry.get('status', 0) == 0)
+        avg_out = sum(entry.get('bytes_out', 0) for entry in entries) / len(entries)
+        print(f"{key[:28]:<28} {len(entries):>8} {percentile(values, 50):>9.2f} {percentile(values, 95):>9.2f} "
+              f"{percentile(values, 99):>9.2f} {values[-1]:>9.2f} {errors:>7} {avg_out:>11.0f}")
+
+    print(f"\n⏱️  Rincian per tahap (p50 / p95, ms)")
+    print("-" * 96)
+    print(f"{label:<28}" + ''.join(f"{stage[:-3]:>17}" for stage in STAGES))
+    for key, entries in ordered:
+        cells = []
+        for stage in STAGES:
+            values = sorted(entry[stage] for entry in entries if stage in entry)
+            cells.append(f"{percentile(values, 50):.2f} / {percentile(values, 95):.2f}" if values else '-')
+        print(f"{key[:28]:<28}" + ''.join(f"{cell:>17}" for cell in cells))
+    print(f"{'='*96}")
+
+
+def main():
+    """
+    Main function dengan argument parsing
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Analisis access log JSON server HTTP')
+    parser.add_argument('logs', nargs='+', help="File access log ('-' untuk stdin)")
+    parser.add_argument('--metric', default='total_ms', help='Field latency yang diringkas (default: total_ms)')
+    parser.add_argument('--by', default='endpoint', choices=['endpoint', 'method', 'status', 'pid'],
+                        help='Kelompokkan berdasarkan (default: endpoint)')
+    parser.add_argument('--raw-paths', action='store_true', help='Jangan gabungkan path file menjadi /<file>')
+    args = parser.parse_args()
+
+    groups = analyze(args.logs, args.metric, args.by, args.raw_paths)
+    if not groups:
+        print("Tidak ada entry yang cocok")
+        return
+    print_report(groups, args.metric, args.by.capitalize())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import time
+from datetime import datetime
+from http import HttpServer, LISTING_SHELL, LISTING_STATS, LISTING_EMPTY, LISTING_TABLE_OPEN, LISTING_TABLE_CLOSE, LISTING_SCRIPT, LISTING_END
+
+# Micro-benchmark render listing HTML: cara lama (html += per file)
+# dibandingkan generate_file_list_html, baik render pertama (join) maupun
+# request berikutnya saat isi direktori belum berubah (baris dipakai ulang)
+
+
+def render_concat(server, files, path):
+    """
+    Renderer lama: seluruh halaman dibangun dengan satu html += per baris
+    """
+    html = f"{LISTING_SHELL}{path if path != '/' else 'Root'}" + LISTING_STATS.format(
+        count=len(files), waktu=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    if len(files) == 0:
+        html += LISTING_EMPTY
+    else:
+        html += LISTING_TABLE_OPEN
+        for file_info in files:
+            size_formatted = server.format_file_size(file_info['size'])
+            html += f"""
+                <tr>
+                    <td class="file-name">{file_info['name']}</td>
+                    <td class="file-size">{size_formatted}</td>
+                    <td class="file-date">{file_info['modified']}</td>
+                    <td class="actions">
+                        <a href="/{file_info['name']}" class="btn btn-download">⬇️ Download</a>
+                        <button onclick="deleteFile('{file_info['name']}')" class="btn btn-delete">🗑️ Hapus</button>
+                    </td>
+                </tr>
+"""
+        html += LISTING_TABLE_CLOSE
+    html += LISTING_SCRIPT + str(len(files)) + LISTING_END
+    return html
+
+
+def make_files(count):
+    modified = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return [{'name': f"file_{i:06d}.txt", 'size': i * 37, 'modified': modified} for i in range(count)]
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(result)
+
+
+def main():
+    """
+    Main function dengan argument parsing
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark render listing HTML')
+    parser.add_argument('--sizes', default='10000,100000', help='Jumlah file yang diuji, dipisah koma (default: 10000,100000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Jumlah pengulangan, diambil yang tercepat (default: 5)')
+    args = parser.parse_args()
+
+    server = HttpServer(cache_bytes=0)
+
+    print(f"\n{'='*60}")
+    print(f"📊 LISTING RENDER BENCHMARK (best of {args.repeat})")
+    print(f"{'='*60}")
+    print(f"{'Files':>10} {'html +=':>12} {'join':>12} {'cached':>12} {'HTML size':>12}")
+    for count in [int(n) for n in args.sizes.split(',')]:
+        files = make_files(count)
+        digest = f"bench-{count}"
+        before, size = best_of(lambda: render_concat(server, files, '/'), args.repeat)
+        after, _ = best_of(lambda: server.generate_file_list_html(files, '/'), args.repeat)
+        best_of(lambda: server.generate_file_list_html(files, '/', digest), 1)  # render baris pertama kali
+        cached, _ = best_of(lambda: server.generate_file_list_html(files, '/', digest), args.repeat)
+        print(f"{count:>10} {before * 1000:>10.1f}ms {after * 1000:>10.1f}ms {cached * 1000:>10.1f}ms {size:>12}")
+    print(f"{'='*60}")
+
+
+if __name__ == '__main__':
+    main()
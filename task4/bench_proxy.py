@@ -0,0 +1,137 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# Benchmark throughput socket_proxy mode tcp di loopback: relay copy
+# (recv_into/send) dibandingkan relay splice (zero-copy lewat pipe),
+# plus koneksi langsung ke backend sebagai batas atas
+
+CHUNK = 1024 * 1024
+PROXY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'socket_proxy.py')
+
+
+def source_server(listener, size):
+    """Backend: kirim size byte ke setiap koneksi lalu tutup"""
+    payload = memoryview(bytearray(CHUNK))
+
+    def send(connection):
+        with connection:
+            remaining = size
+            try:
+                while remaining > 0:
+                    n = min(CHUNK, remaining)
+                    connection.sendall(payload[:n])
+                    remaining -= n
+            except OSError:
+                pass  # koneksi cek wait_port ditutup sebelum selesai
+
+    while True:
+        connection, _ = listener.accept()
+        threading.Thread(target=send, args=(connection,), daemon=True).start()
+
+
+def download(port, results):
+    buffer = bytearray(CHUNK)
+    total = 0
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        while True:
+            n = sock.recv_into(buffer)
+            if not n:
+                break
+            total += n
+    results.append(total)
+
+
+def run_streams(port, streams):
+    results = []
+    threads = [threading.Thread(target=download, args=(port, results)) for _ in range(streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(results), time.perf_counter() - start
+
+
+def cpu_seconds(pid):
+    """utime + stime process dari /proc (Linux)"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rpartition(')')[2].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def wait_port(port, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"proxy tidak listen di port {port}")
+
+
+def bench_proxy(relay, port, backend_port, streams, repeat, buffer_kb):
+    proxy = subprocess.Popen([sys.executable, PROXY, '--port', str(port), '--backend', f"127.0.0.1:{backend_port}",
+                              '--relay', relay, '--buffer-kb', str(buffer_kb)])
+    try:
+        wait_port(port)
+        cpu_before = cpu_seconds(proxy.pid)
+        best = None
+        total_bytes = 0
+        for _ in range(repeat):
+            nbytes, elapsed = run_streams(port, streams)
+            total_bytes += nbytes
+            best = elapsed if best is None else min(best, elapsed)
+        cpu = cpu_seconds(proxy.pid) - cpu_before
+        return nbytes / best, cpu / (total_bytes / 1e9)
+    finally:
+        proxy.terminate()
+        proxy.wait()
+
+
+def main():
+    """
+    Main function dengan argument parsing
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark throughput socket_proxy (copy vs splice)')
+    parser.add_argument('--mb', type=int, default=1024, help='Ukuran download per stream dalam MB (default: 1024)')
+    parser.add_argument('--streams', type=int, default=1, help='Jumlah download paralel (default: 1)')
+    parser.add_argument('--repeat', type=int, default=3, help='Jumlah pengulangan, diambil yang tercepat (default: 3)')
+    parser.add_argument('--buffer-kb', type=int, default=64, help='--buffer-kb proxy (default: 64)')
+    parser.add_argument('--port', type=int, default=18400, help='Port pertama untuk proxy (default: 18400)')
+    args = parser.parse_args()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(128)
+    backend_port = listener.getsockname()[1]
+    threading.Thread(target=source_server, args=(listener, args.mb * 1024 * 1024), daemon=True).start()
+
+    print(f"\n{'='*60}")
+    print(f"📊 PROXY THROUGHPUT BENCHMARK ({args.streams} x {args.mb} MB, buffer {args.buffer_kb} KB, best of {args.repeat})")
+    print(f"{'='*60}")
+    print(f"{'Path':<12} {'Throughput':>16} {'Proxy CPU/GB':>16}")
+
+    best = None
+    for _ in range(args.repeat):
+        nbytes, elapsed = run_streams(backend_port, args.streams)
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{'direct':<12} {nbytes / best / 1e6:>12.0f} MB/s {'-':>16}")
+
+    relays = ['copy', 'splice'] if hasattr(os, 'splice') else ['copy']
+    for offset, relay in enumerate(relays):
+        throughput, cpu_per_gb = bench_proxy(relay, args.port + offset, backend_port, args.streams,
+                                                 args.repeat, args.buffer_kb)
+        print(f"{relay:<12} {throughput / 1e6:>12.0f} MB/s {cpu_per_gb:>14.2f} s")
+    print(f"{'='*60}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import socket
+import ssl
+import threading
+import time
+
+# Benchmark listener TLS (server_thread_http_secure): laju handshake penuh
+# dibandingkan handshake resumed (session ticket / session cache), plus
+# latency request pertama di koneksi baru. Sertifikat server dicocokkan
+# langsung dengan certs/domain.crt (self-signed, tanpa SAN)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile dari list yang sudah terurut"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def client_context(certfile):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    # Sertifikat contoh sudah kedaluwarsa dan tanpa SAN: verifikasi diganti pinning
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.set_alpn_protocols(['http/1.1'])
+    with open(certfile) as f:
+        pinned = ssl.PEM_cert_to_DER_cert(f.read())
+    return context, pinned
+
+
+def one_connection(address, context, pinned, path, session=None):
+    """
+    Satu koneksi baru + satu GET (Connection: close).
+    Return (handshake detik, total detik, resumed, session untuk koneksi berikutnya)
+    """
+    start = time.perf_counter()
+    with socket.create_connection(address) as raw:
+        raw.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with context.wrap_socket(raw, session=session) as sock:
+            handshake = time.perf_counter() - start
+            if sock.getpeercert(binary_form=True) != pinned:
+                raise ssl.SSLError("sertifikat server tidak sama dengan yang di-pin")
+            sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+            response = bytearray()
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                response += data
+            if not response.startswith(b"HTTP/1.1 2"):
+                raise ssl.SSLError(f"response tidak OK: {bytes(response[:40])!r}")
+            # Ticket TLS 1.3 dikirim setelah handshake, jadi session diambil setelah baca response
+            return handshake, time.perf_counter() - start, sock.session_reused, sock.session
+
+
+def run_phase(address, context, pinned, path, connections, concurrency, resume):
+    """
+    connections koneksi dibagi ke concurrency thread. resume=True: setiap
+    thread memakai ulang session dari koneksi sebelumnya (koneksi pertama penuh)
+    """
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(count):
+        session = None
+        local = []
+        for _ in range(count):
+            try:
+                handshake, total, reused, new_session = one_connection(address, context, pinned, path, session)
+            except (OSError, ssl.SSLError) as e:
+                errors.append(str(e))
+                continue
+            local.append((handshake, total, reused))
+            if resume:
+                session = new_session
+        with lock:
+            results.extend(local)
+
+    per_thread = [connections // concurrency + (1 if i < connections % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors, time.perf_counter() - start
+
+
+def stall(address, count):
+    """Koneksi TCP yang tidak pernah mengirim ClientHello (client TLS lambat)"""
+    return [socket.create_connection(address) for _ in range(count)]
+
+
+def main():
+    """
+    Main function dengan argument parsing
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark handshake TLS server_thread_http_secure (penuh vs resumed)')
+    parser.add_argument('--host', default='127.0.0.1', help='Server host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8443, help='Server port (default: 8443)')
+    parser.add_argument('--cert', default='certs/domain.crt', help='Sertifikat server untuk pinning (default: certs/domain.crt)')
+    parser.add_argument('--path', default='/info', help='Path yang diminta setiap koneksi (default: /info)')
+    parser.add_argument('--connections', type=int, default=500, help='Jumlah koneksi per fase (default: 500)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Jumlah thread client (default: 8)')
+    parser.add_argument('--stall', type=int, default=0, help='Koneksi diam yang dibuka dulu untuk menguji accept loop (default: 0)')
+    parser.add_argument('--tls', default=None, choices=['1.2', '1.3'], help='Paksa versi TLS (default: negosiasi)')
+    args = parser.parse_args()
+
+    address = (args.host, args.port)
+    context, pinned = client_context(args.cert)
+    if args.tls:
+        version = ssl.TLSVersion.TLSv1_2 if args.tls == '1.2' else ssl.TLSVersion.TLSv1_3
+        context.minimum_version = context.maximum_version = version
+    stalled = stall(address, args.stall)
+
+    print(f"\n{'='*78}")
+    print(f"🔒 TLS HANDSHAKE BENCHMARK ({args.connections} koneksi x {args.concurrency} thread, "
+          f"TLS {args.tls or 'auto'}, {args.stall} koneksi diam)")
+    print(f"{'='*78}")
+    print(f"{'Phase':<10} {'Conn/s':>9} {'HS p50':>9} {'HS p95':>9} {'Req p50':>9} {'Req p95':>9} {'Resumed':>9} {'Errors':>7}")
+    print("-" * 78)
+    for name, resume in (('full', False), ('resumed', True)):
+        results, errors, elapsed = run_phase(address, context, pinned, args.path,
+                                             args.connections, args.concurrency, resume)
+        handshakes = sorted(r[0] * 1000 for r in results)
+        totals = sorted(r[1] * 1000 for r in results)
+        reused = sum(1 for r in results if r[2])
+        print(f"{name:<10} {len(results) / elapsed:>9.0f} {percentile(handshakes, 50):>7.2f}ms {percentile(handshakes, 95):>7.2f}ms "
+              f"{percentile(totals, 50):>7.2f}ms {percentile(totals, 95):>7.2f}ms {reused:>9} {len(errors):>7}")
+        if errors:
+            print(f"   ⚠️  {errors[0]}")
+    print(f"{'='*78}")
+    for sock in stalled:
+        sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
 import socket
 import logging
+import json
 import os
 import time
+from urllib.parse import urlencode
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -170,59 +172,45 @@ def send_binary_data(command_headers, binary_data, timeout=30):
         except:
             pass
 
-def list_files(directory='/'):
+def list_files(prefix='', sort='name', page_size=1000):
     """
-    Mengambil daftar file dari server
+    Mengambil daftar file dari server lewat listing JSON per halaman
+    (GET /files?format=json), tanpa parsing HTML
     """
     print(f"\n{'='*50}")
     print(f"LISTING FILES")
     print(f"{'='*50}")
     
-    command = f"GET {directory} HTTP/1.1\r\nHost: localhost\r\n\r\n"
-    hasil = send_command(command)
-    
-    if "200 OK" in hasil:
-        print("SUCCESS: File listing received")
+    file_list = []
+    offset = 0
+    while offset is not None:
+        query = urlencode({'format': 'json', 'offset': offset, 'limit': page_size, 'prefix': prefix, 'sort': sort})
+        command = f"GET /files?{query} HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        hasil = send_command(command)
         
-        # Parse HTML untuk extract nama file
-        file_list = extract_filenames_from_html(hasil)
+        status_line = hasil.split('\r\n', 1)[0]
+        if " 200 " not in status_line:
+            print("FAILED: Could not get file listing")
+            print("--- Server Response (first 500 chars) ---")
+            print(hasil[:500] + "..." if len(hasil) > 500 else hasil)
+            print("-" * 50)
+            return None
         
-        if file_list:
-            print(f"\nFound {len(file_list)} files:")
-            print("-" * 40)
-            for i, filename in enumerate(file_list, 1):
-                print(f"{i:2d}. {filename}")
-            print("-" * 40)
-        else:
-            print("No files found or failed to parse response")
+        halaman = json.loads(hasil.split('\r\n\r\n', 1)[1])
+        file_list.extend(halaman['files'])
+        offset = halaman['next']
+    
+    print("SUCCESS: File listing received")
+    if file_list:
+        print(f"\nFound {len(file_list)} files:")
+        print("-" * 40)
+        for i, info in enumerate(file_list, 1):
+            print(f"{i:2d}. {info['name']} ({format_file_size(info['size'])})")
+        print("-" * 40)
     else:
-        print("FAILED: Could not get file listing")
-        print("--- Server Response (first 500 chars) ---")
-        print(hasil[:500] + "..." if len(hasil) > 500 else hasil)
-        print("-" * 50)
+        print("No files found")
     
-    return hasil
-
-def extract_filenames_from_html(html_response):
-    """
-    Extract filenames dari HTML response
-    """
-    import re
-    
-    try:
-        # Cari semua pattern yang mengandung nama file dalam HTML table
-        # Pattern: <td class="file-name">filename</td>
-        pattern = r'<td class="file-name">([^<]+)</td>'
-        matches = re.findall(pattern, html_response)
-        
-        # Clean up filenames (remove any extra whitespace)
-        filenames = [filename.strip() for filename in matches if filename.strip()]
-        
-        return filenames
-        
-    except Exception as e:
-        print(f"Error parsing HTML: {e}")
-        return []
+    return file_list
 
 def upload_file(local_path, remote_path=None):
     """
@@ -291,12 +279,111 @@ def upload_file(local_path, remote_path=None):
     finally:
         print("-" * 50)
 
-def download_file(remote_filename, local_path=None):
+def open_request(command, timeout=120):
+    """
+    Kirim request lalu baca status dan header response saja.
+    Mengembalikan (sock, status_code, headers dict lowercase, awal body)
+    agar body bisa di-stream langsung ke file
+    """
+    sock = make_socket(server_address[0], server_address[1])
+    if not sock:
+        raise ConnectionError("Could not connect to server")
+    
+    sock.settimeout(timeout)
+    sock.sendall(command.encode('utf-8'))
+    
+    data_received = b""
+    while b"\r\n\r\n" not in data_received:
+        chunk = sock.recv(4096)
+        if not chunk:
+            sock.close()
+            raise ConnectionError("Connection closed before response headers")
+        data_received += chunk
+    
+    head, _, body_start = data_received.partition(b"\r\n\r\n")
+    lines = head.decode('utf-8', errors='replace').split('\r\n')
+    status_code = int(lines[0].split(' ')[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return sock, status_code, headers, body_start
+
+def read_body_to_file(sock, body_start, length, f):
+    """Tulis tepat `length` byte body ke file yang sudah diposisikan"""
+    f.write(body_start[:length])
+    remaining = length - len(body_start[:length])
+    while remaining > 0:
+        chunk = sock.recv(min(65536, remaining))
+        if not chunk:
+            raise ConnectionError(f"Connection closed, {remaining} bytes missing")
+        f.write(chunk)
+        remaining -= len(chunk)
+
+def range_validator(headers):
+    """Validator untuk If-Range: ETag, atau Last-Modified jika server tidak mengirim ETag"""
+    return headers.get('etag') or headers.get('last-modified') or ''
+
+def download_range(remote_filename, local_path, start, end, validator):
+    """Download satu segmen bytes start-end (inklusif) ke posisi yang sama di file lokal"""
+    command = f"GET /{remote_filename} HTTP/1.1\r\nHost: localhost\r\nRange: bytes={start}-{end}\r\n"
+    if validator:
+        command += f"If-Range: {validator}\r\n"
+    command += "Connection: close\r\n\r\n"
+    sock, status_code, headers, body_start = open_request(command)
+    try:
+        if status_code != 206:
+            raise RuntimeError(f"Expected 206 for range {start}-{end}, got {status_code}")
+        with open(local_path, 'r+b') as f:
+            f.seek(start)
+            read_body_to_file(sock, body_start, end - start + 1, f)
+        return end - start + 1
+    finally:
+        sock.close()
+
+def download_parallel(remote_filename, local_path, parallel):
     """
-    Download file dari server
+    Download file dengan N range request paralel.
+    Ukuran dan validator (ETag / Last-Modified) diambil dari request 'Range: bytes=0-0'
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    command = f"GET /{remote_filename} HTTP/1.1\r\nHost: localhost\r\nRange: bytes=0-0\r\nConnection: close\r\n\r\n"
+    sock, status_code, headers, _ = open_request(command)
+    sock.close()
+    if status_code == 416 and headers.get('content-range', '').strip() == 'bytes */0':
+        # File kosong: tidak ada byte untuk range 0-0, cukup buat file kosong
+        open(local_path, 'wb').close()
+        return 0
+    if status_code != 206:
+        print(f"Server tidak mendukung range (status {status_code})")
+        return None
+    
+    total_size = int(headers['content-range'].rsplit('/', 1)[1])
+    validator = range_validator(headers)
+    segment = -(-total_size // parallel)  # pembulatan ke atas
+    ranges = [(start, min(start + segment, total_size) - 1) for start in range(0, total_size, segment)]
+    
+    # Siapkan file dengan ukuran akhir, tiap thread menulis di offset masing-masing
+    with open(local_path, 'wb') as f:
+        f.truncate(total_size)
+    
+    print(f"Parallel: {len(ranges)} segments of ~{format_file_size(segment)}")
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [executor.submit(download_range, remote_filename, local_path, start, end, validator)
+                   for start, end in ranges]
+        return sum(future.result() for future in futures)
+
+def download_file(remote_filename, local_path=None, parallel=1, resume=True):
+    """
+    Download file dari server.
+    Data ditulis ke '<local>.part'; jika file .part sudah ada, download
+    dilanjutkan dengan Range (If-Range memastikan file di server belum berubah)
     """
     if not local_path:
         local_path = remote_filename
+    partial_path = local_path + '.part'
+    etag_path = partial_path + '.etag'
     
     print(f"\n{'='*50}")
     print(f"📥 DOWNLOADING FILE")
@@ -304,43 +391,67 @@ def download_file(remote_filename, local_path=None):
     print(f"Remote: {remote_filename}")
     print(f"Local:  {local_path}")
     
-    command = f"GET /{remote_filename} HTTP/1.1\r\nHost: localhost\r\n\r\n"
-    
     try:
         start_time = time.time()
-        response = send_command(command, timeout=120)
-        download_time = time.time() - start_time
         
-        # Parse response untuk mendapatkan file content
-        if "\r\n\r\n" in response:
-            headers, body = response.split("\r\n\r\n", 1)
-            
-            if "200 OK" in headers:
-                # Simpan file
-                with open(local_path, 'w', encoding='utf-8') as f:
-                    f.write(body)
-                
-                file_size = len(body.encode('utf-8'))
-                print(f"✅ Download successful!")
-                print(f"Size: {format_file_size(file_size)}")
-                print(f"Time: {download_time:.2f}s")
-                
-                if download_time > 0:
-                    speed = file_size / download_time
-                    print(f"Speed: {format_file_size(speed)}/s")
-                
-                return True
-            else:
-                print("--- Download Response ---")
-                print(response)
+        if parallel > 1:
+            file_size = download_parallel(remote_filename, partial_path, parallel)
+            if file_size is None:
                 return False
         else:
-            print("--- Download Response ---")
-            print(response)
-            return False
+            offset = 0
+            etag = ''
+            if resume and os.path.exists(partial_path) and os.path.exists(etag_path):
+                offset = os.path.getsize(partial_path)
+                with open(etag_path) as f:
+                    etag = f.read().strip()
+            
+            command = f"GET /{remote_filename} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+            if offset > 0 and etag:
+                command += f"Range: bytes={offset}-\r\nIf-Range: {etag}\r\n"
+                print(f"Resuming from {format_file_size(offset)}")
+            command += "\r\n"
+            
+            sock, status_code, headers, body_start = open_request(command)
+            try:
+                if status_code == 416:
+                    # File .part sudah lengkap
+                    file_size = offset
+                elif status_code in (200, 206):
+                    if status_code == 200:
+                        offset = 0  # server mengirim file penuh (file berubah / range diabaikan)
+                        with open(etag_path, 'w') as f:
+                            f.write(range_validator(headers))
+                    length = int(headers.get('content-length', 0))
+                    with open(partial_path, 'ab' if offset else 'wb') as f:
+                        read_body_to_file(sock, body_start, length, f)
+                    file_size = offset + length
+                else:
+                    print("--- Download Response ---")
+                    print(f"HTTP {status_code}: {body_start.decode('utf-8', errors='replace')}")
+                    return False
+            finally:
+                sock.close()
+        
+        os.replace(partial_path, local_path)
+        if os.path.exists(etag_path):
+            os.remove(etag_path)
+        download_time = time.time() - start_time
+        
+        print(f"✅ Download successful!")
+        print(f"Size: {format_file_size(file_size)}")
+        print(f"Time: {download_time:.2f}s")
+        
+        if download_time > 0:
+            speed = file_size / download_time
+            print(f"Speed: {format_file_size(speed)}/s")
+        
+        return True
             
     except Exception as e:
         print(f"❌ Error during download: {e}")
+        if os.path.exists(partial_path):
+            print(f"Partial file kept at {partial_path}, run again to resume")
         return False
     finally:
         print("-" * 50)
@@ -410,7 +521,7 @@ def interactive_mode():
             choice = input(f"\nSelect operation (1-5): ").strip()
             
             if choice == '1':
-                list_files('/')
+                list_files()
                 
             elif choice == '2':
                 local_file = input("Enter local file path: ").strip()
@@ -456,7 +567,7 @@ def demo_operations():
     
     # 1. List files awal
     print("\n1️⃣ Initial file listing...")
-    list_files('/')
+    list_files()
     
     # 2. Upload test file
     print("\n2️⃣ Creating and uploading test file...")
@@ -476,7 +587,7 @@ def demo_operations():
     
     # 4. List files setelah upload
     print("\n4️⃣ File listing after upload...")
-    list_files('/')
+    list_files()
     
     # 5. Download file
     print("\n5️⃣ Downloading uploaded file...")
@@ -488,7 +599,7 @@ def demo_operations():
     
     # 7. Final file listing
     print("\n7️⃣ Final file listing...")
-    list_files('/')
+    list_files()
     
     # Cleanup
     try:
@@ -517,10 +628,14 @@ def main():
     
     # Command line operations
     parser.add_argument('--list', action='store_true', help='List files')
+    parser.add_argument('--prefix', default='', help='Filter listing berdasarkan awalan nama')
+    parser.add_argument('--sort', default='name', help='Urutan listing: name, size, modified (awalan - untuk terbalik)')
     parser.add_argument('--upload', help='Upload file (local_path)')
     parser.add_argument('--remote-name', help='Remote filename for upload')
     parser.add_argument('--download', help='Download file')
     parser.add_argument('--save-as', help='Local filename for download')
+    parser.add_argument('--parallel', type=int, default=1, help='Download dengan N range request paralel')
+    parser.add_argument('--no-resume', action='store_true', help='Jangan lanjutkan file .part yang ada')
     parser.add_argument('--delete', help='Delete file')
     
     args = parser.parse_args()
@@ -533,11 +648,11 @@ def main():
     elif args.interactive:
         interactive_mode()
     elif args.list:
-        list_files('/')
+        list_files(args.prefix, args.sort)
     elif args.upload:
         upload_file(args.upload, args.remote_name)
     elif args.download:
-        download_file(args.download, args.save_as)
+        download_file(args.download, args.save_as, parallel=args.parallel, resume=not args.no_resume)
     elif args.delete:
         delete_file(args.delete)
     else:
@@ -1,278 +1,917 @@
 import os
+import hashlib
+import json
+import secrets
 import socket
+import ssl
+import stat
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left
 from glob import glob
 from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import parse_qs
 import logging
+import logging.handlers
+import queue
+import atexit
+import gzip
+import zlib
 
-class HttpServer:
+# Server task4 meng-import ServerLifecycle lewat module ini
+from server_lifecycle import ServerLifecycle, LISTEN_FD_ENV, ACCEPT_POLL_INTERVAL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# File di atas batas ini dikirim langsung dari disk (sendfile), bukan dibaca ke memori
+SENDFILE_THRESHOLD = 64 * 1024
+TLS_CHUNK_SIZE = 64 * 1024
+# Ukuran buffer recv_into untuk body upload (memori per upload tetap sebesar ini)
+BODY_CHUNK_SIZE = 64 * 1024
+# Request dengan range lebih banyak dari ini dilayani sebagai response penuh
+MAX_RANGES = 16
+# Kompresi: hanya body >= COMPRESS_MIN_SIZE, file statis <= COMPRESS_MAX_SIZE
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MAX_SIZE = 4 * 1024 * 1024
+COMPRESSIBLE_TYPES = {'application/javascript', 'application/json', 'application/xml'}
+# Urutan preferensi; brotli hanya jika modulnya terpasang
+SUPPORTED_ENCODINGS = (['br'] if brotli is not None else []) + ['gzip', 'deflate']
+# Ukuran halaman listing JSON (/files?format=json)
+JSON_PAGE_SIZE = 100
+JSON_MAX_PAGE_SIZE = 1000
+LISTING_SORTS = ('name', 'size', 'modified')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Event inotify yang mengubah isi listing (lihat inotify(7))
+IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x4, 0x8, 0x40, 0x80
+IN_CREATE, IN_DELETE, IN_Q_OVERFLOW = 0x100, 0x200, 0x4000
+INOTIFY_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+# QueueListener aktif di process ini (thread tidak ikut ter-fork)
+log_listener = None
+log_listener_pid = None
+
+
+def setup_logging(level=logging.INFO):
     """
-    HTTP Server yang mendukung operasi file: list, upload, delete
-    Dengan logging yang enhanced
+    Semua logger menulis ke QueueHandler; satu thread QueueListener yang
+    menulis ke stderr, jadi worker tidak pernah menunggu lock/I/O terminal.
+    Panggil lagi di process anak hasil fork agar listener-nya hidup
     """
-    
-    def __init__(self):
-        self.sessions = {}
-        self.types = {
-            '.pdf': 'application/pdf',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.txt': 'text/plain',
-            '.html': 'text/html',
-            '.htm': 'text/html',
-            '.css': 'text/css',
-            '.js': 'application/javascript',
-            '.json': 'application/json',
-            '.xml': 'application/xml',
-            '.zip': 'application/zip',
-            '.mp4': 'video/mp4',
-            '.mp3': 'audio/mpeg',
-            '.doc': 'application/msword',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.bin': 'application/octet-stream'
-        }
-        # Setup logger untuk HTTP server
-        self.logger = logging.getLogger('HttpServer')
-    
-    def response(self, kode=404, message='Not Found', messagebody=bytes(), headers={}):
-        """
-        Membuat HTTP response dengan format yang benar
-        """
-        tanggal = datetime.now().strftime('%c')
-        resp = []
-        resp.append(f"HTTP/1.1 {kode} {message}\r\n")
-        resp.append(f"Date: {tanggal}\r\n")
-        resp.append("Connection: close\r\n")
-        resp.append("Server: FileServer/2.0\r\n")
-        resp.append(f"Content-Length: {len(messagebody)}\r\n")
-        
-        # Tambahkan headers custom
-        for key, value in headers.items():
-            resp.append(f"{key}: {value}\r\n")
-        
-        resp.append("\r\n")
-        
-        # Gabungkan headers
-        response_headers = ''.join(resp)
-        
-        # Pastikan messagebody dalam bytes
-        if type(messagebody) is not bytes:
-            messagebody = messagebody.encode('utf-8')
-        
-        response = response_headers.encode('utf-8') + messagebody
-        
-        # Log response yang dibuat
-        self.logger.info(f"📤 Generated response: {kode} {message} ({len(messagebody)} bytes)")
+    global log_listener, log_listener_pid
+    stop_logging()
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    log_listener = logging.handlers.QueueListener(log_queue, console)
+    log_listener.start()
+    log_listener_pid = os.getpid()
+
+
+def stop_logging():
+    """Tulis sisa log di queue lalu hentikan listener (otomatis saat exit)"""
+    global log_listener
+    if log_listener is not None and log_listener_pid == os.getpid():
+        log_listener.stop()
+    log_listener = None
+
+
+atexit.register(stop_logging)
+
+class FileResponse:
+    """
+    Response yang body-nya diambil langsung dari file yang sudah dibuka.
+    Header sudah jadi (bytes); body dikirim dengan socket.sendfile
+    sehingga isi file tidak pernah disalin ke Python.
+    parts (opsional) berisi potongan body berurutan: bytes apa adanya
+    atau (offset, count) dari file, dipakai untuk multipart/byteranges
+    """
+
+    def __init__(self, header, file, offset=0, count=0, parts=None):
+        self.header = header
+        self.file = file
+        self.offset = offset
+        self.count = count
+        self.parts = parts if parts is not None else [(offset, count)]
+
+    def send(self, connection):
+        try:
+            connection.sendall(self.header)
+            for part in self.parts:
+                if isinstance(part, bytes):
+                    connection.sendall(part)
+                else:
+                    self.send_slice(connection, *part)
+        finally:
+            self.file.close()
+
+    def send_slice(self, connection, offset, count):
+        if isinstance(connection, ssl.SSLSocket):
+            # TLS harus dienkripsi di userspace, kirim per potongan
+            self.file.seek(offset)
+            remaining = count
+            while remaining > 0:
+                chunk = self.file.read(min(TLS_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                connection.sendall(chunk)
+                remaining -= len(chunk)
+        elif count > 0:
+            connection.sendfile(self.file, offset, count)
+
+    def close(self):
+        self.file.close()
+
+
+class RequestBody:
+    """
+    Body request yang di-stream ke file sementara di direktori server.
+    http_post cukup me-rename file ini ke nama tujuan (atomic), sehingga
+    upload besar tidak pernah ditampung di memori
+    """
+
+    def __init__(self, directory='.'):
+        # mtime direktori sebelum file sementara dibuat, untuk DirectoryIndex.update
+        self.dir_mtime_ns = DirectoryIndex.mtime(directory)
+        fd, self.path = tempfile.mkstemp(prefix='.upload-', suffix='.tmp', dir=directory)
+        os.chmod(self.path, 0o644)  # mkstemp membuat 0600, samakan dengan file biasa
+        self.file = os.fdopen(fd, 'wb')
+        self.size = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+
+    def finish(self):
+        self.file.close()
+
+    def discard(self):
+        """Hapus file sementara jika belum dipindahkan oleh http_post"""
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __len__(self):
+        return self.size
+
+
+def recv_body(connection, pending, content_length, scratch=None):
+    """
+    Terima body sepanjang content_length ke RequestBody.
+    pending: bytearray berisi byte yang sudah terbaca bersama header (dikonsumsi).
+    scratch: bytearray yang dipakai ulang untuk recv_into
+    """
+    body = RequestBody()
+    try:
+        head = pending[:content_length]
+        body.write(head)
+        del pending[:content_length]
+        remaining = content_length - len(head)
         
-        return response
-    
-    def proses(self, headers, body):
+        if scratch is None:
+            scratch = bytearray(BODY_CHUNK_SIZE)
+        view = memoryview(scratch)
+        while remaining > 0:
+            n = connection.recv_into(view, min(len(scratch), remaining))
+            if n == 0:
+                raise ConnectionError(f"Body tidak lengkap, kurang {remaining} bytes")
+            body.write(view[:n])
+            remaining -= n
+        body.finish()
+        return body
+    except BaseException:
+        body.discard()
+        raise
+
+
+def parse_range(value, size):
+    """
+    Parse header Range 'bytes=a-b, c-, -n' menjadi list (start, end) inklusif.
+    None jika header tidak valid (diabaikan), [] jika tidak ada range yang memenuhi (416)
+    """
+    unit, _, spec = value.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for item in spec.split(','):
+        first, sep, last = item.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first == '':
+                # suffix range: n byte terakhir
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(first)
+                if last:
+                    end = int(last)
+                    if end < start:
+                        return None
+                else:
+                    end = size - 1
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+    return ranges
+
+
+class ResponseCache:
+    """
+    LRU cache (dibatasi total byte) untuk response file yang sudah jadi.
+    Entry divalidasi dengan (st_mtime_ns, st_size) sehingga file yang
+    berubah di disk tidak pernah dilayani dari cache.
+    Key berupa (path, encoding); invalidate(path) membuang semua varian
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()  # key -> ((mtime_ns, size), data)
+        self.variants = {}  # path -> set(key)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def accepts(self, size):
+        return size <= self.max_entry_bytes and size <= self.max_bytes
+
+    def get(self, key, st):
+        validator = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == validator:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, st, data, size=None):
+        """size: ukuran body yang disimpan (default ukuran file)"""
+        if not self.accepts(st.st_size if size is None else size) or len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = ((st.st_mtime_ns, st.st_size), data)
+            self.variants.setdefault(key[0], set()).add(key)
+            self.current_bytes += len(data)
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, path):
+        """Buang semua varian (identity dan terkompresi) milik path"""
+        with self.lock:
+            for key in self.variants.pop(path, ()):
+                if key in self.entries:
+                    self._remove(key)
+
+    def _remove(self, key):
+        _, data = self.entries.pop(key)
+        self.current_bytes -= len(data)
+        keys = self.variants.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.variants[key[0]]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class DirectoryIndex:
+    """
+    Index isi satu direktori di memori (nama -> ukuran, mtime).
+    Dibangun sekali dengan os.scandir, lalu diperbarui per file oleh
+    POST/DELETE server ini dan (opsional) watcher inotify. Tanpa watcher,
+    mtime direktori dicek tiap query: file yang dibuat, dihapus atau di-rename
+    process lain (worker prefork, copy manual) memicu scan ulang, tapi isi file
+    lama yang diubah di tempat (ukuran/mtime) baru terlihat dengan --watch
+    """
+
+    def __init__(self, directory='.', watch=False):
+        self.directory = directory
+        self.watch = watch
+        self.entries = {}  # name -> (size, mtime)
+        self.dir_mtime_ns = None  # None = belum pernah di-scan / perlu scan ulang
+        self.snapshot = None  # (files, digest, names, urutan lain) sampai index berubah
+        self.watcher = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def mtime(directory):
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def is_hidden(self, name):
+        return name.startswith('.upload-')  # upload yang sedang berjalan
+
+    def rebuild(self):
+        # mtime diambil sebelum scan: perubahan selama scan memicu scan berikutnya
+        dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        entries = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if self.is_hidden(entry.name):
+                    continue
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        entries[entry.name] = (st.st_size, st.st_mtime)
+                except OSError:
+                    continue  # file hilang di tengah scan
+        with self.lock:
+            self.entries = entries
+            self.dir_mtime_ns = dir_mtime_ns
+            self.snapshot = None
+
+    def refresh(self):
+        if self.watch and self.watcher is None:
+            self.start_watcher()
+        if self.watcher is not None and self.dir_mtime_ns is not None:
+            return  # watcher yang menjaga index tetap sinkron
+        try:
+            current = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            current = None
+        if current is None or current != self.dir_mtime_ns:
+            self.rebuild()
+
+    def update(self, name, before_mtime_ns=None):
         """
-        Memproses HTTP request berdasarkan method dan path
+        Sinkronkan satu entry dengan disk (dipanggil setelah upload/hapus).
+        before_mtime_ns: mtime direktori sebelum perubahan ini; jika sama dengan
+        index, mtime baru dicatat, selain itu ada perubahan lain yang belum
+        diketahui dan index ditandai basi (dibangun ulang oleh query berikutnya)
         """
+        if self.is_hidden(name):
+            return
         try:
-            requests = headers.split("\r\n")
-            baris = requests[0]
-            all_headers = [n for n in requests[1:] if n != '']
-            
-            j = baris.split(" ")
-            method = j[0].upper().strip()
-            object_address = j[1].strip()
-            
-            # Enhanced logging - TAMPILKAN DI CONSOLE JUGA
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"🔄 [{timestamp}] HTTP Server processing: {method} {object_address}")
-            
-            # Log headers jika verbose
-            if len(all_headers) > 0:
-                print(f"📋 Request headers: {len(all_headers)} lines")
-            
-            # Log body size jika ada
-            if body and len(body) > 0:
-                print(f"📦 Request body: {len(body)} bytes")
-            
-            # Route berdasarkan method
-            if method == 'GET':
-                print(f"📥 Processing GET request untuk {object_address}")
-                result = self.http_get(object_address, all_headers)
-                print(f"✅ GET {object_address} - completed")
-                return result
-            elif method == 'POST':
-                print(f"📤 Processing POST (upload) ke {object_address}")
-                result = self.http_post(object_address, all_headers, body)
-                print(f"✅ POST {object_address} - completed")
-                return result
-            elif method == 'DELETE':
-                print(f"🗑️  Processing DELETE untuk {object_address}")
-                result = self.http_delete(object_address, all_headers)
-                print(f"✅ DELETE {object_address} - completed")
-                return result
+            st = os.stat(os.path.join(self.directory, name))
+        except OSError:
+            st = None
+        after_mtime_ns = self.mtime(self.directory)
+        with self.lock:
+            if self.dir_mtime_ns is None:
+                return  # belum pernah di-scan, query pertama akan scan penuh
+            if st is not None and stat.S_ISREG(st.st_mode):
+                self.entries[name] = (st.st_size, st.st_mtime)
             else:
-                print(f"⚠️  Unsupported method: {method}")
-                return self.response(405, 'Method Not Allowed', 'Method tidak didukung', {})
-                
-        except (IndexError, ValueError) as e:
-            print(f"❌ Bad request: {str(e)}")
-            return self.response(400, 'Bad Request', f'Request tidak valid: {str(e)}', {})
-        except Exception as e:
-            print(f"❌ Server error dalam proses: {str(e)}")
-            return self.response(500, 'Internal Server Error', f'Server error: {str(e)}', {})
-    
-    def http_get(self, object_address, headers):
+                self.entries.pop(name, None)
+            self.snapshot = None
+            if self.watcher is not None:
+                return  # watcher yang menjaga index, mtime tidak dipakai
+            if before_mtime_ns is not None and before_mtime_ns == self.dir_mtime_ns:
+                self.dir_mtime_ns = after_mtime_ns
+            else:
+                self.dir_mtime_ns = None
+
+    def listing(self):
+        self.refresh()
+        with self.lock:
+            if self.snapshot is None:
+                files = []
+                digest = hashlib.blake2b(self.directory.encode('utf-8'), digest_size=8)
+                for name in sorted(self.entries):
+                    size, mtime = self.entries[name]
+                    modified = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    files.append({'name': name, 'size': size, 'modified': modified})
+                    digest.update(f"{name}\0{size}\0{modified}\n".encode('utf-8'))
+                self.snapshot = (files, digest.hexdigest(), [f['name'] for f in files], {})
+            return self.snapshot
+
+    def files(self):
+        """Return (daftar file terurut nama, digest isi listing)"""
+        files, digest, _, _ = self.listing()
+        return files, digest
+
+    def page(self, offset=0, limit=JSON_PAGE_SIZE, prefix='', sort='name'):
         """
-        Menangani GET request untuk download file atau list direktori
+        Satu halaman listing: return (jumlah file cocok, file di halaman, digest).
+        sort: name/size/modified, awalan '-' untuk urutan terbalik.
+        Urut nama + prefix memakai bisect: O(log n + limit) per halaman
         """
-        print(f"📥 GET handler: {object_address}")
-        
-        # Jika path berakhir dengan '/', tampilkan list file
-        if object_address == '/' or object_address.endswith('/'):
-            print(f"📁 Listing directory: {object_address}")
-            return self.list_directory(object_address)
-        
-        # Handle special endpoints
-        if object_address == '/files' or object_address == '/list':
-            print(f"📁 Special endpoint for file listing")
-            return self.list_directory('/')
-        
-        # Endpoint khusus lainnya
-        if object_address == '/info':
-            print(f"ℹ️  Info endpoint accessed")
-            return self.response(200, 'OK', 'HTTP File Server - Support GET, POST, DELETE', {})
-        if object_address == '/status':
-            file_count = len([f for f in os.listdir('.') if os.path.isfile(f)])
-            status_msg = f'Server aktif. Total file: {file_count}'
-            print(f"📊 Status endpoint: {file_count} files")
-            return self.response(200, 'OK', status_msg, {})
-        
-        # Download file
-        print(f"⬇️  Download request untuk: {object_address}")
-        return self.download_file(object_address)
-    
-    def list_directory(self, path):
+        files, digest, names, orders = self.listing()
+        field = sort.lstrip('-')
+        if field == 'name':
+            lo = bisect_left(names, prefix) if prefix else 0
+            hi = bisect_left(names, prefix + '\U0010ffff') if prefix else len(names)
+            matched = files
+        else:
+            with self.lock:
+                if field not in orders:
+                    orders[field] = sorted(files, key=lambda f: (f[field], f['name']))
+                matched = orders[field]
+            if prefix:
+                matched = [f for f in matched if f['name'].startswith(prefix)]
+            lo, hi = 0, len(matched)
+        total = hi - lo
+        if sort.startswith('-'):
+            end = max(hi - offset, lo)
+            return total, matched[max(end - limit, lo):end][::-1], digest
+        start = min(lo + offset, hi)
+        return total, matched[start:min(start + limit, hi)], digest
+
+    def count(self):
+        self.refresh()
+        return len(self.entries)
+
+    def start_watcher(self):
         """
-        Menampilkan daftar file dalam direktori
+        Jalankan thread inotify (Linux, via libc). Return False jika tidak
+        tersedia; index tetap jalan dengan pengecekan mtime direktori
         """
+        self.watch = False  # hanya dicoba sekali per process
         try:
-            # Tentukan direktori yang akan di-list
-            if path == '/' or path == '':
-                target_dir = '.'
-            else:
-                target_dir = '.' + path
-            
-            print(f"📂 Scanning directory: {target_dir}")
-            
-            if not os.path.isdir(target_dir):
-                print(f"❌ Directory not found: {target_dir}")
-                return self.response(404, 'Not Found', 'Direktori tidak ditemukan', {})
-            
-            # Ambil daftar file
-            files = []
-            for item in os.listdir(target_dir):
-                item_path = os.path.join(target_dir, item)
-                if os.path.isfile(item_path):
-                    size = os.path.getsize(item_path)
-                    modified = datetime.fromtimestamp(os.path.getmtime(item_path))
-                    files.append({
-                        'name': item,
-                        'size': size,
-                        'modified': modified.strftime('%Y-%m-%d %H:%M:%S')
-                    })
-            
-            # Urutkan berdasarkan nama
-            files.sort(key=lambda x: x['name'])
-            
-            print(f"📋 Found {len(files)} files in directory")
-            
-            # Buat response HTML yang lebih menarik
-            html_content = self.generate_file_list_html(files, path)
-            
-            return self.response(200, 'OK', html_content, {'Content-Type': 'text/html; charset=utf-8'})
-            
-        except Exception as e:
-            print(f"❌ Error reading directory: {str(e)}")
-            return self.response(500, 'Internal Server Error', f'Gagal membaca direktori: {str(e)}', {})
-    
-    def generate_file_list_html(self, files, path):
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                return False
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), INOTIFY_MASK) < 0:
+                os.close(fd)
+                return False
+        except (OSError, AttributeError):
+            return False
+        self.rebuild()
+        self.watcher = threading.Thread(target=self.watch_events, args=(fd,),
+                                        name='DirectoryIndexWatcher', daemon=True)
+        self.watcher.start()
+        return True
+
+    def watch_events(self, fd):
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except OSError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = struct.unpack_from('iIII', data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+                offset += 16 + length
+                if mask & IN_Q_OVERFLOW:
+                    self.rebuild()  # event hilang, scan ulang
+                elif name:
+                    self.update(os.fsdecode(name))
+        os.close(fd)
+        self.watcher = None
+
+
+class ConnectionRegistry:
+    """
+    Jumlah koneksi queued/active/completed tanpa menyimpan daftar future.
+    Diperbarui lewat done-callback (dan wrapper start untuk thread pool),
+    jadi biaya accept loop O(1) berapa pun jumlah koneksi aktif
+    """
+
+    def __init__(self):
+        self.submitted = 0
+        self.started = 0
+        self.finished = 0
+        self.failed = 0
+        self.track_start = False  # True jika worker berjalan di process yang sama
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+
+    def submit(self, executor, fn, *args):
         """
-        Generate HTML untuk daftar file
+        Submit fn ke executor. ThreadPoolExecutor: fn dibungkus agar start
+        tercatat; ProcessPoolExecutor: start terjadi di process lain, jadi
+        yang diketahui hanya pending (queued + active)
         """
-        print(f"🎨 Generating HTML for {len(files)} files")
-        
-        html = f"""<!DOCTYPE html>
+        with self.lock:
+            self.submitted += 1
+        if isinstance(executor, ThreadPoolExecutor):
+            self.track_start = True
+            future = executor.submit(self.run, fn, *args)
+        else:
+            future = executor.submit(fn, *args)
+        future.add_done_callback(self.done)
+        return future
+
+    def run(self, fn, *args):
+        with self.lock:
+            self.started += 1
+        return fn(*args)
+
+    def done(self, future):
+        failed = not future.cancelled() and future.exception() is not None
+        with self.lock:
+            self.finished += 1
+            if failed:
+                self.failed += 1
+            if self.finished == self.submitted:
+                self.idle.notify_all()
+        if failed:
+            logging.getLogger('HttpServer').error("❌ Connection handler failed: %s", future.exception())
+
+    def counts(self):
+        with self.lock:
+            counts = {'pending': self.submitted - self.finished, 'completed': self.finished, 'failed': self.failed}
+            if self.track_start:
+                counts['queued'] = self.submitted - self.started
+                counts['active'] = self.started - self.finished
+            return counts
+
+    def wait_idle(self, timeout=None):
+        """Tunggu sampai tidak ada koneksi pending; False jika timeout"""
+        with self.idle:
+            return self.idle.wait_for(lambda: self.finished == self.submitted, timeout)
+
+
+def compress_body(data, encoding):
+    """Kompres body sesuai content-coding HTTP"""
+    if encoding == 'br':
+        return brotli.compress(data)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if encoding == 'deflate':
+        return zlib.compress(data, 6)
+    return data
+
+
+def send_response(connection, hasil):
+    """Kirim hasil HttpServer.proses, baik bytes maupun FileResponse"""
+    if isinstance(hasil, FileResponse):
+        hasil.send(connection)
+    else:
+        connection.sendall(hasil)
+
+
+def response_summary(hasil):
+    """Return (status code, total byte termasuk header) dari hasil HttpServer.proses"""
+    if isinstance(hasil, FileResponse):
+        header = hasil.header
+        size = len(header) + sum(len(part) if isinstance(part, bytes) else part[1] for part in hasil.parts)
+    else:
+        header = hasil
+        size = len(hasil)
+    try:
+        status = int(header[9:12])
+    except ValueError:
+        status = 0
+    return status, size
+
+
+class AccessLog:
+    """
+    Access log terstruktur: satu baris JSON per request.
+    Baris dikumpulkan di memori lalu ditulis utuh dengan satu os.write
+    (O_APPEND) saat buffer penuh atau tiap flush_interval detik, sehingga
+    beberapa worker process bisa berbagi satu file tanpa baris terpotong
+    """
+
+    def __init__(self, path=None, buffer_bytes=64 * 1024, flush_interval=1.0):
+        self.fd = None
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.lines = []
+        self.buffered = 0
+        self.flusher_pid = None  # thread flusher tidak ikut ter-fork
+        self.lock = threading.Lock()
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        atexit.register(self.flush)
+
+    def record(self, address, request_line, status, bytes_in, bytes_out, timings):
+        """
+        timings: dict nama tahap -> detik (header, body, proses, send, total)
+        """
+        if self.fd is None:
+            return
+        method, _, target = request_line.partition(' ')
+        entry = {
+            'ts': round(time.time(), 3),
+            'remote': address[0] if address else None,
+            'pid': os.getpid(),
+            'method': method,
+            'path': target.rpartition(' ')[0] or target,
+            'status': status,
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+        }
+        for name, seconds in timings.items():
+            entry[f'{name}_ms'] = round(seconds * 1000, 3)
+        self.write(json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + '\n')
+
+    def write(self, line):
+        with self.lock:
+            if self.flusher_pid != os.getpid():
+                self.lines = []  # baris milik parent (jika ada) sudah ditulis parent
+                self.buffered = 0
+                self.flusher_pid = os.getpid()
+                threading.Thread(target=self.run_flusher, name='AccessLogFlusher', daemon=True).start()
+            self.lines.append(line)
+            self.buffered += len(line)
+            if self.buffered >= self.buffer_bytes:
+                self.flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if not self.lines or self.fd is None:
+            return
+        data = memoryview(''.join(self.lines).encode('utf-8'))
+        self.lines = []
+        self.buffered = 0
+        while data:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+    def run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+def parse_request_head(header_str):
+    """
+    Ambil Content-Length dan apakah client meminta koneksi persistent.
+    HTTP/1.1 default keep-alive, HTTP/1.0 hanya jika Connection: keep-alive
+    """
+    lines = header_str.split('\r\n')
+    content_length = 0
+    keep_alive = lines[0].rstrip().upper().endswith('HTTP/1.1')
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            try:
+                content_length = int(value.strip())
+            except ValueError:
+                content_length = -1
+        elif name == 'connection':
+            value = value.strip().lower()
+            if value == 'close':
+                keep_alive = False
+            elif value == 'keep-alive':
+                keep_alive = True
+    return content_length, keep_alive
+
+
+# Layout slot metrics (float64): counter per method x kelas status, lalu
+# counter/gauge tunggal, lalu bucket histogram durasi request
+METRIC_METHODS = ('GET', 'POST', 'DELETE', 'OTHER')
+METRIC_STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+M_REQUESTS = 0
+M_BYTES_IN = M_REQUESTS + len(METRIC_METHODS) * len(METRIC_STATUS_CLASSES)
+M_BYTES_OUT = M_BYTES_IN + 1
+M_CONNECTIONS = M_BYTES_OUT + 1
+M_CONNECTIONS_ACTIVE = M_CONNECTIONS + 1
+M_REQUESTS_ACTIVE = M_CONNECTIONS_ACTIVE + 1
+M_QUEUE_DEPTH = M_REQUESTS_ACTIVE + 1
+M_REJECTED = M_QUEUE_DEPTH + 1
+M_DURATION = M_REJECTED + 1  # satu slot per bucket + bucket +Inf
+M_DURATION_SUM = M_DURATION + len(DURATION_BUCKETS) + 1
+M_QUEUE_WAIT = M_DURATION_SUM + 1
+M_QUEUE_WAIT_SUM = M_QUEUE_WAIT + len(DURATION_BUCKETS) + 1
+METRIC_SLOTS = M_QUEUE_WAIT_SUM + 1
+GAUGE_SLOTS = (M_CONNECTIONS_ACTIVE, M_REQUESTS_ACTIVE, M_QUEUE_DEPTH)
+
+
+class MetricsRegistry:
+    """
+    Counter, gauge dan histogram server dalam satu blok slot float64.
+    Tiap process hanya menulis blok miliknya (satu Lock lokal yang hampir
+    tidak pernah berebut); mode multi-process memakai shared memory
+    berisi satu blok per process, dan /metrics menjumlahkan semua blok
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.shm = None
+        self.owner_pid = None  # process yang membuat shared memory (yang unlink)
+        self.blocks = 1
+        self.block = 0
+        self.slots = memoryview(bytearray(METRIC_SLOTS * 8)).cast('d')
+        self.lock = threading.Lock()
+
+    def attach_shared(self, blocks=1, name=None):
+        """
+        Pindah ke shared memory berisi `blocks` blok. Tanpa name: buat baru
+        (parent, sebelum worker dibuat); dengan name: buka milik parent
+        """
+        from multiprocessing import shared_memory
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=blocks * METRIC_SLOTS * 8)
+            self.shm.buf[:] = bytes(len(self.shm.buf))
+            self.owner_pid = os.getpid()
+            atexit.register(self.close_shared)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.blocks = blocks
+        self.slots = self.shm.buf.cast('d')
+        return self.shm.name
+
+    def close_shared(self):
+        if self.shm is None:
+            return
+        self.slots.release()
+        self.shm.close()
+        if self.owner_pid == os.getpid():
+            self.shm.unlink()
+        self.shm = None
+
+    def use_block(self, block):
+        """Dipanggil di worker: tulis ke blok sendiri, gauge dari worker lama di-reset"""
+        self.block = block
+        self.lock = threading.Lock()
+        base = block * METRIC_SLOTS
+        for slot in GAUGE_SLOTS:
+            self.slots[base + slot] = 0.0
+
+    def add(self, slot, amount=1):
+        with self.lock:
+            self.slots[self.block * METRIC_SLOTS + slot] += amount
+
+    def observe_request(self, method, status, bytes_in, bytes_out, duration):
+        """Catat satu request selesai (satu kali ambil lock)"""
+        method_index = METRIC_METHODS.index(method) if method in METRIC_METHODS else len(METRIC_METHODS) - 1
+        status_index = min(max(status // 100 - 1, 0), len(METRIC_STATUS_CLASSES) - 1)
+        bucket = bisect_left(DURATION_BUCKETS, duration)
+        base = self.block * METRIC_SLOTS
+        with self.lock:
+            slots = self.slots
+            slots[base + M_REQUESTS + method_index * len(METRIC_STATUS_CLASSES) + status_index] += 1
+            slots[base + M_BYTES_IN] += bytes_in
+            slots[base + M_BYTES_OUT] += bytes_out
+            slots[base + M_DURATION + bucket] += 1
+            slots[base + M_DURATION_SUM] += duration
+
+    def observe_queue_wait(self, seconds):
+        """Lama koneksi menunggu worker sejak di-accept"""
+        base = self.block * METRIC_SLOTS
+        with self.lock:
+            self.slots[base + M_QUEUE_WAIT + bisect_left(DURATION_BUCKETS, seconds)] += 1
+            self.slots[base + M_QUEUE_WAIT_SUM] += seconds
+
+    def totals(self):
+        """Jumlah semua blok (semua process)"""
+        totals = [0.0] * METRIC_SLOTS
+        slots = self.slots
+        for block in range(self.blocks):
+            base = block * METRIC_SLOTS
+            for slot in range(METRIC_SLOTS):
+                totals[slot] += slots[base + slot]
+        return totals
+
+    def render(self):
+        """Semua metrics dalam Prometheus text exposition format"""
+        totals = self.totals()
+        lines = [
+            '# HELP http_requests_total HTTP requests completed, by method and status class.',
+            '# TYPE http_requests_total counter',
+        ]
+        for m, method in enumerate(METRIC_METHODS):
+            for c, status_class in enumerate(METRIC_STATUS_CLASSES):
+                value = totals[M_REQUESTS + m * len(METRIC_STATUS_CLASSES) + c]
+                lines.append(f'http_requests_total{{method="{method}",code="{status_class}"}} {value:.0f}')
+        for name, kind, help_text, slot in (
+                ('http_request_bytes_total', 'counter', 'Request bytes received (headers and body).', M_BYTES_IN),
+                ('http_response_bytes_total', 'counter', 'Response bytes sent (headers and body).', M_BYTES_OUT),
+                ('http_connections_total', 'counter', 'Client connections accepted.', M_CONNECTIONS),
+                ('http_connections_active', 'gauge', 'Client connections currently open.', M_CONNECTIONS_ACTIVE),
+                ('http_requests_active', 'gauge', 'Requests currently being processed.', M_REQUESTS_ACTIVE),
+                ('http_pool_queue_depth', 'gauge', 'Connections or requests waiting for a pool worker.', M_QUEUE_DEPTH),
+                ('http_connections_rejected_total', 'counter', 'Connections answered 503 because the queue was full.', M_REJECTED)):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {totals[slot]:.0f}']
+        for name, help_text, base, sum_slot in (
+                ('http_request_duration_seconds', 'Time from first request byte to response sent.', M_DURATION, M_DURATION_SUM),
+                ('http_queue_wait_seconds', 'Time an accepted connection waited for a pool worker.', M_QUEUE_WAIT, M_QUEUE_WAIT_SUM)):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            cumulative = 0
+            for i, bound in enumerate(DURATION_BUCKETS + (float('inf'),)):
+                cumulative += totals[base + i]
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{le="{le}"}} {cumulative:.0f}')
+            lines.append(f'{name}_sum {totals[sum_slot]:.6f}')
+            lines.append(f'{name}_count {cumulative:.0f}')
+        lines += [
+            '# HELP http_server_start_time_seconds Unix time the server started.',
+            '# TYPE http_server_start_time_seconds gauge',
+            f'http_server_start_time_seconds {self.start_time:.3f}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+# Halaman listing: bagian statis dirender sekali saat import, per request
+# hanya baris tabel dan beberapa nilai yang diisi (lihat generate_file_list_html)
+LISTING_SHELL = """<!DOCTYPE html>
 <html lang="id">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Daftar File - HTTP Server</title>
     <style>
-        body {{ 
+        body { 
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
             margin: 0; 
             padding: 20px; 
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 1000px;
             margin: 0 auto;
             background: white;
             border-radius: 10px;
             box-shadow: 0 10px 30px rgba(0,0,0,0.3);
             overflow: hidden;
-        }}
-        .header {{
+        }
+        .header {
             background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
             color: white;
             padding: 30px;
             text-align: center;
-        }}
-        .header h1 {{
+        }
+        .header h1 {
             margin: 0;
             font-size: 2.2em;
             font-weight: 300;
-        }}
-        .stats {{
+        }
+        .stats {
             background: #f8f9fa;
             padding: 15px 30px;
             border-bottom: 1px solid #e9ecef;
             color: #6c757d;
-        }}
-        .file-table {{
+        }
+        .file-table {
             width: 100%;
             border-collapse: collapse;
-        }}
-        .file-table th {{
+        }
+        .file-table th {
             background: #343a40;
             color: white;
             padding: 15px;
             text-align: left;
             font-weight: 500;
-        }}
-        .file-table td {{
+        }
+        .file-table td {
             padding: 12px 15px;
             border-bottom: 1px solid #e9ecef;
             vertical-align: middle;
-        }}
-        .file-table tr:hover {{
+        }
+        .file-table tr:hover {
             background: #f8f9fa;
-        }}
-        .file-name {{
+        }
+        .file-name {
             font-weight: 500;
             color: #2c3e50;
-        }}
-        .file-size {{
+        }
+        .file-size {
             color: #6c757d;
             text-align: right;
-        }}
-        .file-date {{
+        }
+        .file-date {
             color: #6c757d;
             font-size: 0.9em;
-        }}
-        .actions {{
+        }
+        .actions {
             text-align: center;
-        }}
-        .btn {{
+        }
+        .btn {
             display: inline-block;
             padding: 6px 12px;
             margin: 2px;
@@ -282,54 +921,55 @@ class HttpServer:
             font-size: 0.85em;
             cursor: pointer;
             transition: all 0.3s;
-        }}
-        .btn-download {{
+        }
+        .btn-download {
             background: #28a745;
             color: white;
-        }}
-        .btn-download:hover {{
+        }
+        .btn-download:hover {
             background: #218838;
-        }}
-        .btn-delete {{
+        }
+        .btn-delete {
             background: #dc3545;
             color: white;
-        }}
-        .btn-delete:hover {{
+        }
+        .btn-delete:hover {
             background: #c82333;
-        }}
-        .empty-state {{
+        }
+        .empty-state {
             text-align: center;
             padding: 60px 30px;
             color: #6c757d;
-        }}
-        .upload-info {{
+        }
+        .upload-info {
             background: #e3f2fd;
             border-left: 4px solid #2196f3;
             padding: 15px 20px;
             margin: 20px 30px;
             border-radius: 4px;
-        }}
-        .server-info {{
+        }
+        .server-info {
             background: #f1f8e9;
             border-left: 4px solid #4caf50;
             padding: 10px 20px;
             margin: 10px 30px;
             border-radius: 4px;
             font-size: 0.9em;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <div class="header">
             <h1>🚀 HTTP File Server</h1>
-            <p>📁 Direktori: {path if path != '/' else 'Root'}</p>
+            <p>📁 Direktori: """
+LISTING_STATS = """</p>
         </div>
         
         <div class="stats">
-            <strong>📊 Total file:</strong> {len(files)} | 
+            <strong>📊 Total file:</strong> {count} | 
             <strong>🖥️  Server:</strong> FileServer/2.0 | 
-            <strong>⏰ Waktu:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            <strong>⏰ Waktu:</strong> {waktu}
         </div>
         
         <div class="server-info">
@@ -343,17 +983,14 @@ class HttpServer:
             Semua aktivitas akan tercatat di log server.
         </div>
 """
-        
-        if len(files) == 0:
-            html += """
+LISTING_EMPTY = """
         <div class="empty-state">
             <h3>📂 Direktori Kosong</h3>
             <p>Belum ada file dalam direktori ini.</p>
             <p>Upload file menggunakan client atau POST request.</p>
         </div>
 """
-        else:
-            html += """
+LISTING_TABLE_OPEN = """
         <table class="file-table">
             <thead>
                 <tr>
@@ -365,27 +1002,22 @@ class HttpServer:
             </thead>
             <tbody>
 """
-            
-            for file_info in files:
-                size_formatted = self.format_file_size(file_info['size'])
-                html += f"""
+LISTING_ROW = """
                 <tr>
-                    <td class="file-name">{file_info['name']}</td>
-                    <td class="file-size">{size_formatted}</td>
-                    <td class="file-date">{file_info['modified']}</td>
+                    <td class="file-name">{name}</td>
+                    <td class="file-size">{size}</td>
+                    <td class="file-date">{modified}</td>
                     <td class="actions">
-                        <a href="/{file_info['name']}" class="btn btn-download">⬇️ Download</a>
-                        <button onclick="deleteFile('{file_info['name']}')" class="btn btn-delete">🗑️ Hapus</button>
+                        <a href="/{name}" class="btn btn-download">⬇️ Download</a>
+                        <button onclick="deleteFile('{name}')" class="btn btn-delete">🗑️ Hapus</button>
                     </td>
                 </tr>
 """
-            
-            html += """
+LISTING_TABLE_CLOSE = """
             </tbody>
         </table>
 """
-        
-        html += """
+LISTING_SCRIPT = """
     </div>
     
     <script>
@@ -415,12 +1047,408 @@ class HttpServer:
         }, 30000);
         
         // Log page load
-        console.log('📄 File listing page loaded with """ + str(len(files)) + """ files');
+        console.log('📄 File listing page loaded with """
+LISTING_END = """ files');
     </script>
 </body>
 </html>
 """
-        return html
+
+
+class HttpServer:
+    """
+    HTTP Server yang mendukung operasi file: list, upload, delete
+    Dengan logging yang enhanced
+    """
+    
+    def __init__(self, cache_bytes=64 * 1024 * 1024):
+        self.sessions = {}
+        self.types = {
+            '.pdf': 'application/pdf',
+            '.jpg': 'image/jpeg',
+            '.jpeg': 'image/jpeg',
+            '.png': 'image/png',
+            '.gif': 'image/gif',
+            '.txt': 'text/plain',
+            '.html': 'text/html',
+            '.htm': 'text/html',
+            '.css': 'text/css',
+            '.js': 'application/javascript',
+            '.json': 'application/json',
+            '.xml': 'application/xml',
+            '.zip': 'application/zip',
+            '.mp4': 'video/mp4',
+            '.mp3': 'audio/mpeg',
+            '.doc': 'application/msword',
+            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            '.bin': 'application/octet-stream'
+        }
+        # Setup logger untuk HTTP server
+        self.logger = logging.getLogger('HttpServer')
+        # State per-request (mis. keep-alive) untuk thread yang sedang memproses
+        self.context = threading.local()
+        # Cache response file yang sering diminta
+        self.cache = ResponseCache(max_bytes=cache_bytes)
+        # Index direktori kerja untuk listing dan /status
+        self.index = DirectoryIndex('.')
+        # ConnectionRegistry milik accept loop (jika server di process yang sama)
+        self.connections = None
+        # SSLContext listener TLS (server_thread_http_secure), untuk statistik sesi di /status
+        self.tls_context = None
+        # Counter/histogram untuk /metrics (di-share antar process jika attach_shared)
+        self.metrics = MetricsRegistry()
+        # (digest listing, baris tabel HTML) terakhir yang dirender
+        self.rendered_rows = (None, '')
+    
+    def record_request(self, address, request_line, hasil, bytes_in, timings, access_log=None):
+        """
+        Catat request yang sudah terkirim ke metrics dan (jika ada) access log
+        """
+        status, bytes_out = response_summary(hasil)
+        self.metrics.observe_request(request_line.partition(' ')[0], status, bytes_in, bytes_out, timings['total'])
+        if access_log is not None:
+            access_log.record(address, request_line, status, bytes_in, bytes_out, timings)
+    
+    def response_prefix(self, kode, message):
+        """
+        Bagian header yang berubah tiap request: status line, Date, Connection
+        """
+        tanggal = datetime.now().strftime('%c')
+        resp = []
+        resp.append(f"HTTP/1.1 {kode} {message}\r\n")
+        resp.append(f"Date: {tanggal}\r\n")
+        if getattr(self.context, 'keep_alive', False):
+            resp.append("Connection: keep-alive\r\n")
+        else:
+            resp.append("Connection: close\r\n")
+        return ''.join(resp).encode('utf-8')
+
+    def response_fields(self, content_length, headers={}):
+        """
+        Bagian header yang tetap untuk body yang sama (bisa di-cache bersama body)
+        """
+        resp = []
+        resp.append("Server: FileServer/2.0\r\n")
+        if content_length is not None:
+            resp.append(f"Content-Length: {content_length}\r\n")
+        
+        # Tambahkan headers custom
+        for key, value in headers.items():
+            resp.append(f"{key}: {value}\r\n")
+        
+        resp.append("\r\n")
+        return ''.join(resp).encode('utf-8')
+
+    def response_header(self, kode, message, content_length, headers={}):
+        """
+        Membuat bagian header dari HTTP response (bytes)
+        """
+        return self.response_prefix(kode, message) + self.response_fields(content_length, headers)
+
+    def response(self, kode=404, message='Not Found', messagebody=bytes(), headers={}):
+        """
+        Membuat HTTP response dengan format yang benar
+        """
+        # Pastikan messagebody dalam bytes
+        if type(messagebody) is not bytes:
+            messagebody = messagebody.encode('utf-8')
+        
+        # Kompresi on-the-fly untuk body dinamis (mis. listing HTML)
+        if len(messagebody) >= COMPRESS_MIN_SIZE and self.is_compressible(headers.get('Content-Type')):
+            headers = {**headers, 'Vary': 'Accept-Encoding'}
+            encoding = self.negotiate_encoding(getattr(self.context, 'accept_encoding', None))
+            if encoding is not None:
+                messagebody = compress_body(messagebody, encoding)
+                headers['Content-Encoding'] = encoding
+        
+        response = self.response_header(kode, message, len(messagebody), headers) + messagebody
+        
+        # Log response yang dibuat
+        self.logger.debug("📤 Generated response: %s %s (%d bytes)", kode, message, len(messagebody))
+        
+        return response
+    
+    def header_value(self, headers, name):
+        """
+        Ambil nilai header request (case-insensitive) dari list 'Nama: nilai'
+        """
+        name = name.lower()
+        for line in headers:
+            key, _, value = line.partition(':')
+            if key.strip().lower() == name:
+                return value.strip()
+        return None
+
+    def file_validators(self, st, encoding=None):
+        """
+        ETag kuat dari inode/mtime/size dan Last-Modified dari mtime.
+        Varian terkompresi mendapat ETag berbeda
+        """
+        suffix = f'-{encoding}' if encoding else ''
+        etag = f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}{suffix}"'
+        return etag, formatdate(st.st_mtime, usegmt=True)
+
+    def is_compressible(self, content_type):
+        if not content_type:
+            return False
+        content_type = content_type.split(';', 1)[0].strip()
+        return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+
+    def negotiate_encoding(self, accept_encoding):
+        """
+        Pilih encoding terbaik dari header Accept-Encoding (menghormati q=0)
+        """
+        if not accept_encoding:
+            return None
+        accepted = {}
+        for item in accept_encoding.split(','):
+            name, _, params = item.strip().partition(';')
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[name.strip().lower()] = q
+        for encoding in SUPPORTED_ENCODINGS:
+            if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+                return encoding
+        return None
+
+    def is_not_modified(self, headers, etag, mtime=None):
+        """
+        Cek If-None-Match (prioritas) lalu If-Modified-Since
+        """
+        if_none_match = self.header_value(headers, 'If-None-Match')
+        if if_none_match is not None:
+            if if_none_match == '*':
+                return True
+            # If-None-Match memakai perbandingan weak
+            tag = etag.removeprefix('W/')
+            return any(t.strip().removeprefix('W/') == tag for t in if_none_match.split(','))
+        
+        if_modified_since = self.header_value(headers, 'If-Modified-Since')
+        if if_modified_since is not None and mtime is not None:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def not_modified(self, headers={}):
+        """
+        Response 304 tanpa body, hanya membawa validator
+        """
+        self.logger.debug("📤 Generated response: 304 Not Modified")
+        return self.response_prefix(304, 'Not Modified') + self.response_fields(None, headers)
+
+    def proses(self, headers, body, keep_alive=False):
+        """
+        Memproses HTTP request berdasarkan method dan path.
+        keep_alive menentukan header Connection pada response
+        """
+        self.context.keep_alive = keep_alive
+        try:
+            requests = headers.split("\r\n")
+            baris = requests[0]
+            all_headers = [n for n in requests[1:] if n != '']
+            
+            j = baris.split(" ")
+            method = j[0].upper().strip()
+            object_address = j[1].strip()
+            self.context.accept_encoding = self.header_value(all_headers, 'Accept-Encoding')
+            
+            # Trace per request hanya di level DEBUG (argumen diformat jika level aktif)
+            self.logger.debug("🔄 HTTP Server processing: %s %s", method, object_address)
+            
+            # Log headers jika verbose
+            if len(all_headers) > 0:
+                self.logger.debug("📋 Request headers: %s lines", len(all_headers))
+            
+            # Log body size jika ada
+            if body and len(body) > 0:
+                self.logger.debug("📦 Request body: %s bytes", len(body))
+            
+            # Route berdasarkan method
+            if method == 'GET':
+                self.logger.debug("📥 Processing GET request untuk %s", object_address)
+                result = self.http_get(object_address, all_headers)
+                self.logger.debug("✅ GET %s - completed", object_address)
+                return result
+            elif method == 'POST':
+                self.logger.debug("📤 Processing POST (upload) ke %s", object_address)
+                result = self.http_post(object_address, all_headers, body)
+                self.logger.debug("✅ POST %s - completed", object_address)
+                return result
+            elif method == 'DELETE':
+                self.logger.debug("🗑️  Processing DELETE untuk %s", object_address)
+                result = self.http_delete(object_address, all_headers)
+                self.logger.debug("✅ DELETE %s - completed", object_address)
+                return result
+            else:
+                self.logger.warning("⚠️  Unsupported method: %s", method)
+                return self.response(405, 'Method Not Allowed', 'Method tidak didukung', {})
+                
+        except (IndexError, ValueError) as e:
+            self.logger.warning("❌ Bad request: %s", e)
+            return self.response(400, 'Bad Request', f'Request tidak valid: {str(e)}', {})
+        except Exception as e:
+            self.logger.error("❌ Server error dalam proses: %s", e)
+            return self.response(500, 'Internal Server Error', f'Server error: {str(e)}', {})
+        finally:
+            self.context.keep_alive = False
+            self.context.accept_encoding = None
+    
+    def http_get(self, object_address, headers):
+        """
+        Menangani GET request untuk download file atau list direktori
+        """
+        self.logger.debug("📥 GET handler: %s", object_address)
+        object_address, _, query = object_address.partition('?')
+        
+        # Jika path berakhir dengan '/', tampilkan list file
+        if object_address == '/' or object_address.endswith('/'):
+            self.logger.debug("📁 Listing directory: %s", object_address)
+            return self.list_directory(object_address, headers)
+        
+        # Handle special endpoints
+        if object_address == '/files' or object_address == '/list':
+            params = parse_qs(query, keep_blank_values=True)
+            if params.get('format', [''])[0] == 'json':
+                self.logger.debug("📁 JSON listing: %s", query)
+                return self.list_json(params, headers)
+            self.logger.debug("📁 Special endpoint for file listing")
+            return self.list_directory('/', headers)
+        
+        # Endpoint khusus lainnya
+        if object_address == '/info':
+            self.logger.debug("ℹ️  Info endpoint accessed")
+            return self.response(200, 'OK', 'HTTP File Server - Support GET, POST, DELETE', {})
+        if object_address == '/metrics':
+            return self.response(200, 'OK', self.metrics.render(), {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+        if object_address == '/status':
+            file_count = self.index.count()
+            cache = self.cache.stats()
+            status_msg = (f'Server aktif. Total file: {file_count}. '
+                          f'Cache: {cache["entries"]} entries, {cache["bytes"]}/{cache["max_bytes"]} bytes, '
+                          f'hits={cache["hits"]} misses={cache["misses"]} evictions={cache["evictions"]}')
+            if self.connections is not None:
+                status_msg += '. Koneksi: ' + ', '.join(f'{k}={v}' for k, v in self.connections.counts().items())
+            if self.tls_context is not None:
+                tls = self.tls_context.session_stats()
+                status_msg += (f'. TLS: handshakes={tls["accept_good"]}, resumed={tls["hits"]}, '
+                               f'cache={tls["number"]}, timeouts={tls["timeouts"]}')
+            self.logger.debug("📊 Status endpoint: %s files", file_count)
+            return self.response(200, 'OK', status_msg, {})
+        
+        # Download file
+        self.logger.debug("⬇️  Download request untuk: %s", object_address)
+        return self.download_file(object_address, headers)
+    
+    def list_directory(self, path, headers=[]):
+        """
+        Menampilkan daftar file dalam direktori
+        """
+        try:
+            # Tentukan direktori yang akan di-list
+            if path == '/' or path == '':
+                target_dir = '.'
+            else:
+                target_dir = '.' + path
+            
+            self.logger.debug("📂 Listing directory: %s", target_dir)
+            
+            if not os.path.isdir(target_dir):
+                self.logger.debug("❌ Directory not found: %s", target_dir)
+                return self.response(404, 'Not Found', 'Direktori tidak ditemukan', {})
+            
+            # Direktori kerja dilayani dari index di memori; subdirektori di-scan sekali pakai
+            index = self.index if target_dir == '.' else DirectoryIndex(target_dir)
+            files, digest = index.files()
+            
+            self.logger.debug("📋 Found %s files in directory", len(files))
+            
+            # Validator listing: berubah hanya jika nama/ukuran/waktu file berubah
+            validator_headers = {'ETag': f'W/"{digest}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+            
+            if self.is_not_modified(headers, validator_headers['ETag']):
+                self.logger.debug("✅ Listing not modified")
+                return self.not_modified(validator_headers)
+            
+            # Buat response HTML yang lebih menarik
+            html_content = self.generate_file_list_html(files, path, digest)
+            
+            return self.response(200, 'OK', html_content, {'Content-Type': 'text/html; charset=utf-8', **validator_headers})
+            
+        except Exception as e:
+            self.logger.error("❌ Error reading directory: %s", e)
+            return self.response(500, 'Internal Server Error', f'Gagal membaca direktori: {str(e)}', {})
+    
+    def list_json(self, params, headers=[]):
+        """
+        Listing direktori kerja dalam JSON ringkas, per halaman:
+        /files?format=json&offset=0&limit=100&prefix=&sort=name|size|modified (awalan '-' = terbalik)
+        """
+        try:
+            offset = int(params.get('offset', ['0'])[0] or 0)
+            limit = int(params.get('limit', [str(JSON_PAGE_SIZE)])[0] or JSON_PAGE_SIZE)
+        except ValueError:
+            return self.response(400, 'Bad Request', 'offset/limit harus angka', {})
+        prefix = params.get('prefix', [''])[0]
+        sort = params.get('sort', ['name'])[0] or 'name'
+        if offset < 0 or limit < 1 or sort.lstrip('-') not in LISTING_SORTS:
+            return self.response(400, 'Bad Request', 'Parameter listing tidak valid', {})
+        limit = min(limit, JSON_MAX_PAGE_SIZE)
+        
+        try:
+            total, files, digest = self.index.page(offset, limit, prefix, sort)
+        except OSError as e:
+            self.logger.error("❌ Error reading directory: %s", e)
+            return self.response(500, 'Internal Server Error', f'Gagal membaca direktori: {str(e)}', {})
+        
+        # Validator per halaman: isi direktori + parameter query
+        query = hashlib.blake2b(f"{offset}\0{limit}\0{prefix}\0{sort}".encode('utf-8'), digest_size=4).hexdigest()
+        validator_headers = {'ETag': f'W/"{digest}-{query}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if self.is_not_modified(headers, validator_headers['ETag']):
+            return self.not_modified(validator_headers)
+        
+        next_offset = offset + limit if offset + limit < total else None
+        body = json.dumps({'total': total, 'offset': offset, 'limit': limit, 'next': next_offset, 'files': files},
+                          separators=(',', ':'), ensure_ascii=False)
+        self.logger.debug("📋 JSON listing: %s of %s files", len(files), total)
+        return self.response(200, 'OK', body, {'Content-Type': 'application/json', **validator_headers})
+    
+    def generate_file_list_html(self, files, path, digest=None):
+        """
+        Generate HTML untuk daftar file.
+        Shell halaman sudah jadi (LISTING_*); baris tabel dirender sekali per
+        isi direktori (digest dari DirectoryIndex) lalu dipakai ulang
+        """
+        self.logger.debug("🎨 Generating HTML for %s files", len(files))
+        
+        if len(files) == 0:
+            table = LISTING_EMPTY
+        else:
+            table = self.render_rows(files, digest)
+        
+        stats = LISTING_STATS.format(count=len(files), waktu=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        return ''.join((LISTING_SHELL, path if path != '/' else 'Root', stats, table,
+                        LISTING_SCRIPT, str(len(files)), LISTING_END))
+    
+    def render_rows(self, files, digest=None):
+        rendered = self.rendered_rows
+        if digest is not None and rendered[0] == digest:
+            return rendered[1]
+        row = LISTING_ROW.format
+        format_size = self.format_file_size
+        table = ''.join([LISTING_TABLE_OPEN]
+                        + [row(name=file_info['name'], size=format_size(file_info['size']),
+                               modified=file_info['modified']) for file_info in files]
+                        + [LISTING_TABLE_CLOSE])
+        if digest is not None:
+            self.rendered_rows = (digest, table)
+        return table
     
     def format_file_size(self, size_bytes):
         """Format ukuran file menjadi human readable"""
@@ -433,7 +1461,7 @@ class HttpServer:
             i += 1
         return f"{size_bytes:.1f} {size_names[i]}"
     
-    def download_file(self, object_address):
+    def download_file(self, object_address, request_headers=[]):
         """
         Download file dari server
         """
@@ -441,85 +1469,217 @@ class HttpServer:
             # Hapus leading slash
             object_address = object_address[1:] if object_address.startswith('/') else object_address
             
-            print(f"⬇️  Download request: {object_address}")
+            self.logger.debug("⬇️  Download request: %s", object_address)
             
             # Security check - cegah directory traversal
             if '..' in object_address or object_address.startswith('/'):
-                print(f"🛡️  Security: Invalid file path blocked: {object_address}")
+                self.logger.warning("🛡️  Security: Invalid file path blocked: %s", object_address)
                 return self.response(400, 'Bad Request', 'Invalid file path', {})
             
             file_path = './' + object_address
             
-            # Cek apakah file ada
-            if not os.path.exists(file_path):
-                print(f"❌ File not found: {file_path}")
+            # Cek apakah file ada (satu stat, sekaligus validator cache)
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                self.logger.debug("❌ File not found: %s", file_path)
                 return self.response(404, 'Not Found', f'File "{object_address}" tidak ditemukan', {})
             
-            if not os.path.isfile(file_path):
-                print(f"❌ Path is not a file: {file_path}")
+            if not stat.S_ISREG(st.st_mode):
+                self.logger.debug("❌ Path is not a file: %s", file_path)
                 return self.response(400, 'Bad Request', 'Path bukan file', {})
             
-            # Baca file
-            with open(file_path, 'rb') as fp:
-                file_content = fp.read()
-            
-            file_size = len(file_content)
-            print(f"✅ File read successfully: {object_address} ({self.format_file_size(file_size)})")
-            
             # Tentukan content type berdasarkan ekstensi
             file_ext = os.path.splitext(file_path)[1].lower()
             content_type = self.types.get(file_ext, 'application/octet-stream')
             
+            # Range request selalu dilayani dari representasi identity
+            range_header = self.header_value(request_headers, 'Range')
+            compressible = self.is_compressible(content_type)
+            encoding = None
+            if compressible and range_header is None and COMPRESS_MIN_SIZE <= st.st_size <= COMPRESS_MAX_SIZE:
+                encoding = self.negotiate_encoding(self.header_value(request_headers, 'Accept-Encoding'))
+            
+            # Conditional GET: client sudah punya versi ini
+            etag, last_modified = self.file_validators(st, encoding)
+            if self.is_not_modified(request_headers, etag, st.st_mtime):
+                self.logger.debug("✅ Not modified: %s", object_address)
+                validator_headers = {'ETag': etag, 'Last-Modified': last_modified}
+                if compressible:
+                    validator_headers['Vary'] = 'Accept-Encoding'
+                return self.not_modified(validator_headers)
+            
+            # Range request: kirim hanya potongan yang diminta langsung dari disk
+            if range_header is not None and self.if_range_matches(request_headers, etag, last_modified):
+                result = self.range_response(file_path, content_type, range_header)
+                if result is not None:
+                    self.logger.debug("✅ Partial content: %s (%s)", object_address, range_header)
+                    return result
+            
+            # Cache hit: response sudah jadi (varian terkompresi punya key sendiri)
+            cache_key = (file_path, encoding)
+            cached = self.cache.get(cache_key, st)
+            if cached is not None:
+                self.logger.debug("✅ Cache hit: %s", object_address)
+                return self.response_prefix(200, 'OK') + cached
+            
+            fp = open(file_path, 'rb')
+            st = os.fstat(fp.fileno())
+            file_size = st.st_size
+            etag, last_modified = self.file_validators(st, encoding)
+            
             headers = {
                 'Content-Type': content_type,
-                'Content-Disposition': f'attachment; filename="{object_address}"'
+                'Content-Disposition': f'attachment; filename="{object_address}"',
+                'ETag': etag,
+                'Last-Modified': last_modified,
+                'Accept-Ranges': 'bytes'
             }
+            if compressible:
+                headers['Vary'] = 'Accept-Encoding'
+            
+            # File besar: kirim langsung dari disk tanpa dibaca ke memori
+            if encoding is None and file_size > SENDFILE_THRESHOLD and not self.cache.accepts(file_size):
+                self.logger.debug("✅ File streamed from disk: %s (%d bytes)", object_address, file_size)
+                header = self.response_header(200, 'OK', file_size, headers)
+                return FileResponse(header, fp, 0, file_size)
+            
+            # Baca file
+            with fp:
+                file_content = fp.read()
+            
+            self.logger.debug("✅ File read successfully: %s (%d bytes)", object_address, file_size)
             
-            return self.response(200, 'OK', file_content, headers)
+            # Kompres sekali, hasilnya disimpan di cache sampai mtime berubah
+            if encoding is not None:
+                file_content = compress_body(file_content, encoding)
+                headers['Content-Encoding'] = encoding
+                self.logger.debug("🗜️  Compressed %s with %s: %d bytes", object_address, encoding, len(file_content))
+            
+            cached = self.response_fields(len(file_content), headers) + file_content
+            self.cache.put(cache_key, st, cached, len(file_content))
+            return self.response_prefix(200, 'OK') + cached
             
         except Exception as e:
-            print(f"❌ Error reading file {object_address}: {str(e)}")
+            self.logger.error("❌ Error reading file %s: %s", object_address, e)
             return self.response(500, 'Internal Server Error', f'Error reading file: {str(e)}', {})
     
+    def if_range_matches(self, headers, etag, last_modified):
+        """
+        If-Range: range hanya dipakai jika validator client masih sama (strong compare)
+        """
+        if_range = self.header_value(headers, 'If-Range')
+        if if_range is None:
+            return True
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            return if_range == etag
+        return if_range == last_modified
+
+    def range_response(self, file_path, content_type, range_header):
+        """
+        Buat response 206 (satu range atau multipart/byteranges) atau 416.
+        Mengembalikan None jika header Range harus diabaikan (response penuh)
+        """
+        fp = open(file_path, 'rb')
+        try:
+            st = os.fstat(fp.fileno())
+            size = st.st_size
+            ranges = parse_range(range_header, size)
+            if ranges is None or len(ranges) > MAX_RANGES:
+                fp.close()
+                return None
+            
+            if not ranges:
+                fp.close()
+                return self.response(416, 'Range Not Satisfiable', '', {'Content-Range': f'bytes */{size}'})
+            
+            etag, last_modified = self.file_validators(st)
+            headers = {'ETag': etag, 'Last-Modified': last_modified, 'Accept-Ranges': 'bytes'}
+            
+            if len(ranges) == 1:
+                start, end = ranges[0]
+                count = end - start + 1
+                headers['Content-Type'] = content_type
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                header = self.response_header(206, 'Partial Content', count, headers)
+                return FileResponse(header, fp, start, count)
+            
+            # Beberapa range: multipart/byteranges, tiap bagian tetap diambil dari disk
+            boundary = secrets.token_hex(12)
+            parts = []
+            content_length = 0
+            for start, end in ranges:
+                part_header = (f"\r\n--{boundary}\r\n"
+                               f"Content-Type: {content_type}\r\n"
+                               f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode('utf-8')
+                parts.append(part_header)
+                parts.append((start, end - start + 1))
+                content_length += len(part_header) + end - start + 1
+            closing = f"\r\n--{boundary}--\r\n".encode('utf-8')
+            parts.append(closing)
+            content_length += len(closing)
+            
+            headers['Content-Type'] = f'multipart/byteranges; boundary={boundary}'
+            header = self.response_header(206, 'Partial Content', content_length, headers)
+            return FileResponse(header, fp, parts=parts)
+        except Exception:
+            fp.close()
+            raise
+
     def http_post(self, object_address, headers, body):
         """
-        Menangani POST request untuk upload file
+        Menangani POST request untuk upload file.
+        body berupa RequestBody (sudah di disk) atau bytes
         """
         try:
             # Hapus leading slash untuk nama file
             file_name = object_address[1:] if object_address.startswith('/') else object_address
             
-            print(f"📤 Upload request: {file_name}")
+            self.logger.debug("📤 Upload request: %s", file_name)
             
             # Security check
             if '..' in file_name or '/' in file_name:
-                print(f"🛡️  Security: Invalid filename blocked: {file_name}")
+                self.logger.warning("🛡️  Security: Invalid filename blocked: %s", file_name)
                 return self.response(400, 'Bad Request', 'Invalid filename', {})
             
             if not file_name:
                 # Generate nama file jika kosong
                 file_name = f"upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.bin"
-                print(f"📝 Generated filename: {file_name}")
+                self.logger.debug("📝 Generated filename: %s", file_name)
             
             file_path = './' + file_name
             
-            # Tulis file
-            with open(file_path, 'wb') as f:
-                f.write(body)
-            
+            # Tulis file: body sudah di disk (RequestBody) tinggal di-rename,
+            # body bytes ditulis ke file sementara dulu agar tetap atomic
+            if not isinstance(body, RequestBody):
+                data = body
+                body = RequestBody()
+                try:
+                    body.write(data)
+                    body.finish()
+                except BaseException:
+                    body.discard()
+                    raise
             file_size = len(body)
+            before_mtime_ns = body.dir_mtime_ns
+            try:
+                os.replace(body.path, file_path)
+            except BaseException:
+                body.discard()
+                raise
+            self.cache.invalidate(file_path)
+            self.index.update(file_name, before_mtime_ns)
+            
             size_formatted = self.format_file_size(file_size)
             
             success_msg = f'File "{file_name}" berhasil diupload ({size_formatted})'
-            print(f"✅ Upload successful: {file_name} - {size_formatted}")
-            print(f"📤 [UPLOAD SUCCESS] {file_name} - {size_formatted}")
+            self.logger.info("📤 Upload successful: %s - %s", file_name, size_formatted)
             
             return self.response(201, 'Created', success_msg, {})
             
         except Exception as e:
             error_msg = f'Upload gagal: {str(e)}'
-            print(f"❌ Upload failed: {error_msg}")
-            print(f"❌ [UPLOAD ERROR] {error_msg}")
+            self.logger.error("❌ Upload failed: %s", error_msg)
             return self.response(500, 'Internal Server Error', error_msg, {})
     
     def http_delete(self, object_address, headers):
@@ -530,47 +1690,47 @@ class HttpServer:
             # Hapus leading slash
             file_name = object_address[1:] if object_address.startswith('/') else object_address
             
-            print(f"🗑️  Delete request: {file_name}")
+            self.logger.debug("🗑️  Delete request: %s", file_name)
             
             # Security check
             if '..' in file_name or '/' in file_name:
-                print(f"🛡️  Security: Invalid filename blocked: {file_name}")
+                self.logger.warning("🛡️  Security: Invalid filename blocked: %s", file_name)
                 return self.response(400, 'Bad Request', 'Invalid filename', {})
             
             if not file_name:
-                print(f"❌ Empty filename for delete")
+                self.logger.debug("❌ Empty filename for delete")
                 return self.response(400, 'Bad Request', 'Filename tidak boleh kosong', {})
             
             file_path = './' + file_name
             
             # Cek apakah file ada
             if not os.path.exists(file_path):
-                print(f"❌ File not found for delete: {file_name}")
+                self.logger.debug("❌ File not found for delete: %s", file_name)
                 return self.response(404, 'Not Found', f'File "{file_name}" tidak ditemukan', {})
             
             # Cek apakah itu file (bukan direktori)
             if not os.path.isfile(file_path):
-                print(f"❌ Cannot delete directory: {file_name}")
+                self.logger.debug("❌ Cannot delete directory: %s", file_name)
                 return self.response(400, 'Bad Request', 'Tidak bisa menghapus direktori', {})
             
             # Hapus file
+            before_mtime_ns = self.index.mtime(self.index.directory)
             os.remove(file_path)
+            self.cache.invalidate(file_path)
+            self.index.update(file_name, before_mtime_ns)
             
             success_msg = f'File "{file_name}" berhasil dihapus'
-            print(f"✅ Delete successful: {file_name}")
-            print(f"🗑️  [DELETE SUCCESS] {file_name}")
+            self.logger.info("🗑️  Delete successful: %s", file_name)
             
             return self.response(200, 'OK', success_msg, {})
             
         except OSError as e:
             error_msg = f'Gagal menghapus file: {str(e)}'
-            print(f"❌ Delete failed (OS): {error_msg}")
-            print(f"❌ [DELETE ERROR] {error_msg}")
+            self.logger.error("❌ Delete failed (OS): %s", error_msg)
             return self.response(500, 'Internal Server Error', error_msg, {})
         except Exception as e:
             error_msg = f'Error: {str(e)}'
-            print(f"❌ Delete failed: {error_msg}")
-            print(f"❌ [DELETE ERROR] {error_msg}")
+            self.logger.error("❌ Delete failed: %s", error_msg)
             return self.response(500, 'Internal Server Error', error_msg, {})
 
 # Test jika dijalankan langsung
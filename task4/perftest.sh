@@ -3,3 +3,10 @@
 
 ab -n 100 -c 50 http://localhost:8887/testing.txt
 
+
+# keep-alive (thread pool server): satu koneksi TCP dipakai banyak request
+ab -n 1000 -c 50 http://localhost:8880/testing.txt
+ab -k -n 1000 -c 50 http://localhost:8880/testing.txt
+
+# asyncio server (server_async_http.py / server_asyncio_stream_http.py)
+ab -k -n 1000 -c 500 http://localhost:8887/testing.txt
@@ -1,51 +1,10 @@
-import socket
-import time
 import sys
-import asyncore
+import asyncio
 import logging
-from http import HttpServer
+from server_asyncio_stream_http import Server
 
-httpserver = HttpServer()
-rcv = ""
-
-class ProcessTheClient(asyncore.dispatcher_with_send):
-	def handle_read(self):
-		global rcv
-		data = self.recv(1024)
-		if data:
-			d = data.decode()
-			rcv = rcv + d
-			if rcv[-2:] == '\r\n':
-				# end of command, proses string
-				logging.warning("data dari client: {}".format(rcv))
-				hasil = httpserver.proses(rcv)
-				#hasil sudah dalam bentuk bytes
-				hasil = hasil + "\r\n\r\n".encode()
-				#agar bisa dioperasikan dengan string \r\n\r\n maka harus diencode dulu => bytes
-				logging.warning("balas ke  client: {}".format(hasil))
-				self.send(hasil) #hasil sudah dalam bentuk bytes, kirimkan balik ke client
-				rcv = ""
-				self.close()
-
-		#self.send('HTTP/1.1 200 OK \r\n\r\n'.encode())
-			#self.send("{}" . format(httpserver.proses(d)))
-		self.close()
-
-class Server(asyncore.dispatcher):
-	def __init__(self,portnumber):
-		asyncore.dispatcher.__init__(self)
-		self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.set_reuse_addr()
-		self.bind(('',portnumber))
-		self.listen(1)
-		logging.warning("running on port {}" . format(portnumber))
-
-	def handle_accept(self):
-		pair = self.accept()
-		if pair is not None:
-			sock, addr = pair
-			logging.warning("connection from {}" . format(repr(addr)))
-			handler = ProcessTheClient(sock)
+# asyncore sudah dihapus di Python 3.12; entry point ini sekarang
+# menjalankan server asyncio (lihat server_asyncio_stream_http.py)
 
 def main():
 	portnumber=8887
@@ -53,9 +12,11 @@ def main():
 		portnumber=int(sys.argv[1])
 	except:
 		pass
-	svr = Server(portnumber)
-	asyncore.loop()
+	logging.warning("running on port {}" . format(portnumber))
+	try:
+		asyncio.run(Server(host='0.0.0.0', port=portnumber))
+	except KeyboardInterrupt:
+		pass
 
 if __name__=="__main__":
 	main()
-
@@ -1,46 +1,241 @@
-from socket import *
-import socket
-import time
-import sys
-import logging
-import multiprocessing
-from concurrent.futures import ProcessPoolExecutor
 import asyncio
-from http import HttpServer
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HttpServer, FileResponse, RequestBody, AccessLog, BODY_CHUNK_SIZE, parse_request_head, setup_logging
+from http import M_CONNECTIONS, M_CONNECTIONS_ACTIVE, M_REQUESTS_ACTIVE, M_QUEUE_DEPTH
+
+# Setup logging (asynchronous: QueueHandler -> QueueListener)
+setup_logging()
 
+# Global HTTP server instance (dipakai bersama oleh semua koneksi)
 httpserver = HttpServer()
+# Access log terstruktur (aktif dengan --access-log)
+access_log = AccessLog()
+
+MAX_HEADER_SIZE = 32768  # 32KB max headers
+
+
+async def send_response(writer, hasil):
+    """
+    Kirim hasil HttpServer.proses ke client.
+    FileResponse dikirim dengan loop.sendfile (zero-copy jika transport mendukung,
+    selain itu asyncio membaca file di executor sehingga loop tidak terblokir)
+    """
+    if isinstance(hasil, FileResponse):
+        try:
+            writer.write(hasil.header)
+            await writer.drain()
+            loop = asyncio.get_running_loop()
+            for part in hasil.parts:
+                if isinstance(part, bytes):
+                    writer.write(part)
+                    await writer.drain()
+                elif part[1] > 0:
+                    await loop.sendfile(writer.transport, hasil.file, part[0], part[1])
+        finally:
+            hasil.close()
+    else:
+        writer.write(hasil)
+        await writer.drain()
+
+
+def run_proses(header_str, body_data, keep_alive):
+    """HttpServer.proses di thread executor; keluar dari antrian saat mulai jalan"""
+    httpserver.metrics.add(M_QUEUE_DEPTH, -1)
+    return httpserver.proses(header_str, body_data, keep_alive)
+
+
+async def read_body(reader, content_length, executor):
+    """
+    Stream body request ke RequestBody (file sementara); penulisan ke disk
+    dijalankan di executor sehingga event loop tidak terblokir
+    """
+    loop = asyncio.get_running_loop()
+    body = await loop.run_in_executor(executor, RequestBody)
+    try:
+        remaining = content_length
+        while remaining > 0:
+            chunk = await asyncio.wait_for(reader.read(min(BODY_CHUNK_SIZE, remaining)), 120.0)
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            await loop.run_in_executor(executor, body.write, chunk)
+            remaining -= len(chunk)
+        await loop.run_in_executor(executor, body.finish)
+        return body
+    except BaseException:
+        body.discard()
+        raise
+
+
+async def ProcessTheClient(reader, writer, executor, keepalive_timeout=5.0, max_requests=100):
+    """
+    Coroutine untuk satu koneksi client.
+    Framing memakai Content-Length, koneksi bisa keep-alive; semua pekerjaan
+    disk (HttpServer.proses) dijalankan di executor agar event loop tidak blocking
+    """
+    address = writer.get_extra_info('peername')
+    loop = asyncio.get_running_loop()
+    start_time = time.time()
+    requests_served = 0
+    metrics = httpserver.metrics
+    metrics.add(M_CONNECTIONS)
+    metrics.add(M_CONNECTIONS_ACTIVE)
+
+    try:
+        logging.info(f"[Async] Processing connection from {address}")
+
+        while requests_served < max_requests:
+            # Request pertama boleh lambat; di antara request pakai idle timeout
+            timeout = 120.0 if requests_served == 0 else keepalive_timeout
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+            except asyncio.IncompleteReadError:
+                break  # client menutup koneksi
+            except asyncio.LimitOverrunError:
+                logging.warning(f"[Async] Header terlalu besar dari {address}")
+                writer.write(httpserver.response(431, 'Request Header Fields Too Large', 'Header terlalu besar', {}))
+                await writer.drain()
+                break
+            except asyncio.TimeoutError:
+                if requests_served == 0:
+                    logging.warning(f"[Async] Timeout dari {address}")
+                break
+
+            # readuntil tidak memberi tahu kapan byte pertama tiba, jadi
+            # waktu baca header tidak tercatat di access log mode ini
+            request_start = time.perf_counter()
+            header_str = head[:-4].decode('utf-8', errors='ignore')
+
+            content_length, client_keep_alive = parse_request_head(header_str)
+            if content_length < 0:
+                logging.warning(f"[Async] Invalid Content-Length dari {address}")
+                writer.write(httpserver.response(400, 'Bad Request', 'Invalid Content-Length', {}))
+                await writer.drain()
+                break
+
+            body_data = b""
+            if content_length > 0:
+                try:
+                    body_data = await read_body(reader, content_length, executor)
+                except asyncio.IncompleteReadError:
+                    logging.warning(f"[Async] Body tidak lengkap dari {address}")
+                    break
+
+            requests_served += 1
+            keep_alive = client_keep_alive and requests_served < max_requests
+            body_done = time.perf_counter()
+
+            logging.debug(f"[Async] Received {len(header_str)} bytes headers + {len(body_data)} bytes body from {address}")
+
+            metrics.add(M_REQUESTS_ACTIVE)
+            try:
+                # Proses request di executor (baca/tulis file tidak memblokir loop)
+                metrics.add(M_QUEUE_DEPTH)
+                try:
+                    hasil = await loop.run_in_executor(executor, run_proses, header_str, body_data, keep_alive)
+                finally:
+                    if isinstance(body_data, RequestBody):
+                        body_data.discard()  # no-op jika sudah di-rename oleh http_post
+                proses_done = time.perf_counter()
+
+                await send_response(writer, hasil)
+                send_done = time.perf_counter()
+            finally:
+                metrics.add(M_REQUESTS_ACTIVE, -1)
+
+            httpserver.record_request(address, header_str.partition('\r\n')[0], hasil, len(head) + content_length, {
+                'body': body_done - request_start, 'proses': proses_done - body_done,
+                'send': send_done - proses_done, 'total': send_done - request_start}, access_log)
+            logging.debug(f"[Async] Completed request #{requests_served} from {address} in {send_done - request_start:.3f}s")
+
+            if not keep_alive:
+                break
+
+    except asyncio.TimeoutError:
+        logging.warning(f"[Async] Timeout dari {address}")
+    except (ConnectionResetError, BrokenPipeError):
+        logging.warning(f"[Async] Connection reset oleh {address}")
+    except Exception as e:
+        logging.error(f"[Async] Error processing {address}: {str(e)}")
+    finally:
+        metrics.add(M_CONNECTIONS_ACTIVE, -1)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+        total_time = time.time() - start_time
+        logging.info(f"[Async] Connection {address} closed after {requests_served} requests (total: {total_time:.3f}s)")
+
+
+async def Server(host='127.0.0.1', port=8886, io_workers=8, keepalive_timeout=5.0, max_requests=100):
+    """
+    Main server function dengan asyncio: satu process, satu event loop,
+    ribuan koneksi idle tidak memakan thread
+    """
+    executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="HTTPAsyncIO")
+
+    server = await asyncio.start_server(
+        lambda r, w: ProcessTheClient(r, w, executor, keepalive_timeout, max_requests),
+        host, port, limit=MAX_HEADER_SIZE, backlog=1024, reuse_address=True)
+
+    logging.info(f"Asyncio Server started on {host}:{port}")
+    print(f"\n{'='*60}")
+    print(f"🚀 HTTP FILE SERVER - ASYNCIO MODE")
+    print(f"{'='*60}")
+    print(f"📡 Address: http://{host}:{port}")
+    print(f"🔧 I/O Workers: {io_workers}")
+    print(f"🔁 Keep-Alive: {keepalive_timeout}s idle, {max_requests} requests/connection")
+    print(f"📁 Working Directory: {os.getcwd()}")
+    print(f"{'='*60}")
+    print(f"Press Ctrl+C to stop server")
+    print()
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(wait=False)
+        logging.info("Asyncio Server stopped")
+
 
-class ProcessTheClient(asyncio.Protocol):
-		def connection_made(self, transport):
-			peername = transport.get_extra_info('peername')
-			print('Connection from {}'.format(peername))
-			self.transport = transport
-			self.rcv = ""
-		def data_received(self, data: bytes) -> None:
-			try:
-				d = data.decode()
-				self.rcv=self.rcv+d
-				if self.rcv[-2:]=='\r\n':
-					hasil = httpserver.proses(self.rcv)
-					hasil=hasil+"\r\n\r\n".encode()
-					self.transport.write(hasil)
-					self.transport.close()
-					self.rcv=""
-			except OSError as e:
-				pass
+def main():
+    """
+    Main function dengan argument parsing
+    """
+    import argparse
 
+    parser = argparse.ArgumentParser(description='HTTP File Server with asyncio')
+    parser.add_argument('--host', default='127.0.0.1', help='Server host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8886, help='Server port (default: 8886)')
+    parser.add_argument('--io-workers', type=int, default=8, help='Thread untuk disk I/O (default: 8)')
+    parser.add_argument('--keepalive-timeout', type=float, default=5.0, help='Idle timeout keep-alive dalam detik (default: 5)')
+    parser.add_argument('--max-requests', type=int, default=100, help='Max request per koneksi (default: 100)')
+    parser.add_argument('--cache-mb', type=int, default=64, help='Batas memori cache response dalam MB, 0 = nonaktif (default: 64)')
+    parser.add_argument('--watch', action='store_true', help='Pantau direktori dengan inotify untuk index listing (Linux)')
+    parser.add_argument('--access-log', help='File access log JSON (satu baris per request)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
 
+    args = parser.parse_args()
 
-async def Server():
-	loop = asyncio.get_running_loop()
+    # Set logging level
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
 
-	server = await loop.create_server(
-		lambda: ProcessTheClient(),
-		'0.0.0.0', 8886)
+    httpserver.cache.max_bytes = args.cache_mb * 1024 * 1024
+    httpserver.index.watch = args.watch
+    if args.access_log:
+        access_log.open(args.access_log)
 
-	async with server:
-		await server.serve_forever()
+    try:
+        asyncio.run(Server(host=args.host, port=args.port, io_workers=args.io_workers,
+                           keepalive_timeout=args.keepalive_timeout, max_requests=args.max_requests))
+    except KeyboardInterrupt:
+        print("\nShutting down...")
 
-if __name__=="__main__":
-	asyncio.run(Server())
 
+if __name__ == "__main__":
+    main()
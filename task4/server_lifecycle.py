@@ -0,0 +1,140 @@
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+
+# Hanya stdlib: dipakai server task4 (lewat http.py) dan server task-ets
+
+# Restart tanpa downtime: generasi baru menerima fd listener lewat environment ini
+LISTEN_FD_ENV = 'HTTP_LISTEN_FD'
+# Interval accept loop memeriksa permintaan berhenti
+ACCEPT_POLL_INTERVAL = 0.5
+
+
+class ServerLifecycle:
+    """
+    Shutdown bertahap dan restart tanpa downtime untuk accept loop.
+    SIGTERM: berhenti accept, koneksi idle diputus, request in-flight
+    ditunggu paling lama drain_timeout. SIGHUP: generasi baru (argv sama)
+    dijalankan dengan fd listener diwariskan; generasi ini baru berhenti
+    accept setelah generasi baru mengirim SIGUSR2 (siap), lalu drain.
+    Dipakai juga server task-ets lewat subclass di task-ets/file_lifecycle.py
+    """
+
+    listen_fd_env = LISTEN_FD_ENV
+    logger_name = 'HttpServer'
+
+    def __init__(self, drain_timeout=30.0):
+        self.drain_timeout = drain_timeout
+        self.stopping = threading.Event()
+        self.listen_socket = None
+        self.successor = None
+        self.inherited = False
+        # Generasi baru dijalankan dengan perintah dan direktori awal process ini
+        self.command = [sys.executable] + sys.argv
+        self.cwd = os.getcwd()
+        self.connections = set()  # semua koneksi yang sedang dilayani
+        self.idle = set()  # koneksi yang menunggu request berikutnya
+        self.logger = logging.getLogger(self.logger_name)
+
+    def adopt_listener(self):
+        """Socket listener warisan generasi sebelumnya, atau None"""
+        fd = os.environ.pop(self.listen_fd_env, None)
+        if fd is None:
+            return None
+        self.inherited = True
+        # Kosong: generasi sebelumnya tanpa listener bersama (SO_REUSEPORT)
+        return socket.socket(fileno=int(fd)) if fd else None
+
+    def start(self, listen_socket):
+        """
+        Pasang signal handler; panggil setelah listener siap menerima koneksi.
+        listen_socket None: tiap worker punya listener sendiri (SO_REUSEPORT),
+        generasi baru membuat listener-nya sendiri, tidak ada fd yang diwariskan
+        """
+        self.listen_socket = listen_socket
+        if listen_socket is not None:
+            listen_socket.settimeout(ACCEPT_POLL_INTERVAL)  # accept loop memeriksa self.stopping
+        signal.signal(signal.SIGTERM, self.handle_term)
+        signal.signal(signal.SIGHUP, self.handle_hup)
+        signal.signal(signal.SIGUSR2, self.handle_ready)
+        if self.inherited:
+            os.kill(os.getppid(), signal.SIGUSR2)
+            self.logger.info("♻️  Listener diambil alih dari generasi pid %d", os.getppid())
+
+    def accept(self):
+        """accept() yang mengembalikan None setelah server diminta berhenti"""
+        while not self.stopping.is_set():
+            try:
+                return self.listen_socket.accept()
+            except socket.timeout:
+                continue
+        return None
+
+    def stop(self):
+        self.stopping.set()
+        for connection in list(self.idle):
+            try:
+                connection.shutdown(socket.SHUT_RD)  # recv yang sedang menunggu langsung dapat EOF
+            except OSError:
+                pass
+
+    def handle_term(self, signum, frame):
+        self.logger.warning("🛑 SIGTERM: berhenti menerima koneksi, drain maks %.0fs", self.drain_timeout)
+        self.stop()
+
+    def handle_hup(self, signum, frame):
+        if self.stopping.is_set():
+            self.logger.warning("⚠️  SIGHUP diabaikan: generasi ini sedang drain")
+            return
+        if self.successor is not None and self.successor.poll() is None:
+            self.logger.warning("⚠️  SIGHUP diabaikan: generasi baru (pid %d) belum siap", self.successor.pid)
+            return
+        fd = None if self.listen_socket is None else self.listen_socket.fileno()
+        env = dict(os.environ, **{self.listen_fd_env: '' if fd is None else str(fd)})
+        pass_fds = () if fd is None else (fd,)
+        self.successor = subprocess.Popen(self.command, cwd=self.cwd, env=env, pass_fds=pass_fds)
+        self.logger.warning("♻️  SIGHUP: menjalankan generasi baru pid %d", self.successor.pid)
+
+    def handle_ready(self, signum, frame):
+        if self.successor is None:
+            return
+        self.logger.warning("♻️  Generasi baru pid %d siap, generasi ini drain lalu keluar", self.successor.pid)
+        self.stop()
+
+    def receive(self, connection, size, idle=False):
+        """
+        recv biasa; idle=True untuk menunggu request berikutnya, yang
+        mengembalikan b'' (seperti client menutup) jika server sedang berhenti
+        """
+        if not idle:
+            return connection.recv(size)
+        self.idle.add(connection)
+        try:
+            if self.stopping.is_set():
+                return b""
+            return connection.recv(size)
+        finally:
+            self.idle.discard(connection)
+
+    def drain(self, registry):
+        """
+        Tunggu semua koneksi selesai paling lama drain_timeout; yang
+        masih tersisa diputus agar process bisa keluar
+        """
+        pending = registry.counts()['pending']
+        if pending:
+            self.logger.info("⏳ Menunggu %d koneksi selesai (maks %.0fs)...", pending, self.drain_timeout)
+        if registry.wait_idle(self.drain_timeout):
+            self.logger.info("✅ Semua koneksi selesai")
+            return True
+        self.logger.warning("⌛ Drain timeout, memutus %d koneksi", len(self.connections))
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return False
@@ -2,23 +2,36 @@ from socket import *
 import socket
 import logging
 import multiprocessing as mp
+from multiprocessing.connection import wait
 import time
 import os
+import signal
 from concurrent.futures import ProcessPoolExecutor
-from http import HttpServer
+from http import HttpServer, RequestBody, AccessLog, ConnectionRegistry, ServerLifecycle, send_response, recv_body, setup_logging
+from http import ACCEPT_POLL_INTERVAL, M_CONNECTIONS, M_CONNECTIONS_ACTIVE, M_REQUESTS_ACTIVE, M_QUEUE_DEPTH
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Setup logging (asynchronous: QueueHandler -> QueueListener)
+setup_logging()
 
-# Global HTTP server instance (akan dibuat di setiap process)
+# Global HTTP server instance (satu per process, dipakai ulang untuk semua koneksi)
 httpserver = HttpServer()
+# Access log terstruktur (aktif dengan --access-log), fd diwarisi worker prefork
+access_log = AccessLog()
+# SIGTERM drain / SIGHUP handoff: di parent (pool) atau supervisor (prefork);
+# worker prefork memakai salinan hasil fork untuk berhenti accept
+lifecycle = ServerLifecycle()
 
-def ProcessTheClient(connection, address):
+def ProcessTheClient(connection, address, queued=False):
     """
-    Fungsi untuk memproses client dalam process terpisah
+    Fungsi untuk memproses client dalam process terpisah.
+    queued=True jika koneksi datang lewat antrian ProcessPoolExecutor
     """
     process_id = os.getpid()
     start_time = time.time()
+    metrics = httpserver.metrics
+    if queued:
+        metrics.add(M_QUEUE_DEPTH, -1)
+    metrics.add(M_CONNECTIONS_ACTIVE)
     
     try:
         logging.info(f"[Process-{process_id}] Processing connection from {address}")
@@ -28,10 +41,13 @@ def ProcessTheClient(connection, address):
         
         # Terima headers dulu sampai ketemu double CRLF
         headers_data = b""
+        request_start = None
         while b"\r\n\r\n" not in headers_data:
             data = connection.recv(1024)
             if not data:
                 break
+            if request_start is None:
+                request_start = time.perf_counter()
             headers_data += data
             
             # Batasi ukuran header maksimal (security)
@@ -51,6 +67,7 @@ def ProcessTheClient(connection, address):
             body_part = b""
         
         header_str = header_part.decode('utf-8', errors='ignore')
+        header_done = time.perf_counter()
         
         # Cari Content-Length dari header
         content_length = 0
@@ -62,32 +79,39 @@ def ProcessTheClient(connection, address):
                 except ValueError:
                     logging.warning(f"[Process-{process_id}] Invalid Content-Length dari {address}")
         
-        # Baca sisa body jika diperlukan
-        body_data = body_part
-        bytes_read = len(body_part)
+        # Body di-stream ke file sementara (memori tetap sebesar buffer recv_into)
+        body_data = b""
+        if content_length > 0:
+            try:
+                body_data = recv_body(connection, bytearray(body_part), content_length)
+            except ConnectionError:
+                logging.warning(f"[Process-{process_id}] Body tidak lengkap dari {address}")
+                return
         
-        while bytes_read < content_length:
-            bytes_to_read = min(8192, content_length - bytes_read)  # Read in 8KB chunks
-            data = connection.recv(bytes_to_read)
-            if not data:
-                break
-            body_data += data
-            bytes_read += len(data)
-        
-        logging.info(f"[Process-{process_id}] Received {len(header_str)} bytes headers + {len(body_data)} bytes body from {address}")
-        
-        # Buat instance HTTP server baru untuk process ini
-        local_httpserver = HttpServer()
+        body_done = time.perf_counter()
+        logging.debug(f"[Process-{process_id}] Received {len(header_str)} bytes headers + {len(body_data)} bytes body from {address}")
         
-        # Proses request menggunakan HTTP server
-        hasil = local_httpserver.proses(header_str, body_data)
-        
-        # Kirim response
-        connection.sendall(hasil)
+        metrics.add(M_REQUESTS_ACTIVE)
+        try:
+            # Proses request menggunakan HTTP server milik process ini
+            try:
+                hasil = httpserver.proses(header_str, body_data)
+            finally:
+                if isinstance(body_data, RequestBody):
+                    body_data.discard()  # no-op jika sudah di-rename oleh http_post
+            proses_done = time.perf_counter()
+            
+            # Kirim response
+            send_response(connection, hasil)
+            send_done = time.perf_counter()
+        finally:
+            metrics.add(M_REQUESTS_ACTIVE, -1)
         
-        # Log completion time
-        processing_time = time.time() - start_time
-        logging.info(f"[Process-{process_id}] Completed {address} in {processing_time:.3f}s")
+        httpserver.record_request(address, header_str.partition('\r\n')[0], hasil, len(header_part) + 4 + content_length, {
+            'header': header_done - request_start, 'body': body_done - header_done,
+            'proses': proses_done - body_done, 'send': send_done - proses_done,
+            'total': send_done - request_start}, access_log)
+        logging.debug(f"[Process-{process_id}] Completed {address} in {send_done - request_start:.3f}s")
         
     except socket.timeout:
         logging.warning(f"[Process-{process_id}] Timeout dari {address}")
@@ -96,6 +120,7 @@ def ProcessTheClient(connection, address):
     except Exception as e:
         logging.error(f"[Process-{process_id}] Error processing {address}: {str(e)}")
     finally:
+        metrics.add(M_CONNECTIONS_ACTIVE, -1)
         try:
             connection.close()
         except:
@@ -104,22 +129,25 @@ def ProcessTheClient(connection, address):
         total_time = time.time() - start_time
         logging.info(f"[Process-{process_id}] Connection {address} closed (total: {total_time:.3f}s)")
 
-def Server(host='127.0.0.1', port=8881, max_workers=10):
+def Server(host='127.0.0.1', port=8881, max_workers=10, access_log_path=None, cache_mb=None, watch=False):
     """
     Main server function dengan Process Pool
     """
-    the_clients = []
-    
-    # Buat socket server
-    my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    # Optimasi socket buffer
-    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # 64KB receive buffer
-    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)  # 64KB send buffer
+    # Listener warisan generasi sebelumnya (SIGHUP) sudah bind + listen
+    my_socket = lifecycle.adopt_listener()
+    inherited = my_socket is not None
+    if not inherited:
+        # Buat socket server
+        my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        
+        # Optimasi socket buffer
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # 64KB receive buffer
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)  # 64KB send buffer
     
     try:
-        my_socket.bind((host, port))
+        if not inherited:
+            my_socket.bind((host, port))
         logging.info(f"Process Pool Server started on {host}:{port}")
         logging.info(f"Max workers: {max_workers}")
         logging.info(f"Server ready to accept connections...")
@@ -129,10 +157,13 @@ def Server(host='127.0.0.1', port=8881, max_workers=10):
         print(f"📡 Address: http://{host}:{port}")
         print(f"🔧 Max Workers: {max_workers}")
         print(f"📁 Working Directory: {os.getcwd()}")
+        print(f"♻️  SIGTERM: drain maks {lifecycle.drain_timeout:.0f}s | SIGHUP: restart tanpa downtime (pid {os.getpid()})")
         print(f"{'='*60}")
         print(f"Available endpoints:")
         print(f"  📋 GET  /           - Server info") 
         print(f"  📋 GET  /files      - List files")
+        print(f"  📋 GET  /files?format=json&offset=&limit=&prefix=&sort= - List files (JSON)")
+        print(f"  📈 GET  /metrics    - Prometheus metrics")
         print(f"  📤 POST /filename   - Upload file")
         print(f"  🗑️  DELETE /filename - Delete file")
         print(f"  📥 GET  /filename   - Download file")
@@ -140,34 +171,52 @@ def Server(host='127.0.0.1', port=8881, max_workers=10):
         print(f"Press Ctrl+C to stop server")
         print()
         
-        my_socket.listen(100)  # Backlog queue
+        if not inherited:
+            my_socket.listen(100)  # Backlog queue
+        
+        # Metrics di shared memory: blok 0 milik parent, blok 1..N milik worker
+        metrics_name = httpserver.metrics.attach_shared(blocks=max_workers + 1)
+        worker_counter = mp.Value('i', 0)
+        
+        # Counter koneksi pending/completed lewat done-callback
+        registry = ConnectionRegistry()
         
         # Gunakan ProcessPoolExecutor untuk mengelola processes
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                 initargs=(access_log_path, metrics_name, max_workers + 1, worker_counter,
+                                           cache_mb, watch)) as executor:
+            lifecycle.start(my_socket)
             while True:
                 try:
-                    # Accept connection
-                    connection, client_address = my_socket.accept()
+                    # Accept connection (None: SIGTERM/SIGHUP, berhenti accept)
+                    accepted = lifecycle.accept()
+                    if accepted is None:
+                        break
+                    connection, client_address = accepted
                     
                     logging.info(f"New connection from {client_address}")
                     
                     # Submit task ke process pool
-                    future = executor.submit(ProcessTheClient, connection, client_address)
-                    the_clients.append(future)
-                    
-                    # Cleanup completed futures (optional)
-                    the_clients = [f for f in the_clients if not f.done()]
+                    httpserver.metrics.add(M_CONNECTIONS)
+                    httpserver.metrics.add(M_QUEUE_DEPTH)
+                    # Salinan socket di parent disimpan agar drain bisa memutus koneksi yang melewati batas waktu
+                    lifecycle.connections.add(connection)
+                    future = registry.submit(executor, ProcessTheClient, connection, client_address, True)
+                    future.add_done_callback(lambda _, c=connection: lifecycle.connections.discard(c))
                     
-                    # Log active connections count
-                    active_count = len([f for f in the_clients if f.running()])
-                    if active_count > 0:
-                        logging.info(f"Active connections: {active_count}")
+                    # Jumlah koneksi dari counter registry (O(1), tanpa scan future)
+                    pending_count = registry.counts()['pending']
+                    if pending_count > 0:
+                        logging.info(f"Pending connections: {pending_count}")
                 
                 except KeyboardInterrupt:
                     print("\n🛑 Shutdown signal received...")
+                    lifecycle.stop()
                     break
                 except Exception as e:
                     logging.error(f"Error accepting connection: {str(e)}")
+            my_socket.close()
+            lifecycle.drain(registry)
                     
     except Exception as e:
         logging.error(f"Server error: {str(e)}")
@@ -176,13 +225,160 @@ def Server(host='127.0.0.1', port=8881, max_workers=10):
         my_socket.close()
         logging.info("Process Pool Server stopped")
 
-def init_worker():
+def make_listen_socket(host, port, reuse_port=False):
     """
-    Initialization function untuk worker processes
+    Buat listening socket; reuse_port=True memakai SO_REUSEPORT sehingga
+    setiap worker bisa punya socket sendiri dan kernel yang membagi koneksi
     """
-    # Setup signal handling untuk worker process
-    import signal
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    
+    # Optimasi socket buffer
+    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # 64KB receive buffer
+    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)  # 64KB send buffer
+    
+    my_socket.bind((host, port))
+    my_socket.listen(100)  # Backlog queue
+    return my_socket
+
+def prefork_worker(worker_id, listen_socket, host, port, reuse_port):
+    """
+    Accept loop milik satu worker process. Worker menerima koneksi sendiri,
+    jadi tidak ada socket yang di-pickle dan tidak ada IPC per koneksi
+    """
+    init_worker()
+    # SIGTERM dari supervisor: berhenti accept, koneksi yang sedang dilayani diselesaikan
+    signal.signal(signal.SIGTERM, lambda signum, frame: lifecycle.stop())
+    httpserver.metrics.use_block(worker_id + 1)
+    if reuse_port:
+        listen_socket = make_listen_socket(host, port, reuse_port=True)
+    # Semua worker memakai timeout yang sama: flag non-blocking fd listener bersama ikut berubah
+    listen_socket.settimeout(ACCEPT_POLL_INTERVAL)
+    lifecycle.listen_socket = listen_socket
+    
+    logging.info(f"[Worker-{worker_id}] pid {os.getpid()} accepting on {host}:{port}")
+    while True:
+        try:
+            accepted = lifecycle.accept()
+        except OSError as e:
+            logging.error(f"[Worker-{worker_id}] Error accepting connection: {str(e)}")
+            continue
+        if accepted is None:
+            break
+        connection, client_address = accepted
+        httpserver.metrics.add(M_CONNECTIONS)
+        ProcessTheClient(connection, client_address)
+    listen_socket.close()
+    logging.info(f"[Worker-{worker_id}] pid {os.getpid()} stopped")
+
+def PreforkServer(host='127.0.0.1', port=8881, max_workers=10, reuse_port=False):
+    """
+    Main server function dengan pre-fork: N worker process masing-masing
+    menjalankan accept loop; supervisor menghidupkan ulang worker yang mati.
+    SIGTERM/SIGHUP diterima supervisor: restart worker berhenti, SIGTERM
+    diteruskan ke worker, lalu ditunggu paling lama drain_timeout
+    """
+    ctx = mp.get_context('fork')
+    
+    # Tanpa SO_REUSEPORT semua worker berbagi satu socket yang dibuat di sini
+    # atau diwarisi dari generasi sebelumnya (SIGHUP). Dengan SO_REUSEPORT
+    # generasi baru bind socket sendiri; koneksi yang masih di antrian socket
+    # worker lama saat ditutup di-reset kernel
+    my_socket = lifecycle.adopt_listener()
+    if my_socket is None and not reuse_port:
+        my_socket = make_listen_socket(host, port)
+    
+    # Metrics di shared memory (diwarisi lewat fork): blok worker_id + 1 per worker
+    httpserver.metrics.attach_shared(blocks=max_workers + 1)
+    
+    logging.info(f"Pre-fork Server started on {host}:{port}")
+    print(f"\n{'='*60}")
+    print(f"🚀 HTTP FILE SERVER - PRE-FORK MODE")
+    print(f"{'='*60}")
+    print(f"📡 Address: http://{host}:{port}")
+    print(f"🔧 Worker Processes: {max_workers}")
+    print(f"🔀 Listener: {'SO_REUSEPORT per worker' if reuse_port else 'shared socket'}")
+    print(f"📁 Working Directory: {os.getcwd()}")
+    print(f"♻️  SIGTERM: drain maks {lifecycle.drain_timeout:.0f}s | SIGHUP: restart tanpa downtime (pid {os.getpid()})")
+    print(f"{'='*60}")
+    print(f"Press Ctrl+C to stop server")
+    print()
+    
+    workers = {}
+    started = {}
+    
+    def spawn(worker_id):
+        process = ctx.Process(target=prefork_worker, name=f"HTTPWorker-{worker_id}",
+                              args=(worker_id, my_socket, host, port, reuse_port), daemon=True)
+        process.start()
+        workers[worker_id] = process
+        started[worker_id] = time.time()
+    
+    try:
+        # Signal handler dipasang sebelum fork; worker menggantinya sendiri
+        lifecycle.start(my_socket)
+        for worker_id in range(max_workers):
+            spawn(worker_id)
+        
+        while not lifecycle.stopping.is_set():
+            # Tunggu sampai ada worker yang mati (sentinel siap dibaca);
+            # timeout agar SIGTERM/SIGHUP terlihat tanpa menunggu worker mati
+            wait([p.sentinel for p in workers.values()], ACCEPT_POLL_INTERVAL)
+            for worker_id, process in list(workers.items()):
+                if process.is_alive() or lifecycle.stopping.is_set():
+                    continue
+                logging.warning(f"[Worker-{worker_id}] pid {process.pid} exited with code {process.exitcode}, restarting")
+                process.join()
+                # Hindari restart loop yang terlalu cepat jika worker langsung crash
+                if time.time() - started[worker_id] < 1.0:
+                    time.sleep(1.0)
+                spawn(worker_id)
+    except KeyboardInterrupt:
+        print("\n🛑 Shutdown signal received...")
+    finally:
+        if my_socket:
+            my_socket.close()
+        # Worker menyelesaikan koneksinya lalu keluar; yang melewati drain_timeout di-kill
+        for process in workers.values():
+            process.terminate()
+        logging.info(f"⏳ Menunggu {len(workers)} worker selesai (maks {lifecycle.drain_timeout:.0f}s)...")
+        deadline = time.monotonic() + lifecycle.drain_timeout
+        for process in workers.values():
+            process.join(max(deadline - time.monotonic(), 0))
+        for worker_id, process in workers.items():
+            if process.is_alive():
+                logging.warning(f"[Worker-{worker_id}] pid {process.pid} melewati drain timeout, kill")
+                process.kill()
+                process.join()
+        logging.info("Pre-fork Server stopped")
+
+def init_worker(access_log_path=None, metrics_name=None, metrics_blocks=1, worker_counter=None, cache_mb=None, watch=None):
+    """
+    Initialization function untuk worker processes.
+    Argumen dipakai mode pool (spawn): worker tidak mewarisi fd access log
+    maupun shared memory metrics dari parent, jadi dibuka ulang di sini;
+    opsi CLI (cache_mb, watch) juga tidak ikut karena module di-import ulang
+    """
+    # Setup signal handling untuk worker process: shutdown dan restart
+    # diatur parent/supervisor, bukan oleh signal yang sampai ke process group
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGUSR2):
+        signal.signal(signum, signal.SIG_IGN)
+    
+    # Thread QueueListener tidak ikut ter-fork, jalankan lagi di worker
+    setup_logging(logging.getLogger().level)
+    if cache_mb is not None:
+        httpserver.cache.max_bytes = cache_mb * 1024 * 1024
+    if watch is not None:
+        httpserver.index.watch = watch
+    if access_log_path and access_log.fd is None:
+        access_log.open(access_log_path)
+    if metrics_name is not None:
+        httpserver.metrics.attach_shared(blocks=metrics_blocks, name=metrics_name)
+        with worker_counter.get_lock():
+            worker_counter.value += 1
+            httpserver.metrics.use_block(worker_counter.value)
     
     # Set working directory yang sama
     # os.chdir ke directory yang diinginkan jika perlu
@@ -203,6 +399,13 @@ def main():
     parser.add_argument('--host', default='127.0.0.1', help='Server host (default: 127.0.0.1)')
     parser.add_argument('--port', type=int, default=8881, help='Server port (default: 8881)')
     parser.add_argument('--workers', type=int, default=10, help='Max worker processes (default: 10)')
+    parser.add_argument('--mode', choices=['prefork', 'pool'], default='prefork' if hasattr(os, 'fork') else 'pool',
+                        help='prefork: worker accept sendiri; pool: ProcessPoolExecutor (default: prefork)')
+    parser.add_argument('--reuse-port', action='store_true', help='Prefork: satu SO_REUSEPORT listener per worker')
+    parser.add_argument('--cache-mb', type=int, default=64, help='Batas memori cache response dalam MB, 0 = nonaktif (default: 64)')
+    parser.add_argument('--watch', action='store_true', help='Pantau direktori dengan inotify untuk index listing (Linux)')
+    parser.add_argument('--access-log', help='File access log JSON (satu baris per request)')
+    parser.add_argument('--drain-timeout', type=float, default=30.0, help='Batas waktu menyelesaikan koneksi saat SIGTERM/SIGHUP dalam detik (default: 30)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
     
     args = parser.parse_args()
@@ -211,6 +414,12 @@ def main():
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    httpserver.cache.max_bytes = args.cache_mb * 1024 * 1024
+    httpserver.index.watch = args.watch
+    lifecycle.drain_timeout = args.drain_timeout
+    if args.access_log:
+        access_log.open(args.access_log)
+    
     # Validasi jumlah workers
     cpu_count = mp.cpu_count()
     if args.workers > cpu_count * 2:
@@ -218,7 +427,11 @@ def main():
         print(f"Recommended: {cpu_count * 2} or less")
     
     try:
-        Server(host=args.host, port=args.port, max_workers=args.workers)
+        if args.mode == 'prefork':
+            PreforkServer(host=args.host, port=args.port, max_workers=args.workers, reuse_port=args.reuse_port)
+        else:
+            Server(host=args.host, port=args.port, max_workers=args.workers, access_log_path=args.access_log,
+                   cache_mb=args.cache_mb, watch=args.watch)
     except KeyboardInterrupt:
         print("\nShutting down...")
     except Exception as e:
@@ -6,86 +6,160 @@ import time
 import sys
 import logging
 import ssl
-
-
-
-
-from http import HttpServer
-
-httpserver = HttpServer()
-
-
-class ProcessTheClient(threading.Thread):
-	def __init__(self, connection, address):
-		self.connection = connection
-		self.address = address
-		threading.Thread.__init__(self)
+from concurrent.futures import ThreadPoolExecutor
+
+import server_thread_pool_http as pool
+from http import ConnectionRegistry, M_CONNECTIONS, M_QUEUE_DEPTH, M_REJECTED
+
+# Listener TLS di depan handler thread pool (keep-alive, pipelining, metrics,
+# drain/SIGHUP); handshake dijalankan di worker, bukan di accept loop
+httpserver = pool.httpserver
+lifecycle = pool.lifecycle
+
+# Batas waktu handshake; client yang diam hanya menahan satu worker selama ini
+HANDSHAKE_TIMEOUT = 10.0
+# Session ticket TLS 1.3 per handshake penuh (default OpenSSL: 2)
+SESSION_TICKETS = 2
+
+
+def create_context(certfile, keyfile, tickets=SESSION_TICKETS):
+	"""
+	SSLContext server: TLS >= 1.2, ALPN http/1.1, resumption lewat session
+	cache (TLS 1.2) dan session ticket (TLS 1.3, tickets=0 mematikannya).
+	Satu context dipakai semua worker, jadi cache dan kunci tiket juga satu
+	"""
+	context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+	context.minimum_version = ssl.TLSVersion.TLSv1_2
+	context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+	context.set_alpn_protocols(['http/1.1'])
+	context.num_tickets = tickets
+	return context
+
+
+def ProcessTheClient(connection, address, context, handshake_timeout, keepalive_timeout, max_requests, accepted_at, admission):
+	"""
+	Handshake TLS di worker thread, lalu request dilayani handler thread pool.
+	Waktu handshake ikut tercatat sebagai queue_ms request pertama
+	"""
+	try:
+		connection.settimeout(handshake_timeout)
+		secure_connection = context.wrap_socket(connection, server_side=True)
+	except (ssl.SSLError, OSError) as e:
+		logging.warning("handshake TLS dari {} gagal: {}".format(address, e))
+		admission.release()
+		httpserver.metrics.add(M_QUEUE_DEPTH, -1)
+		connection.close()
+		return
+	logging.info("connection from {} ({}, {})".format(address, secure_connection.version(),
+													  'resumed' if secure_connection.session_reused else 'full handshake'))
+	pool.ProcessTheClient(secure_connection, address, keepalive_timeout, max_requests, accepted_at, admission)
+
+
+class Server:
+	"""
+	Accept loop hanya accept lalu submit ke thread pool; handshake yang lambat
+	atau gagal tidak lagi menahan koneksi baru
+	"""
+
+	def __init__(self, host='0.0.0.0', port=8443, certfile='certs/domain.crt', keyfile='certs/domain.key',
+				 max_workers=20, tickets=SESSION_TICKETS, handshake_timeout=HANDSHAKE_TIMEOUT,
+				 keepalive_timeout=5.0, max_requests=100, max_queue=100):
+		self.address = (host, port)
+		self.context = create_context(certfile, keyfile, tickets)
+		self.tickets = tickets
+		self.max_workers = max_workers
+		self.handshake_timeout = handshake_timeout
+		self.keepalive_timeout = keepalive_timeout
+		self.max_requests = max_requests
+		self.max_queue = max_queue
+		httpserver.tls_context = self.context
+
+	def listen(self):
+		"""Listener baru, atau warisan generasi sebelumnya (SIGHUP)"""
+		my_socket = lifecycle.adopt_listener()
+		if my_socket is None:
+			my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			my_socket.bind(self.address)
+			my_socket.listen(100)
+		lifecycle.start(my_socket)
+		return my_socket
 
 	def run(self):
-		rcv=""
-		while True:
-			try:
-				data = self.connection.recv(32)
-				if data:
-					#merubah input dari socket (berupa bytes) ke dalam string
-					#agar bisa mendeteksi \r\n
-					d = data.decode()
-					rcv=rcv+d
-					if rcv[-2:]=='\r\n':
-						#end of command, proses string
-						logging.warning("data dari client: {}" . format(rcv))
-						hasil = httpserver.proses(rcv)
-						#hasil akan berupa bytes
-						#untuk bisa ditambahi dengan string, maka string harus di encode
-						hasil=hasil+"\r\n\r\n".encode()
-						logging.warning("balas ke  client: {}" . format(hasil))
-						#hasil sudah dalam bentuk bytes
-						self.connection.sendall(hasil)
-						rcv=""
-						self.connection.close()
-				else:
+		my_socket = self.listen()
+		print(f"\n{'='*60}")
+		print(f"🔒 HTTPS FILE SERVER - THREAD POOL MODE")
+		print(f"{'='*60}")
+		print(f"📡 Address: https://{self.address[0]}:{self.address[1]}")
+		print(f"🔧 Max Workers: {self.max_workers} (handshake TLS di worker, timeout {self.handshake_timeout}s)")
+		print(f"🎫 Resumption: session cache + {self.tickets} ticket TLS 1.3 per handshake | ALPN http/1.1")
+		print(f"🔁 Keep-Alive: {self.keepalive_timeout}s idle, {self.max_requests} requests/connection")
+		print(f"🚦 Max Queue: {self.max_queue} koneksi (lebih dari itu langsung ditutup)")
+		print(f"♻️  SIGTERM: drain maks {lifecycle.drain_timeout:.0f}s | SIGHUP: restart tanpa downtime (pid {os.getpid()})")
+		print(f"{'='*60}")
+
+		# Slot antrian: diambil saat accept, dilepas saat handler mulai memproses request
+		admission = threading.Semaphore(self.max_queue)
+		registry = ConnectionRegistry()
+		httpserver.connections = registry
+		with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="HTTPSServer") as executor:
+			while True:
+				try:
+					accepted = lifecycle.accept()
+					if accepted is None:
+						break
+					connection, client_address = accepted
+					httpserver.metrics.add(M_CONNECTIONS)
+					# Antrian penuh: belum ada TLS, jadi 503 tidak bisa dikirim; tutup saja
+					if not admission.acquire(blocking=False):
+						httpserver.metrics.add(M_REJECTED)
+						connection.close()
+						continue
+					httpserver.metrics.add(M_QUEUE_DEPTH)
+					registry.submit(executor, ProcessTheClient, connection, client_address, self.context,
+									self.handshake_timeout, self.keepalive_timeout, self.max_requests,
+									time.perf_counter(), admission)
+				except KeyboardInterrupt:
+					print("\n🛑 Shutdown signal received...")
+					lifecycle.stop()
 					break
-			except OSError as e:
-				pass
-		self.connection.close()
-
-
-
-class Server(threading.Thread):
-	def __init__(self,hostname='testing.net'):
-		self.the_clients = []
-#------------------------------
-		self.hostname = hostname
-		cert_location = os.getcwd() + '/certs/'
-		self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-		self.context.load_cert_chain(certfile=cert_location + 'domain.crt',
-									 keyfile=cert_location + 'domain.key')
-#---------------------------------
-		self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-		threading.Thread.__init__(self)
-
-	def run(self):
-		self.my_socket.bind(('0.0.0.0', 8443))
-		self.my_socket.listen(1)
-		while True:
-			self.connection, self.client_address = self.my_socket.accept()
-			try:
-				self.secure_connection = self.context.wrap_socket(self.connection, server_side=True)
-				logging.warning("connection from {}".format(self.client_address))
-				clt = ProcessTheClient(self.secure_connection, self.client_address)
-				clt.start()
-				self.the_clients.append(clt)
-			except ssl.SSLError as essl:
-				print(str(essl))
-
-
+				except Exception as e:
+					logging.error(f"Error accepting connection: {str(e)}")
+			my_socket.close()
+			lifecycle.drain(registry)
+		stats = self.context.session_stats()
+		logging.warning("TLS: {} handshakes, {} resumed".format(stats['accept_good'], stats['hits']))
 
 
 def main():
-	svr = Server()
-	svr.start()
+	import argparse
+
+	parser = argparse.ArgumentParser(description='HTTPS File Server (TLS di depan thread pool)')
+	parser.add_argument('--host', default='0.0.0.0', help='Server host (default: 0.0.0.0)')
+	parser.add_argument('--port', type=int, default=8443, help='Server port (default: 8443)')
+	parser.add_argument('--cert', default='certs/domain.crt', help='File sertifikat (default: certs/domain.crt)')
+	parser.add_argument('--key', default='certs/domain.key', help='File private key (default: certs/domain.key)')
+	parser.add_argument('--workers', type=int, default=20, help='Max worker threads (default: 20)')
+	parser.add_argument('--tickets', type=int, default=SESSION_TICKETS, help='Session ticket TLS 1.3 per handshake, 0 = tanpa ticket (default: 2)')
+	parser.add_argument('--handshake-timeout', type=float, default=HANDSHAKE_TIMEOUT, help='Batas waktu handshake TLS dalam detik (default: 10)')
+	parser.add_argument('--keepalive-timeout', type=float, default=5.0, help='Idle timeout keep-alive dalam detik (default: 5)')
+	parser.add_argument('--max-requests', type=int, default=100, help='Max request per koneksi (default: 100)')
+	parser.add_argument('--max-queue', type=int, default=100, help='Max koneksi yang menunggu thread (default: 100)')
+	parser.add_argument('--drain-timeout', type=float, default=30.0, help='Batas waktu menyelesaikan koneksi saat SIGTERM/SIGHUP dalam detik (default: 30)')
+	parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
+	args = parser.parse_args()
+
+	if args.verbose:
+		logging.getLogger().setLevel(logging.DEBUG)
+	lifecycle.drain_timeout = args.drain_timeout
+
+	# Signal handler lifecycle hanya bisa dipasang dari main thread
+	svr = Server(args.host, args.port, args.cert, args.key, args.workers, args.tickets,
+				 args.handshake_timeout, args.keepalive_timeout, args.max_requests, args.max_queue)
+	try:
+		svr.run()
+	except KeyboardInterrupt:
+		logging.warning("server stopped")
 
 if __name__=="__main__":
 	main()
-
@@ -5,86 +5,133 @@ import threading
 import time
 import os
 from concurrent.futures import ThreadPoolExecutor
-from http import HttpServer
+from http import HttpServer, RequestBody, AccessLog, ConnectionRegistry, ServerLifecycle, BODY_CHUNK_SIZE, send_response, parse_request_head, recv_body, setup_logging
+from http import M_CONNECTIONS, M_CONNECTIONS_ACTIVE, M_REQUESTS_ACTIVE, M_QUEUE_DEPTH, M_REJECTED
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Setup logging (asynchronous: QueueHandler -> QueueListener)
+setup_logging()
 
 # Global HTTP server instance
 httpserver = HttpServer()
+# Access log terstruktur (aktif dengan --access-log)
+access_log = AccessLog()
+# SIGTERM: drain lalu keluar; SIGHUP: restart tanpa downtime
+lifecycle = ServerLifecycle()
 
-def ProcessTheClient(connection, address):
+def ProcessTheClient(connection, address, keepalive_timeout=5.0, max_requests=100, accepted_at=None, admission=None):
     """
-    Fungsi untuk memproses client dalam thread terpisah
+    Fungsi untuk memproses client dalam thread terpisah.
+    Satu koneksi bisa membawa beberapa request (keep-alive / pipelining);
+    request yang sudah ada di buffer dijawab berurutan tanpa recv baru.
+    accepted_at/admission: waktu accept dan slot antrian yang dilepas saat mulai
     """
+    if admission is not None:
+        admission.release()
     thread_id = threading.current_thread().ident
     start_time = time.time()
+    buffer = bytearray()
+    scratch = None
+    requests_served = 0
+    metrics = httpserver.metrics
+    metrics.add(M_QUEUE_DEPTH, -1)
+    metrics.add(M_CONNECTIONS_ACTIVE)
+    queue_wait = time.perf_counter() - accepted_at if accepted_at is not None else 0.0
+    metrics.observe_queue_wait(queue_wait)
+    lifecycle.connections.add(connection)
     
     try:
         logging.info(f"[Thread-{thread_id}] Processing connection from {address}")
         
-        # Set timeout untuk connection
-        connection.settimeout(120.0)  # 2 menit timeout
-        
-        # Terima headers dulu sampai ketemu double CRLF
-        headers_data = b""
-        while b"\r\n\r\n" not in headers_data:
-            data = connection.recv(1024)
-            if not data:
-                break
-            headers_data += data
+        while requests_served < max_requests:
+            # Waktu request dihitung sejak byte pertama ada (idle keep-alive tidak ikut)
+            request_start = time.perf_counter() if buffer else None
             
-            # Batasi ukuran header maksimal (security)
-            if len(headers_data) > 32768:  # 32KB max headers
-                logging.warning(f"[Thread-{thread_id}] Header terlalu besar dari {address}")
-                break
-        
-        if not headers_data:
-            logging.warning(f"[Thread-{thread_id}] Tidak ada data dari {address}")
-            return
-        
-        # Pisahkan header dan body yang mungkin sudah terbaca
-        if b"\r\n\r\n" in headers_data:
-            header_part, _, body_part = headers_data.partition(b'\r\n\r\n')
-        else:
-            header_part = headers_data
-            body_part = b""
-        
-        header_str = header_part.decode('utf-8', errors='ignore')
-        
-        # Cari Content-Length dari header
-        content_length = 0
-        for line in header_str.split('\r\n'):
-            if "Content-Length:" in line or "content-length:" in line:
-                try:
-                    content_length = int(line.split(":", 1)[1].strip())
+            # Request pertama boleh lambat; di antara request pakai idle timeout
+            connection.settimeout(120.0 if requests_served == 0 else keepalive_timeout)
+            
+            # Terima headers dulu sampai ketemu double CRLF
+            scanned = 0
+            while True:
+                header_end = buffer.find(b"\r\n\r\n", max(scanned - 3, 0))
+                if header_end >= 0:
                     break
-                except ValueError:
-                    logging.warning(f"[Thread-{thread_id}] Invalid Content-Length dari {address}")
-        
-        # Baca sisa body jika diperlukan
-        body_data = body_part
-        bytes_read = len(body_part)
-        
-        while bytes_read < content_length:
-            bytes_to_read = min(8192, content_length - bytes_read)  # Read in 8KB chunks
-            data = connection.recv(bytes_to_read)
-            if not data:
+                scanned = len(buffer)
+                
+                # Batasi ukuran header maksimal (security)
+                if len(buffer) > 32768:  # 32KB max headers
+                    logging.warning(f"[Thread-{thread_id}] Header terlalu besar dari {address}")
+                    connection.sendall(httpserver.response(431, 'Request Header Fields Too Large', 'Header terlalu besar', {}))
+                    return
+                
+                try:
+                    # Menunggu request keep-alive berikutnya: diputus jika server drain
+                    data = lifecycle.receive(connection, 8192, idle=requests_served > 0 and not buffer)
+                except socket.timeout:
+                    if requests_served > 0 and not buffer:
+                        return  # idle keep-alive connection, tutup diam-diam
+                    raise
+                if not data:
+                    if requests_served == 0 and not buffer:
+                        logging.warning(f"[Thread-{thread_id}] Tidak ada data dari {address}")
+                    return
+                buffer += data
+                if request_start is None:
+                    request_start = time.perf_counter()
+                # Selama membaca satu request pakai timeout normal
+                connection.settimeout(120.0)
+            
+            header_str = buffer[:header_end].decode('utf-8', errors='ignore')
+            del buffer[:header_end + 4]
+            header_done = time.perf_counter()
+            
+            content_length, client_keep_alive = parse_request_head(header_str)
+            if content_length < 0:
+                logging.warning(f"[Thread-{thread_id}] Invalid Content-Length dari {address}")
+                connection.sendall(httpserver.response(400, 'Bad Request', 'Invalid Content-Length', {}))
+                return
+            
+            # Body di-stream ke file sementara lewat buffer recv_into yang dipakai ulang
+            body_data = b""
+            if content_length > 0:
+                if scratch is None:
+                    scratch = bytearray(BODY_CHUNK_SIZE)
+                try:
+                    body_data = recv_body(connection, buffer, content_length, scratch)
+                except ConnectionError:
+                    logging.warning(f"[Thread-{thread_id}] Body tidak lengkap dari {address}")
+                    return
+            
+            requests_served += 1
+            keep_alive = client_keep_alive and requests_served < max_requests and not lifecycle.stopping.is_set()
+            body_done = time.perf_counter()
+            
+            logging.debug(f"[Thread-{thread_id}] Received {len(header_str)} bytes headers + {len(body_data)} bytes body from {address}")
+            
+            metrics.add(M_REQUESTS_ACTIVE)
+            try:
+                # Proses request menggunakan HTTP server
+                try:
+                    hasil = httpserver.proses(header_str, body_data, keep_alive)
+                finally:
+                    if isinstance(body_data, RequestBody):
+                        body_data.discard()  # no-op jika sudah di-rename oleh http_post
+                proses_done = time.perf_counter()
+                
+                # Kirim response
+                send_response(connection, hasil)
+                send_done = time.perf_counter()
+            finally:
+                metrics.add(M_REQUESTS_ACTIVE, -1)
+            
+            httpserver.record_request(address, header_str.partition('\r\n')[0], hasil, header_end + 4 + content_length, {
+                'queue': queue_wait if requests_served == 1 else 0.0,
+                'header': header_done - request_start, 'body': body_done - header_done,
+                'proses': proses_done - body_done, 'send': send_done - proses_done,
+                'total': send_done - request_start}, access_log)
+            logging.debug(f"[Thread-{thread_id}] Completed request #{requests_served} from {address} in {send_done - request_start:.3f}s")
+            
+            if not keep_alive:
                 break
-            body_data += data
-            bytes_read += len(data)
-        
-        logging.info(f"[Thread-{thread_id}] Received {len(header_str)} bytes headers + {len(body_data)} bytes body from {address}")
-        
-        # Proses request menggunakan HTTP server
-        hasil = httpserver.proses(header_str, body_data)
-        
-        # Kirim response
-        connection.sendall(hasil)
-        
-        # Log completion time
-        processing_time = time.time() - start_time
-        logging.info(f"[Thread-{thread_id}] Completed {address} in {processing_time:.3f}s")
         
     except socket.timeout:
         logging.warning(f"[Thread-{thread_id}] Timeout dari {address}")
@@ -93,30 +140,55 @@ def ProcessTheClient(connection, address):
     except Exception as e:
         logging.error(f"[Thread-{thread_id}] Error processing {address}: {str(e)}")
     finally:
+        metrics.add(M_CONNECTIONS_ACTIVE, -1)
+        lifecycle.connections.discard(connection)
         try:
             connection.close()
         except:
             pass
         
         total_time = time.time() - start_time
-        logging.info(f"[Thread-{thread_id}] Connection {address} closed (total: {total_time:.3f}s)")
+        logging.info(f"[Thread-{thread_id}] Connection {address} closed after {requests_served} requests (total: {total_time:.3f}s)")
 
-def Server(host='127.0.0.1', port=8880, max_workers=20):
+def reject_connection(connection, retry_after):
     """
-    Main server function dengan Thread Pool
+    Tolak koneksi saat antrian penuh: 503 kecil dikirim langsung dari accept
+    loop tanpa menunggu request, dengan socket non-blocking agar loop tidak tertahan
     """
-    the_clients = []
-    
-    # Buat socket server
-    my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    # Optimasi socket buffer
-    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # 64KB receive buffer
-    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)  # 64KB send buffer
+    try:
+        connection.setblocking(False)
+        connection.send(httpserver.response(503, 'Service Unavailable', 'Server sibuk, coba lagi nanti',
+                                            {'Retry-After': str(retry_after)}))
+        connection.shutdown(socket.SHUT_WR)
+        try:
+            connection.recv(65536)  # buang request yang sudah tiba agar close tidak mengirim RST
+        except OSError:
+            pass
+    except OSError:
+        pass
+    finally:
+        connection.close()
+
+def Server(host='127.0.0.1', port=8880, max_workers=20, keepalive_timeout=5.0, max_requests=100, max_queue=100, retry_after=1):
+    """
+    Main server function dengan Thread Pool.
+    Paling banyak max_queue koneksi menunggu thread kosong; sisanya langsung 503.
+    Listener diambil dari generasi sebelumnya jika dijalankan lewat SIGHUP
+    """
+    my_socket = lifecycle.adopt_listener()
+    inherited = my_socket is not None
+    if not inherited:
+        # Buat socket server
+        my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        
+        # Optimasi socket buffer
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # 64KB receive buffer
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)  # 64KB send buffer
     
     try:
-        my_socket.bind((host, port))
+        if not inherited:
+            my_socket.bind((host, port))
         logging.info(f"Thread Pool Server started on {host}:{port}")
         logging.info(f"Max workers: {max_workers}")
         logging.info(f"Server ready to accept connections...")
@@ -125,11 +197,16 @@ def Server(host='127.0.0.1', port=8880, max_workers=20):
         print(f"{'='*60}")
         print(f"📡 Address: http://{host}:{port}")
         print(f"🔧 Max Workers: {max_workers}")
+        print(f"🔁 Keep-Alive: {keepalive_timeout}s idle, {max_requests} requests/connection")
+        print(f"🚦 Max Queue: {max_queue} koneksi (lebih dari itu 503, Retry-After {retry_after}s)")
+        print(f"♻️  SIGTERM: drain maks {lifecycle.drain_timeout:.0f}s | SIGHUP: restart tanpa downtime (pid {os.getpid()})")
         print(f"📁 Working Directory: {os.getcwd()}")
         print(f"{'='*60}")
         print(f"Available endpoints:")
         print(f"  📋 GET  /           - Server info") 
         print(f"  📋 GET  /files      - List files")
+        print(f"  📋 GET  /files?format=json&offset=&limit=&prefix=&sort= - List files (JSON)")
+        print(f"  📈 GET  /metrics    - Prometheus metrics")
         print(f"  📤 POST /filename   - Upload file")
         print(f"  🗑️  DELETE /filename - Delete file")
         print(f"  📥 GET  /filename   - Download file")
@@ -137,34 +214,59 @@ def Server(host='127.0.0.1', port=8880, max_workers=20):
         print(f"Press Ctrl+C to stop server")
         print()
         
-        my_socket.listen(100)  # Backlog queue
+        if not inherited:
+            my_socket.listen(100)  # Backlog queue
+        lifecycle.start(my_socket)
+        
+        # Slot antrian: diambil saat accept, dilepas saat thread mulai memproses
+        admission = threading.Semaphore(max_queue)
+        
+        # Counter koneksi queued/active/completed, juga ditampilkan di /status
+        registry = ConnectionRegistry()
+        httpserver.connections = registry
         
         # Gunakan ThreadPoolExecutor untuk mengelola threads
         with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="HTTPServer") as executor:
             while True:
                 try:
-                    # Accept connection
-                    connection, client_address = my_socket.accept()
+                    # Accept connection (None setelah SIGTERM / generasi baru siap)
+                    accepted = lifecycle.accept()
+                    if accepted is None:
+                        break
+                    connection, client_address = accepted
                     
                     logging.info(f"New connection from {client_address}")
                     
-                    # Submit task ke thread pool
-                    future = executor.submit(ProcessTheClient, connection, client_address)
-                    the_clients.append(future)
+                    httpserver.metrics.add(M_CONNECTIONS)
+                    
+                    # Antrian penuh: gagal cepat daripada menunggu sampai timeout
+                    if not admission.acquire(blocking=False):
+                        httpserver.metrics.add(M_REJECTED)
+                        logging.debug(f"Queue full, 503 untuk {client_address}")
+                        reject_connection(connection, retry_after)
+                        continue
                     
-                    # Cleanup completed futures (optional)
-                    the_clients = [f for f in the_clients if not f.done()]
+                    # Submit task ke thread pool (antri sampai ada thread kosong)
+                    httpserver.metrics.add(M_QUEUE_DEPTH)
+                    registry.submit(executor, ProcessTheClient, connection, client_address,
+                                    keepalive_timeout, max_requests, time.perf_counter(), admission)
                     
-                    # Log active connections count
-                    active_count = len([f for f in the_clients if f.running()])
+                    # Jumlah koneksi dari counter registry (O(1), tanpa scan future)
+                    active_count = registry.counts()['active']
                     if active_count > 0:
                         logging.info(f"Active connections: {active_count}")
                 
                 except KeyboardInterrupt:
                     print("\n🛑 Shutdown signal received...")
+                    lifecycle.stop()
                     break
                 except Exception as e:
                     logging.error(f"Error accepting connection: {str(e)}")
+            
+            # Koneksi baru ditolak kernel (atau diterima generasi baru),
+            # koneksi yang sudah diterima diselesaikan dulu
+            my_socket.close()
+            lifecycle.drain(registry)
                     
     except Exception as e:
         logging.error(f"Server error: {str(e)}")
@@ -184,6 +286,14 @@ def main():
     parser.add_argument('--host', default='127.0.0.1', help='Server host (default: 127.0.0.1)')
     parser.add_argument('--port', type=int, default=8880, help='Server port (default: 8880)')
     parser.add_argument('--workers', type=int, default=20, help='Max worker threads (default: 20)')
+    parser.add_argument('--keepalive-timeout', type=float, default=5.0, help='Idle timeout keep-alive dalam detik (default: 5)')
+    parser.add_argument('--max-requests', type=int, default=100, help='Max request per koneksi (default: 100)')
+    parser.add_argument('--max-queue', type=int, default=100, help='Max koneksi yang menunggu thread, sisanya 503 (default: 100)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Nilai Retry-After pada response 503 dalam detik (default: 1)')
+    parser.add_argument('--cache-mb', type=int, default=64, help='Batas memori cache response dalam MB, 0 = nonaktif (default: 64)')
+    parser.add_argument('--watch', action='store_true', help='Pantau direktori dengan inotify untuk index listing (Linux)')
+    parser.add_argument('--access-log', help='File access log JSON (satu baris per request)')
+    parser.add_argument('--drain-timeout', type=float, default=30.0, help='Batas waktu menyelesaikan koneksi saat SIGTERM/SIGHUP dalam detik (default: 30)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
     
     args = parser.parse_args()
@@ -192,8 +302,16 @@ def main():
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    httpserver.cache.max_bytes = args.cache_mb * 1024 * 1024
+    httpserver.index.watch = args.watch
+    if args.access_log:
+        access_log.open(args.access_log)
+    lifecycle.drain_timeout = args.drain_timeout
+    
     try:
-        Server(host=args.host, port=args.port, max_workers=args.workers)
+        Server(host=args.host, port=args.port, max_workers=args.workers,
+               keepalive_timeout=args.keepalive_timeout, max_requests=args.max_requests,
+               max_queue=args.max_queue, retry_after=args.retry_after)
     except KeyboardInterrupt:
         print("\nShutting down...")
     except Exception as e:
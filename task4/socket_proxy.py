@@ -1,66 +1,1194 @@
 from socket import *
 import socket
+import selectors
+import errno
+import os
 import threading
 import time
 import sys
 import logging
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
 
+# Ukuran buffer per arah tunnel; src tidak dibaca lagi sebelum buffer terkirim (backpressure)
+RELAY_BUFFER_SIZE = 64 * 1024
+# Linux: relay tunnel lewat pipe dengan os.splice (data tidak masuk userspace)
+SPLICE_AVAILABLE = hasattr(os, 'splice')
+F_GETPIPE_SZ = 1032
+# Ukuran pipe minimum untuk --relay auto: dengan pipe 64 KB syscall tambahan
+# splice lebih mahal dari salinan yang dihemat (lihat bench_proxy.py)
+SPLICE_MIN_BUFFER = 256 * 1024
+F_SETPIPE_SZ = 1031
+# Koneksi baru yang di-accept sekaligus per event listener
+ACCEPT_BATCH = 64
+# Mode http: batas header request/response dan koneksi keep-alive upstream yang disimpan
+MAX_HEAD_SIZE = 32768
+POOL_SIZE = 32
+# Lebih pendek dari idle timeout keep-alive HttpServer (5s) agar tidak dipakai saat ditutup backend
+POOL_IDLE_TIMEOUT = 4.0
+HEALTH_INTERVAL = 2.0
+# Header hop-by-hop yang tidak diteruskan apa adanya
+HOP_HEADERS = {'connection', 'keep-alive', 'proxy-connection', 'te', 'trailer', 'upgrade'}
+# Cache mode http: entry terbesar, dan batas atas freshness heuristik (10% umur Last-Modified)
+CACHE_MAX_ENTRY = 1024 * 1024
+CACHE_HEURISTIC_TTL = 10.0
+# Header yang dibuat ulang proxy saat melayani dari cache
+CACHE_SKIP_HEADERS = HOP_HEADERS | {'age', 'x-cache'}
 
 
-class ProcessTheClient(threading.Thread):
-	def __init__(self, connection, address, destination_sock_address):
-		self.destination_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.destination_sock.connect(destination_sock_address)
+class Backend:
+	"""
+	Satu server upstream: jumlah koneksi aktif (least-connections),
+	status health check, dan koneksi keep-alive idle yang siap dipakai ulang
+	"""
+
+	def __init__(self, address):
+		self.name = "{}:{}".format(*address)
+		# Resolve sekali di awal, bukan getaddrinfo per koneksi
+		self.address = socket.getaddrinfo(address[0], address[1], socket.AF_INET, socket.SOCK_STREAM)[0][4]
+		self.active = 0
+		self.healthy = True
+		self.idle = []  # (socket, waktu masuk pool), dipakai LIFO
+		self.connects = 0
+		self.reused = 0
+
+	def handle(self, sock, mask):
+		# Koneksi idle menjadi readable = ditutup backend (atau data tak terduga): buang
+		self.discard(sock)
+
+	def discard(self, sock):
+		for i, (idle_sock, _) in enumerate(self.idle):
+			if idle_sock is sock:
+				del self.idle[i]
+				break
+		self.pool.server.selector.unregister(sock)
+		sock.close()
+
+
+class BackendPool:
+	"""
+	Pemilihan backend round-robin atau least-connections. Backend yang gagal
+	di-connect ditandai down sampai health check berikutnya berhasil
+	"""
+
+	def __init__(self, server, addresses, policy='round-robin', health_interval=HEALTH_INTERVAL,
+			health_path=None, pool_size=POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+		self.server = server
+		self.backends = [Backend(address) for address in addresses]
+		for backend in self.backends:
+			backend.pool = self
+		self.policy = policy
+		self.health_interval = health_interval
+		self.health_path = health_path
+		self.pool_size = pool_size
+		self.idle_timeout = idle_timeout
+		self.next = 0
+
+	def choose(self, exclude=()):
+		candidates = [b for b in self.backends if b.healthy and b not in exclude]
+		if not candidates:
+			# Semua down menurut health check: tetap coba daripada langsung menolak
+			candidates = [b for b in self.backends if b not in exclude]
+			if not candidates:
+				return None
+		self.next += 1
+		if self.policy == 'least-conn':
+			# Mulai dari posisi bergilir agar backend dengan beban sama dipakai merata
+			start = self.next % len(candidates)
+			return min(candidates[start:] + candidates[:start], key=lambda b: b.active)
+		return candidates[self.next % len(candidates)]
+
+	def mark_down(self, backend, reason):
+		if backend.healthy:
+			logging.warning("backend {} down: {}".format(backend.name, reason))
+		backend.healthy = False
+		for sock, _ in backend.idle[:]:
+			backend.discard(sock)
+
+	def checkout(self, backend):
+		"""Koneksi keep-alive idle ke backend, atau None"""
+		now = time.monotonic()
+		while backend.idle:
+			sock, since = backend.idle.pop()
+			self.server.selector.unregister(sock)
+			if now - since < self.idle_timeout:
+				backend.reused += 1
+				return sock
+			sock.close()
+		return None
+
+	def checkin(self, backend, sock):
+		"""Simpan koneksi upstream yang response-nya sudah selesai untuk request berikutnya"""
+		if len(backend.idle) >= self.pool_size or not backend.healthy:
+			sock.close()
+			return
+		backend.idle.append((sock, time.monotonic()))
+		self.server.selector.register(sock, selectors.EVENT_READ, backend)
+
+	def expire(self):
+		now = time.monotonic()
+		for backend in self.backends:
+			while backend.idle and now - backend.idle[0][1] >= self.idle_timeout:
+				backend.discard(backend.idle[0][0])
+
+	def check(self, backend):
+		"""Health check: TCP connect, ditambah GET health_path jika diset (status < 500)"""
+		with socket.create_connection(backend.address, timeout=2.0) as sock:
+			if not self.health_path:
+				return True
+			sock.sendall("GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n".format(
+				self.health_path, backend.name).encode())
+			status_line = sock.recv(1024).split(b"\r\n", 1)[0].split()
+			return len(status_line) >= 2 and status_line[1].isdigit() and int(status_line[1]) < 500
+
+	def health_loop(self):
+		# Thread terpisah: connect blocking dengan timeout tidak menahan event loop
+		while True:
+			for backend in self.backends:
+				try:
+					healthy = self.check(backend)
+				except OSError as e:
+					healthy = False
+					reason = e
+				else:
+					reason = "health check status"
+				if healthy and not backend.healthy:
+					logging.warning("backend {} up".format(backend.name))
+				elif not healthy and backend.healthy:
+					logging.warning("backend {} down: {}".format(backend.name, reason))
+				backend.healthy = healthy
+			time.sleep(self.health_interval)
+
+
+class Relay:
+	"""
+	Satu arah tunnel: baca dari src ke buffer tetap, tulis ke dst.
+	Buffer harus kosong sebelum src dibaca lagi, jadi client/upstream yang
+	lambat menahan pengirimnya (lewat TCP window) dan memori per tunnel tetap
+	"""
+
+	def __init__(self, src, dst, size=RELAY_BUFFER_SIZE, label=None):
+		self.src = src
+		self.dst = dst
+		self.buffer = bytearray(size)
+		self.view = memoryview(self.buffer)
+		self.start = 0
+		self.end = 0
+		self.eof = False  # src sudah EOF
+		self.shut = False  # EOF sudah diteruskan ke dst (shutdown SHUT_WR)
+		self.bytes = 0
+		self.label = label  # diisi hanya dengan --log-payload
+
+	def wants_read(self):
+		return not self.eof and self.end == 0
+
+	def wants_write(self):
+		return self.end > self.start
+
+	def done(self):
+		return self.shut
+
+	def read(self):
+		"""Baca dari src lalu langsung coba kirim; False jika src EOF"""
+		try:
+			n = self.src.recv_into(self.buffer)
+		except (BlockingIOError, InterruptedError):
+			return True
+		if n == 0:
+			self.eof = True
+		else:
+			self.start, self.end = 0, n
+			self.bytes += n
+			if self.label is not None:
+				logging.debug("{} {!r}".format(self.label, bytes(self.view[:n])))
+		self.write()
+		return n > 0
+
+	def write(self):
+		if self.end > self.start:
+			try:
+				self.start += self.dst.send(self.view[self.start:self.end])
+			except (BlockingIOError, InterruptedError):
+				return
+			if self.start == self.end:
+				self.start = self.end = 0
+		if self.eof and self.end == 0 and not self.shut:
+			# Half-close: arah ini selesai, arah sebaliknya tetap jalan
+			self.shut = True
+			try:
+				self.dst.shutdown(socket.SHUT_WR)
+			except OSError:
+				pass
+
+	def close(self):
+		pass
+
+
+class SpliceRelay(Relay):
+	"""
+	Relay zero-copy (Linux): src -> pipe -> dst dengan os.splice, byte
+	payload tidak pernah disalin ke objek Python. Pipe berperan sebagai
+	buffer tetap; backpressure dan half-close sama seperti Relay
+	"""
+
+	FLAGS = getattr(os, 'SPLICE_F_MOVE', 0) | getattr(os, 'SPLICE_F_NONBLOCK', 0)
+
+	def __init__(self, src, dst, size=RELAY_BUFFER_SIZE, label=None):
+		self.src = src
+		self.dst = dst
+		self.size = size
+		self.pipe_r, self.pipe_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+		import fcntl
+		try:
+			self.size = fcntl.fcntl(self.pipe_w, F_SETPIPE_SZ, size)
+		except OSError:
+			# Batas pipe per user (pipe-user-pages-soft/pipe-max-size): pakai kapasitas yang ada
+			self.size = fcntl.fcntl(self.pipe_w, F_GETPIPE_SZ)
+		self.pending = 0  # byte di pipe yang belum sampai dst
+		self.eof = False
+		self.shut = False
+		self.bytes = 0
+
+	def wants_read(self):
+		return not self.eof and self.pending == 0
+
+	def wants_write(self):
+		return self.pending > 0
+
+	def read(self):
+		try:
+			n = os.splice(self.src.fileno(), self.pipe_w, self.size, flags=self.FLAGS)
+		except (BlockingIOError, InterruptedError):
+			return True
+		if n == 0:
+			self.eof = True
+		else:
+			self.pending += n
+			self.bytes += n
+		self.write()
+		return n > 0
+
+	def write(self):
+		while self.pending:
+			try:
+				n = os.splice(self.pipe_r, self.dst.fileno(), self.pending, flags=self.FLAGS)
+			except (BlockingIOError, InterruptedError):
+				return
+			self.pending -= n
+		if self.eof and not self.shut:
+			self.shut = True
+			try:
+				self.dst.shutdown(socket.SHUT_WR)
+			except OSError:
+				pass
+
+	def close(self):
+		os.close(self.pipe_r)
+		os.close(self.pipe_w)
+
+
+class Watched:
+	"""Registrasi selector per socket: hanya register/modify/unregister jika mask berubah"""
+
+	def watch(self, sock, mask):
+		old = self.masks.get(sock, 0)
+		if mask == old:
+			return
+		if not old:
+			self.server.selector.register(sock, mask, self)
+		elif not mask:
+			self.server.selector.unregister(sock)
+		else:
+			self.server.selector.modify(sock, mask, self)
+		self.masks[sock] = mask
+
+	def forget(self, sock):
+		if self.masks.pop(sock, 0):
+			self.server.selector.unregister(sock)
+
+
+def connect_upstream(backend):
+	"""connect non-blocking ke backend; event loop menunggu writable"""
+	sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	sock.setblocking(False)
+	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	err = sock.connect_ex(backend.address)
+	if err not in (0, errno.EINPROGRESS):
+		sock.close()
+		raise OSError(err, os.strerror(err))
+	backend.connects += 1
+	return sock
+
+
+class ProcessTheClient(Watched):
+	"""
+	Satu tunnel client <-> upstream yang digerakkan event loop Server.
+	Kedua arah dipompa independen: response besar atau data yang dikirim
+	upstream tanpa diminta tidak menunggu recv dari client
+	"""
+
+	def __init__(self, server, connection, address):
+		self.server = server
 		self.connection = connection
 		self.address = address
-		threading.Thread.__init__(self)
+		self.connection.setblocking(False)
+		self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self.connecting = True
+		self.closed = False
+		self.masks = {}
+		self.start_time = time.time()
+		self.tried = []
+		self.backend = None
+		self.destination_sock = None
+		if not self.connect():
+			raise OSError(errno.ECONNREFUSED, "tidak ada backend yang bisa dihubungi")
 
-	def run(self):
-		rcv=""
+	def connect(self):
+		"""Connect ke backend berikutnya yang belum dicoba; False jika habis"""
 		while True:
+			backend = self.server.pool.choose(exclude=self.tried)
+			if backend is None:
+				return False
+			self.tried.append(backend)
 			try:
-				data = self.connection.recv(8192)
-				if data:
-					self.destination_sock.sendall(data)
-					data_balasan = self.destination_sock.recv(8192)
-					self.connection.sendall(data_balasan)
-					logging.warning(data)
-					logging.warning(data_balasan)
+				sock = connect_upstream(backend)
+			except OSError as e:
+				self.server.pool.mark_down(backend, e)
+				continue
+			self.backend = backend
+			backend.active += 1
+			self.destination_sock = sock
+			log = self.server.log_payload
+			self.up = self.server.make_relay(self.connection, sock, "{} >>".format(self.address) if log else None)
+			self.down = self.server.make_relay(sock, self.connection, "{} <<".format(self.address) if log else None)
+			self.update()
+			return True
+
+	def interest(self, sock):
+		if self.connecting:
+			# client baru dibaca setelah upstream tersambung
+			return selectors.EVENT_WRITE if sock is self.destination_sock else 0
+		reader, writer = (self.up, self.down) if sock is self.connection else (self.down, self.up)
+		mask = 0
+		if reader.wants_read():
+			mask |= selectors.EVENT_READ
+		if writer.wants_write():
+			mask |= selectors.EVENT_WRITE
+		return mask
+
+	def update(self):
+		"""Samakan registrasi selector dengan kebutuhan baca/tulis kedua socket"""
+		if self.up.done() and self.down.done():
+			self.close()
+			return
+		for sock in (self.connection, self.destination_sock):
+			self.watch(sock, self.interest(sock))
+
+	def handle(self, sock, mask):
+		try:
+			if self.connecting:
+				err = self.destination_sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+				if err:
+					# Backend gagal: tandai down, client belum dibaca jadi aman pindah backend
+					self.server.pool.mark_down(self.backend, os.strerror(err))
+					self.release()
+					if not self.connect():
+						logging.warning("tidak ada backend untuk {}".format(self.address))
+						self.close()
+					return
+				self.connecting = False
+			elif sock is self.connection:
+				if mask & selectors.EVENT_READ:
+					self.up.read()
+				if mask & selectors.EVENT_WRITE:
+					self.down.write()
+			else:
+				if mask & selectors.EVENT_READ:
+					self.down.read()
+				if mask & selectors.EVENT_WRITE:
+					self.up.write()
+		except OSError as e:
+			logging.debug("tunnel {} error: {}".format(self.address, e))
+			self.close()
+			return
+		self.update()
+
+	def release(self):
+		"""Lepas socket upstream (dan pipe relay-nya) serta hitungan active backend saat ini"""
+		if self.destination_sock is not None:
+			self.up.close()
+			self.down.close()
+			self.forget(self.destination_sock)
+			self.destination_sock.close()
+			self.destination_sock = None
+		if self.backend is not None:
+			self.backend.active -= 1
+			self.backend = None
+
+	def close(self):
+		if self.closed:
+			return
+		self.closed = True
+		backend = self.backend.name if self.backend is not None else '-'
+		self.release()
+		self.forget(self.connection)
+		self.connection.close()
+		self.server.tunnels -= 1
+		if self.tried:
+			logging.info("tunnel {} via {} closed: {} bytes up, {} bytes down, {:.3f}s".format(
+				self.address, backend, self.up.bytes if hasattr(self, 'up') else 0,
+				self.down.bytes if hasattr(self, 'down') else 0, time.time() - self.start_time))
+
+
+def parse_head(head):
+	"""Baris pertama dan list (nama lowercase, nama, value) dari header HTTP"""
+	lines = head.decode('latin-1').split('\r\n')
+	headers = []
+	for line in lines[1:]:
+		name, _, value = line.partition(':')
+		headers.append((name.strip().lower(), name.strip(), value.strip()))
+	return lines[0], headers
+
+
+def header_value(headers, name):
+	for lower, _, value in headers:
+		if lower == name:
+			return value
+	return None
+
+
+def wants_keep_alive(version, headers):
+	"""HTTP/1.1 default keep-alive, HTTP/1.0 hanya jika Connection: keep-alive"""
+	connection = (header_value(headers, 'connection') or '').lower()
+	if 'close' in connection:
+		return False
+	return version == 'HTTP/1.1' or 'keep-alive' in connection
+
 
+def build_head(first_line, headers, extra):
+	lines = [first_line]
+	lines.extend("{}: {}".format(name, value) for lower, name, value in headers if lower not in HOP_HEADERS)
+	lines.extend(extra)
+	return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+def error_response(code, message):
+	body = "{} {}\n".format(code, message).encode()
+	return ("HTTP/1.1 {} {}\r\nContent-Type: text/plain\r\nContent-Length: {}\r\n"
+			"Connection: close\r\n\r\n".format(code, message, len(body))).encode() + body
+
+
+def cache_control(value):
+	"""Directive Cache-Control -> dict (nilai None untuk directive tanpa argumen)"""
+	directives = {}
+	for part in (value or '').split(','):
+		name, _, arg = part.strip().partition('=')
+		if name:
+			directives[name.lower()] = arg.strip('"') or None
+	return directives
+
+
+def etag_matches(if_none_match, etag):
+	"""Perbandingan weak If-None-Match (W/ diabaikan) seperti HttpServer"""
+	if etag is None:
+		return False
+	if if_none_match.strip() == '*':
+		return True
+	tags = [tag.strip() for tag in if_none_match.split(',')]
+	return etag.replace('W/', '', 1) in [tag.replace('W/', '', 1) for tag in tags]
+
+
+class CacheEntry:
+	"""Response 200 lengkap (header tanpa hop-by-hop + body) beserta validator dan masa segarnya"""
+
+	def __init__(self, status_line, headers, body, heuristic_ttl):
+		self.status_line = status_line
+		self.headers = [header for header in headers if header[0] not in CACHE_SKIP_HEADERS]
+		self.head = build_head(status_line, self.headers, [])[:-2]  # tanpa baris kosong penutup
+		self.body = bytes(body)
+		self.etag = header_value(headers, 'etag')
+		self.last_modified = header_value(headers, 'last-modified')
+		self.heuristic_ttl = heuristic_ttl
+		self.refresh()
+
+	def refresh(self, headers=()):
+		"""Mulai masa segar baru (saat disimpan atau setelah 304 dari upstream)"""
+		self.stored_at = time.monotonic()
+		self.fresh_until = self.stored_at + freshness_lifetime(list(headers) or self.headers, self.heuristic_ttl)
+
+	def fresh(self):
+		return time.monotonic() < self.fresh_until
+
+	def size(self):
+		return len(self.head) + len(self.body)
+
+	def response(self, label, keep_alive, not_modified=False):
+		age = int(time.monotonic() - self.stored_at)
+		extra = "Age: {}\r\nX-Cache: {}\r\nConnection: {}\r\n\r\n".format(
+			age, label, 'keep-alive' if keep_alive else 'close').encode()
+		if not_modified:
+			# 304: hanya validator dan header cache, tanpa body
+			lines = ["HTTP/1.1 304 Not Modified"] + ["{}: {}".format(name, value) for lower, name, value in self.headers
+													if lower in ('etag', 'last-modified', 'cache-control', 'vary', 'date')]
+			return ("\r\n".join(lines) + "\r\n").encode('latin-1') + extra
+		return self.head + extra + self.body
+
+
+def freshness_lifetime(headers, heuristic_ttl):
+	"""
+	max-age / s-maxage jika ada; no-cache = selalu revalidasi; selain itu
+	heuristik 10% dari umur Last-Modified, dibatasi heuristic_ttl
+	"""
+	directives = cache_control(header_value(headers, 'cache-control'))
+	if 'no-cache' in directives:
+		return 0.0
+	for name in ('s-maxage', 'max-age'):
+		value = directives.get(name)
+		if value is not None and value.isdigit():
+			return float(value)
+	last_modified = header_value(headers, 'last-modified')
+	if last_modified:
+		try:
+			age = time.time() - parsedate_to_datetime(last_modified).timestamp()
+		except (TypeError, ValueError):
+			return 0.0
+		return max(0.0, min(age * 0.1, heuristic_ttl))
+	return 0.0
+
+
+def storable(status, headers, length, max_entry_bytes):
+	"""Response GET yang boleh disimpan proxy (shared cache)"""
+	if status != 200 or length is None or length > max_entry_bytes:
+		return False
+	directives = cache_control(header_value(headers, 'cache-control'))
+	if 'no-store' in directives or 'private' in directives or header_value(headers, 'set-cookie'):
+		return False
+	vary = {token.strip().lower() for token in (header_value(headers, 'vary') or '').split(',') if token.strip()}
+	if not vary <= {'accept-encoding'}:
+		return False  # key cache hanya membedakan Accept-Encoding
+	# Tanpa masa segar dan tanpa validator tidak ada gunanya disimpan
+	return bool(header_value(headers, 'etag') or header_value(headers, 'last-modified')
+				or 'max-age' in directives or 's-maxage' in directives)
+
+
+class ProxyCache:
+	"""
+	LRU cache (dibatasi total byte) untuk response GET dari backend,
+	key = (target, Accept-Encoding). Entry basi direvalidasi ke upstream
+	dengan If-None-Match / If-Modified-Since; request yang mengubah target
+	(POST/DELETE/PUT) menghapus semua varian target itu
+	"""
+
+	def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=CACHE_MAX_ENTRY, heuristic_ttl=CACHE_HEURISTIC_TTL):
+		self.max_bytes = max_bytes
+		self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+		self.heuristic_ttl = heuristic_ttl
+		self.entries = OrderedDict()  # key -> CacheEntry
+		self.variants = {}  # target -> set(key)
+		self.current_bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.revalidated = 0
+		self.coalesced = 0
+		self.evictions = 0
+
+	def get(self, key):
+		entry = self.entries.get(key)
+		if entry is not None:
+			self.entries.move_to_end(key)
+		return entry
+
+	def put(self, key, entry):
+		if entry.size() > self.max_bytes:
+			return
+		if key in self.entries:
+			self._remove(key)
+		self.entries[key] = entry
+		self.variants.setdefault(key[0], set()).add(key)
+		self.current_bytes += entry.size()
+		while self.current_bytes > self.max_bytes:
+			self._remove(next(iter(self.entries)))
+			self.evictions += 1
+
+	def invalidate(self, target):
+		for key in self.variants.pop(target, ()):
+			if key in self.entries:
+				self._remove(key)
+
+	def _remove(self, key):
+		entry = self.entries.pop(key)
+		self.current_bytes -= entry.size()
+		keys = self.variants.get(key[0])
+		if keys is not None:
+			keys.discard(key)
+			if not keys:
+				del self.variants[key[0]]
+
+	def stats(self):
+		return {
+			'entries': len(self.entries),
+			'bytes': self.current_bytes,
+			'max_bytes': self.max_bytes,
+			'hits': self.hits,
+			'misses': self.misses,
+			'revalidated': self.revalidated,
+			'coalesced': self.coalesced,
+			'evictions': self.evictions,
+		}
+
+
+class HttpProxyClient(Watched):
+	"""
+	Mode http: satu koneksi client diproses per request. Tiap request
+	dikirim ke backend pilihan pool lewat koneksi keep-alive yang dipakai
+	ulang (tanpa connect baru), response di-stream balik berdasarkan
+	Content-Length lalu koneksi upstream dikembalikan ke pool.
+	Dengan cache: GET yang segar dilayani dari memori, GET yang sama dan
+	bersamaan menunggu satu fetch upstream (state waiting).
+	State: head -> [waiting] -> connect -> send -> response -> body -> head ...
+	"""
+
+	def __init__(self, server, connection, address):
+		self.server = server
+		self.connection = connection
+		self.address = address
+		self.connection.setblocking(False)
+		self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self.masks = {}
+		self.closed = False
+		self.inbuf = bytearray()  # data dari client yang belum diproses (pipelining)
+		self.out = bytearray()  # data yang sedang dikirim ke socket tujuan state ini
+		self.upstream = None
+		self.backend = None
+		self.requests = 0
+		self.cache_key = None
+		self.state = 'head'
+		self.update()
+
+	# -- request dari client --
+
+	def read_head(self):
+		end = self.inbuf.find(b"\r\n\r\n")
+		if end < 0:
+			if len(self.inbuf) > MAX_HEAD_SIZE:
+				self.fail(431, 'Request Header Fields Too Large')
+			return
+		head = bytes(self.inbuf[:end])
+		del self.inbuf[:end + 4]
+		request_line, headers = parse_head(head)
+		parts = request_line.split()
+		if len(parts) != 3:
+			self.fail(400, 'Bad Request')
+			return
+		if header_value(headers, 'transfer-encoding'):
+			self.fail(501, 'Not Implemented')
+			return
+		try:
+			self.req_remaining = int(header_value(headers, 'content-length') or 0)
+		except ValueError:
+			self.req_remaining = -1
+		if self.req_remaining < 0:
+			self.fail(400, 'Bad Request')
+			return
+		self.method = parts[0].upper()
+		self.target = parts[1]
+		self.request_line = request_line
+		self.req_headers = headers
+		self.client_keep_alive = wants_keep_alive(parts[2].upper(), headers)
+		self.request_start = time.time()
+		self.cache_key = None
+		self.revalidating = None
+		self.capture = None
+		self.cache_label = None
+		cache = self.server.cache
+		if cache is not None and self.method == 'GET' and self.req_remaining == 0:
+			directives = cache_control(header_value(headers, 'cache-control'))
+			if not (header_value(headers, 'range') or header_value(headers, 'authorization') or 'no-store' in directives):
+				encodings = header_value(headers, 'accept-encoding') or ''
+				self.cache_key = (self.target, ','.join(sorted(
+					token.split(';')[0].strip().lower() for token in encodings.split(',') if token.strip())))
+				entry = cache.get(self.cache_key)
+				revalidate = 'no-cache' in directives or directives.get('max-age') == '0'
+				if entry is not None and entry.fresh() and not revalidate:
+					cache.hits += 1
+					self.serve_cached(entry, 'HIT')
+					return
+				leader = self.server.inflight.get(self.cache_key)
+				if leader is not None:
+					# Miss yang sama sedang di-fetch: tunggu hasilnya, tanpa request upstream baru
+					cache.coalesced += 1
+					leader.waiters.append(self)
+					self.state = 'waiting'
+					return
+				self.server.inflight[self.cache_key] = self
+				self.waiters = []
+				self.revalidating = entry if entry is not None and (entry.etag or entry.last_modified) else None
+				if self.revalidating is None:
+					cache.misses += 1
+		self.fetch()
+
+	def fetch(self):
+		"""Kirim request saat ini ke upstream (untuk fetch cache: tanpa conditional dari client)"""
+		headers = self.req_headers
+		extra = ["Connection: keep-alive", "X-Forwarded-For: {}".format(self.address[0])]
+		if self.cache_key is not None:
+			# Response harus lengkap (200) agar bisa disimpan; conditional client dijawab dari cache
+			headers = [header for header in headers if header[0] not in ('if-none-match', 'if-modified-since')]
+			if self.revalidating is not None:
+				if self.revalidating.etag:
+					extra.append("If-None-Match: {}".format(self.revalidating.etag))
+				if self.revalidating.last_modified:
+					extra.append("If-Modified-Since: {}".format(self.revalidating.last_modified))
+		# Koneksi ke upstream selalu keep-alive, apa pun permintaan client
+		self.req_head = build_head(self.request_line, headers, extra)
+		self.tried = []
+		self.attach()
+
+	def serve_cached(self, entry, label):
+		"""Jawab request dari entry cache (304 jika conditional client cocok)"""
+		if_none_match = header_value(self.req_headers, 'if-none-match')
+		if if_none_match is not None:
+			not_modified = etag_matches(if_none_match, entry.etag)
+		else:
+			if_modified_since = header_value(self.req_headers, 'if-modified-since')
+			not_modified = if_modified_since is not None and if_modified_since == entry.last_modified
+		self.status = 304 if not_modified else 200
+		self.cache_label = label
+		self.out = bytearray(entry.response(label, self.client_keep_alive, not_modified))
+		self.resp_remaining = 0
+		self.reused = False
+		self.state = 'body'
+		self.send_body()
+
+	def end_fetch(self, entry=None):
+		"""Leader fetch selesai/gagal: waiter dilayani dari entry, atau fetch sendiri"""
+		if self.cache_key is None or self.server.inflight.get(self.cache_key) is not self:
+			return
+		del self.server.inflight[self.cache_key]
+		for waiter in self.waiters:
+			if waiter.closed:
+				continue
+			try:
+				if entry is not None:
+					waiter.serve_cached(entry, 'COALESCED')
 				else:
-					break
-			except OSError as e:
+					waiter.cache_key = None  # tidak bisa di-cache: fetch sendiri, tanpa antri lagi
+					waiter.fetch()
+			except (BlockingIOError, InterruptedError):
 				pass
+			except OSError:
+				waiter.close()
+			waiter.update()
+		self.waiters = []
+
+	def attach(self, fresh=False):
+		"""Ambil koneksi upstream: dari pool jika ada, selain itu connect baru"""
+		while True:
+			backend = self.server.pool.choose(exclude=self.tried)
+			if backend is None:
+				self.fail(502, 'Bad Gateway')
+				return
+			self.tried.append(backend)
+			sock = None if fresh else self.server.pool.checkout(backend)
+			self.reused = sock is not None
+			if sock is None:
+				try:
+					sock = connect_upstream(backend)
+				except OSError as e:
+					self.server.pool.mark_down(backend, e)
+					continue
+			self.backend = backend
+			backend.active += 1
+			self.upstream = sock
+			self.out = bytearray(self.req_head)
+			# Body yang sudah ikut terbaca bersama header
+			take = min(self.req_remaining, len(self.inbuf))
+			self.out += self.inbuf[:take]
+			del self.inbuf[:take]
+			self.req_remaining -= take
+			self.retryable = self.req_remaining == 0
+			self.request_bytes = bytes(self.out) if self.retryable else None
+			self.state = 'send' if self.reused else 'connect'
+			return
+
+	def connected(self):
+		err = self.upstream.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+		if err:
+			self.server.pool.mark_down(self.backend, os.strerror(err))
+			self.detach(reuse=False)
+			self.attach()
+			return
+		self.state = 'send'
+		self.send_request()
+
+	def send_request(self):
+		if self.out:
+			del self.out[:self.upstream.send(self.out)]
+		if not self.out and self.req_remaining > 0:
+			data = self.connection.recv(min(self.server.buffer_size, self.req_remaining))
+			if not data:
+				raise ConnectionError("client menutup koneksi di tengah body")
+			self.req_remaining -= len(data)
+			self.out += data
+			del self.out[:self.upstream.send(self.out)]
+		if not self.out and self.req_remaining == 0:
+			self.state = 'response'
+			self.resp = bytearray()
+
+	# -- response dari upstream --
+
+	def read_response(self):
+		data = self.upstream.recv(self.server.buffer_size)
+		if not data:
+			if not self.resp and self.reused and self.retryable:
+				# Koneksi pool ternyata sudah ditutup backend: ulangi dengan connect baru
+				request = self.request_bytes
+				self.detach(reuse=False)
+				self.tried = []
+				self.attach(fresh=True)
+				if self.upstream is not None:
+					self.out = bytearray(request)
+				return
+			raise ConnectionError("upstream menutup koneksi sebelum response lengkap")
+		self.resp += data
+		end = self.resp.find(b"\r\n\r\n")
+		if end < 0:
+			if len(self.resp) > MAX_HEAD_SIZE:
+				raise ConnectionError("header response terlalu besar")
+			return
+		head = bytes(self.resp[:end])
+		body = self.resp[end + 4:]
+		self.resp = None
+		status_line, headers = parse_head(head)
+		parts = status_line.split(None, 2)
+		status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 502
+		self.upstream_keep_alive = wants_keep_alive(parts[0].upper(), headers)
+		length = header_value(headers, 'content-length')
+		if self.method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+			self.resp_remaining = 0
+		elif length is not None and length.isdigit():
+			self.resp_remaining = int(length)
+		else:
+			# Tanpa Content-Length: body berakhir saat upstream menutup koneksi
+			self.resp_remaining = None
+			self.upstream_keep_alive = False
+			self.client_keep_alive = False
+		self.status = status
+		extra = ["Connection: keep-alive" if self.client_keep_alive else "Connection: close"]
+		if self.cache_key is not None:
+			cache = self.server.cache
+			if status == 304 and self.revalidating is not None:
+				# Entry lama masih valid: perpanjang, layani dari cache
+				entry = self.revalidating
+				entry.refresh(headers)
+				cache.revalidated += 1
+				self.detach(reuse=self.upstream_keep_alive)
+				self.end_fetch(entry)
+				self.serve_cached(entry, 'REVALIDATED')
+				return
+			if self.revalidating is not None:
+				cache.misses += 1
+			if storable(status, headers, self.resp_remaining, cache.max_entry_bytes):
+				self.capture = bytearray()
+				self.capture_status = status_line
+				self.capture_headers = headers
+			else:
+				self.end_fetch()
+			extra.append("X-Cache: MISS")
+		self.out = bytearray(build_head(status_line, headers, extra))
+		if self.resp_remaining is not None:
+			body = body[:self.resp_remaining]
+			self.resp_remaining -= len(body)
+		self.out += body
+		if self.capture is not None:
+			self.capture += body
+		self.state = 'body'
+		self.send_body()
+
+	def send_body(self):
+		if self.out:
+			del self.out[:self.connection.send(self.out)]
+		if not self.out and self.resp_remaining != 0:
+			size = self.server.buffer_size if self.resp_remaining is None else min(self.server.buffer_size, self.resp_remaining)
+			data = self.upstream.recv(size)
+			if not data:
+				if self.resp_remaining is not None:
+					raise ConnectionError("upstream menutup koneksi di tengah body")
+				self.resp_remaining = 0
+			else:
+				if self.resp_remaining is not None:
+					self.resp_remaining -= len(data)
+				if self.capture is not None:
+					self.capture += data
+				self.out += data
+				del self.out[:self.connection.send(self.out)]
+		if not self.out and self.resp_remaining == 0:
+			self.finish()
+
+	def finish(self):
+		self.requests += 1
+		if self.backend is None:
+			via = 'cache ' + self.cache_label
+		else:
+			via = "{} ({})".format(self.backend.name, 'reused' if self.reused else 'new')
+		logging.info("{} {} {} {} via {} {:.3f}s".format(
+			self.address, self.method, self.target, self.status, via, time.time() - self.request_start))
+		if self.backend is not None:
+			self.detach(reuse=self.upstream_keep_alive)
+		cache = self.server.cache
+		if self.capture is not None:
+			entry = CacheEntry(self.capture_status, self.capture_headers, self.capture, cache.heuristic_ttl)
+			cache.put(self.cache_key, entry)
+			self.capture = None
+			self.end_fetch(entry)
+		elif cache is not None and self.method not in ('GET', 'HEAD') and self.status < 400:
+			cache.invalidate(self.target)
+		if not self.client_keep_alive:
+			self.close()
+			return
+		self.state = 'head'
+		if self.inbuf:
+			self.read_head()  # request berikutnya sudah ada di buffer (pipelining)
+
+	def detach(self, reuse):
+		"""Lepas upstream: kembali ke pool jika response selesai dan keep-alive"""
+		if self.upstream is None:
+			return
+		self.forget(self.upstream)
+		if reuse:
+			self.server.pool.checkin(self.backend, self.upstream)
+		else:
+			self.upstream.close()
+		self.upstream = None
+		self.backend.active -= 1
+		self.backend = None
+
+	def fail(self, code, message):
+		"""Kirim response error ke client lalu tutup setelah terkirim"""
+		logging.warning("{} {} {}".format(self.address, code, message))
+		self.detach(reuse=False)
+		self.capture = None
+		self.end_fetch()
+		self.out = bytearray(error_response(code, message))
+		self.client_keep_alive = False
+		self.state = 'error'
+
+	# -- event loop --
+
+	def interest(self):
+		client = upstream = 0
+		if self.state == 'head':
+			client = selectors.EVENT_READ
+		elif self.state == 'connect':
+			upstream = selectors.EVENT_WRITE
+		elif self.state == 'send':
+			if self.out:
+				upstream = selectors.EVENT_WRITE
+			else:
+				client = selectors.EVENT_READ
+		elif self.state == 'response':
+			upstream = selectors.EVENT_READ
+		elif self.state == 'body':
+			if self.out:
+				client = selectors.EVENT_WRITE
+			else:
+				upstream = selectors.EVENT_READ
+		elif self.state == 'error':
+			client = selectors.EVENT_WRITE
+		return client, upstream
+
+	def update(self):
+		if self.closed:
+			return
+		client, upstream = self.interest()
+		self.watch(self.connection, client)
+		if self.upstream is not None:
+			self.watch(self.upstream, upstream)
+
+	def handle(self, sock, mask):
+		try:
+			if self.state == 'head':
+				data = self.connection.recv(self.server.buffer_size)
+				if not data:
+					self.close()
+					return
+				self.inbuf += data
+				self.read_head()
+			elif self.state == 'connect':
+				self.connected()
+			elif self.state == 'send':
+				self.send_request()
+			elif self.state == 'response':
+				self.read_response()
+			elif self.state == 'body':
+				self.send_body()
+			elif self.state == 'error':
+				del self.out[:self.connection.send(self.out)]
+				if not self.out:
+					self.close()
+					return
+		except (BlockingIOError, InterruptedError):
+			pass
+		except OSError as e:
+			logging.debug("client {} error: {}".format(self.address, e))
+			if self.state in ('connect', 'send', 'response'):
+				self.fail(502, 'Bad Gateway')  # belum ada byte response yang terkirim ke client
+			else:
+				self.close()
+		self.update()
+
+	def close(self):
+		if self.closed:
+			return
+		self.closed = True
+		self.detach(reuse=False)
+		self.capture = None
+		self.end_fetch()
+		self.forget(self.connection)
 		self.connection.close()
+		self.server.tunnels -= 1
 
 
+class Server:
+	"""
+	Proxy TCP satu thread: semua tunnel dilayani satu event loop selectors
+	(epoll di Linux), jadi ribuan tunnel tidak butuh ribuan thread.
+	Beberapa backend dibagi round-robin / least-connections
+	"""
 
-class Server(threading.Thread):
-	def __init__(self):
-		self.the_clients = []
+	def __init__(self, host='0.0.0.0', port=18000, backends=(('localhost', 8889),), buffer_size=RELAY_BUFFER_SIZE,
+			mode='tcp', policy='round-robin', cache_bytes=0, cache_ttl=CACHE_HEURISTIC_TTL,
+			relay='auto', log_payload=False, **pool_options):
 		self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 		self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.address = (host, port)
+		self.buffer_size = buffer_size
+		self.selector = selectors.DefaultSelector()
+		self.pool = BackendPool(self, backends, policy, **pool_options)
+		self.client_class = HttpProxyClient if mode == 'http' else ProcessTheClient
+		self.mode = mode
+		self.tunnels = 0
+		# Mode tcp: auto = splice jika tersedia, dengan pipe minimal SPLICE_MIN_BUFFER
+		# (--relay splice memakai --buffer-kb apa adanya); payload logging butuh salinan di userspace
+		self.relay = relay
+		use_splice = relay == 'splice' or (relay == 'auto' and SPLICE_AVAILABLE and not log_payload)
+		self.relay_class = SpliceRelay if use_splice else Relay
+		self.relay_size = max(buffer_size, SPLICE_MIN_BUFFER) if use_splice and relay == 'auto' else buffer_size
+		self.log_payload = log_payload
+		# Cache hanya di mode http; inflight: key cache -> client yang sedang fetch (coalescing)
+		self.cache = ProxyCache(cache_bytes, heuristic_ttl=cache_ttl) if mode == 'http' and cache_bytes > 0 else None
+		self.inflight = {}
 
-		self.destination_sock_address = ('localhost',8889)
-		threading.Thread.__init__(self)
+	def make_relay(self, src, dst, label=None):
+		"""
+		Relay satu arah tunnel. Pada auto, tunnel yang tidak mendapat pipe
+		sebesar relay_size (batas pipe per user tercapai) memakai copy, karena
+		splice lewat pipe kecil lebih lambat dari recv/send
+		"""
+		if self.relay_class is SpliceRelay:
+			relay = SpliceRelay(src, dst, self.relay_size)
+			if self.relay != 'auto' or relay.size >= self.relay_size:
+				return relay
+			relay.close()
+		return Relay(src, dst, self.buffer_size, label)
+
+	def accept(self):
+		for _ in range(ACCEPT_BATCH):
+			try:
+				connection, client_address = self.my_socket.accept()
+			except (BlockingIOError, InterruptedError):
+				return
+			except OSError as e:
+				# EMFILE dll: coba lagi di putaran berikutnya
+				logging.warning("accept gagal: {}".format(e))
+				return
+			logging.info("connection from {}".format(client_address))
+			try:
+				self.client_class(self, connection, client_address)
+				self.tunnels += 1
+			except OSError as e:
+				logging.warning("tidak ada backend untuk {}: {}".format(client_address, e))
+				connection.close()
 
 	def run(self):
-		self.my_socket.bind(('0.0.0.0', 18000))
-		self.my_socket.listen(1)
+		self.my_socket.bind(self.address)
+		self.my_socket.listen(1024)
+		self.my_socket.setblocking(False)
+		self.selector.register(self.my_socket, selectors.EVENT_READ, None)
+		threading.Thread(target=self.pool.health_loop, daemon=True).start()
+		if self.mode == 'http':
+			detail = "cache {}".format("{} MB".format(self.cache.max_bytes // (1024 * 1024)) if self.cache else 'off')
+		else:
+			detail = "relay {} {} KB".format('splice' if self.relay_class is SpliceRelay else 'copy', self.relay_size // 1024)
+		logging.warning("proxy {} -> {} ({} mode, {}, {}, {})".format(
+			self.address, ', '.join(b.name for b in self.pool.backends), self.mode, self.pool.policy,
+			detail, type(self.selector).__name__))
 		while True:
-			self.connection, self.client_address = self.my_socket.accept()
-			logging.warning("connection from {}".format(self.client_address))
+			for key, mask in self.selector.select(1.0):
+				if key.data is None:
+					self.accept()
+				else:
+					key.data.handle(key.fileobj, mask)
+			self.pool.expire()
+
+
+def raise_fd_limit():
+	"""Satu tunnel = dua fd; naikkan batas soft RLIMIT_NOFILE ke batas hard"""
+	try:
+		import resource
+		soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+		if soft < hard:
+			resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+	except (ImportError, ValueError, OSError):
+		pass
 
-			clt = ProcessTheClient(self.connection, self.client_address,self.destination_sock_address)
-			clt.start()
-			self.the_clients.append(clt)
 
+def parse_address(value):
+	host, _, port = value.rpartition(':')
+	return (host or 'localhost', int(port))
 
 
 def main():
-	svr = Server()
-	svr.start()
+	import argparse
+
+	parser = argparse.ArgumentParser(description='TCP/HTTP proxy (selectors, full-duplex, load balancing)')
+	parser.add_argument('--host', default='0.0.0.0', help='Proxy host (default: 0.0.0.0)')
+	parser.add_argument('--port', type=int, default=18000, help='Proxy port (default: 18000)')
+	parser.add_argument('--backend', '--target', dest='backends', action='append',
+						help='Upstream host:port, boleh diulang (default: localhost:8889)')
+	parser.add_argument('--mode', choices=['tcp', 'http'], default='tcp',
+						help='tcp: tunnel byte apa adanya; http: per request, koneksi upstream keep-alive dipakai ulang')
+	parser.add_argument('--balance', choices=['round-robin', 'least-conn'], default='round-robin', help='Pemilihan backend (default: round-robin)')
+	parser.add_argument('--health-interval', type=float, default=HEALTH_INTERVAL, help='Interval health check dalam detik (default: 2)')
+	parser.add_argument('--health-path', help='Path GET untuk health check (default: hanya TCP connect)')
+	parser.add_argument('--pool-size', type=int, default=POOL_SIZE, help='Max koneksi keep-alive idle per backend, mode http (default: 32)')
+	parser.add_argument('--cache-mb', type=int, default=0, help='Cache response GET di proxy dalam MB, mode http (default: 0 = nonaktif)')
+	parser.add_argument('--cache-ttl', type=float, default=CACHE_HEURISTIC_TTL,
+						help='Batas freshness heuristik untuk response tanpa max-age, detik (default: 10)')
+	parser.add_argument('--buffer-kb', type=int, default=RELAY_BUFFER_SIZE // 1024, help='Buffer per arah tunnel dalam KB (default: 64)')
+	parser.add_argument('--relay', choices=['auto', 'splice', 'copy'], default='auto',
+						help='Mode tcp: splice = zero-copy lewat pipe (Linux), copy = recv/send; '
+							 'auto = splice dengan pipe minimal {} KB jika os.splice ada, selain itu copy (default: auto)'.format(SPLICE_MIN_BUFFER // 1024))
+	parser.add_argument('--log-payload', action='store_true', help='Debug: log isi payload tunnel tcp (memaksa relay copy)')
+	parser.add_argument('--verbose', '-v', action='store_true', help='Log setiap tunnel / request')
+	args = parser.parse_args()
+
+	if args.cache_mb and args.mode != 'http':
+		parser.error('--cache-mb membutuhkan --mode http')
+	if args.relay == 'splice' and (not SPLICE_AVAILABLE or args.log_payload):
+		parser.error('--relay splice membutuhkan os.splice (Linux, Python 3.10+) dan tanpa --log-payload')
+	logging.basicConfig(level=logging.DEBUG if args.log_payload else logging.INFO if args.verbose else logging.WARNING)
+	backends = [parse_address(value) for value in (args.backends or ['localhost:8889'])]
+	raise_fd_limit()
+	svr = Server(args.host, args.port, backends, args.buffer_kb * 1024, args.mode, args.balance,
+			args.cache_mb * 1024 * 1024, args.cache_ttl, args.relay, args.log_payload,
+			health_interval=args.health_interval, health_path=args.health_path, pool_size=args.pool_size)
+	try:
+		svr.run()
+	except KeyboardInterrupt:
+		if svr.cache is not None:
+			logging.warning("cache: {}".format(svr.cache.stats()))
+		logging.warning("proxy stopped")
 
 if __name__=="__main__":
 	main()
-